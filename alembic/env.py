@@ -10,8 +10,16 @@ from sqlalchemy import pool
 from sqlalchemy.ext.asyncio import async_engine_from_config
 from sqlmodel import SQLModel
 
-from choresir.models.job import MessageJob  # noqa: F401
+from choresir.models.job import (  # noqa: F401
+    AgentCheckpoint,
+    ArchivedJob,
+    DeadLetterJob,
+    MessageJob,
+)
+from choresir.models.leader import LeaderLease  # noqa: F401
 from choresir.models.member import Member  # noqa: F401
+from choresir.models.outbox import OutboundMessage  # noqa: F401
+from choresir.models.rate_limit import RateLimitBucket  # noqa: F401
 from choresir.models.task import CompletionHistory, Task  # noqa: F401
 
 config = context.config
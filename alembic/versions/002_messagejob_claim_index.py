@@ -0,0 +1,34 @@
+"""messagejob claim index
+
+Revision ID: 3f9a1c27d4e8
+Revises: 5b6060d3e36c
+Create Date: 2026-10-16 09:12:41.518302
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9a1c27d4e8"
+down_revision: str | None = "5b6060d3e36c"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("messagejob", schema=None) as batch_op:
+        # Superseded by the composite index, whose leading column is status.
+        batch_op.drop_index("ix_messagejob_status")
+        batch_op.create_index(
+            "ix_messagejob_status_run_after_created_at",
+            ["status", "run_after", "created_at"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("messagejob", schema=None) as batch_op:
+        batch_op.drop_index("ix_messagejob_status_run_after_created_at")
+        batch_op.create_index("ix_messagejob_status", ["status"], unique=False)
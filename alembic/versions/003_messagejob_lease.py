@@ -0,0 +1,35 @@
+"""messagejob lease
+
+Revision ID: a71e5b3c9d02
+Revises: 3f9a1c27d4e8
+Create Date: 2026-10-16 11:40:03.227915
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a71e5b3c9d02"
+down_revision: str | None = "3f9a1c27d4e8"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("messagejob", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+
+    # Jobs stranded in PROCESSING before leases existed get an already-expired
+    # lease so the reaper returns them to the queue on first run.
+    op.execute(
+        "UPDATE messagejob SET lease_expires_at = COALESCE(claimed_at, created_at) "
+        "WHERE status = 'PROCESSING'"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("messagejob", schema=None) as batch_op:
+        batch_op.drop_column("lease_expires_at")
@@ -0,0 +1,60 @@
+"""messagejob retention: partial claim index and archive table
+
+Revision ID: 8d2b47e1f06a
+Revises: 5e19a0c7b2f4
+Create Date: 2026-10-16 17:02:33.847120
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d2b47e1f06a"
+down_revision: str | None = "5e19a0c7b2f4"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+_ACTIVE_JOB = sa.text("status IN ('PENDING', 'PROCESSING')")
+_JOB_STATUS = sa.Enum("PENDING", "PROCESSING", "DONE", "FAILED", name="jobstatus")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "archivedjob",
+        sa.Column("id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("sender_id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("group_id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("body", sa.LargeBinary(), nullable=False),
+        sa.Column("status", _JOB_STATUS, nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("messagejob", schema=None) as batch_op:
+        # Only PENDING and PROCESSING rows are ever claimed or reaped, so the
+        # index no longer needs to carry the finished backlog.
+        batch_op.drop_index("ix_messagejob_status_run_after_created_at")
+        batch_op.create_index(
+            "ix_messagejob_active",
+            ["status", "run_after", "created_at"],
+            unique=False,
+            sqlite_where=_ACTIVE_JOB,
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("messagejob", schema=None) as batch_op:
+        batch_op.drop_index("ix_messagejob_active")
+        batch_op.create_index(
+            "ix_messagejob_status_run_after_created_at",
+            ["status", "run_after", "created_at"],
+            unique=False,
+        )
+    op.drop_table("archivedjob")
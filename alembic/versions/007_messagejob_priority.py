@@ -0,0 +1,31 @@
+"""messagejob priority
+
+Revision ID: b3f6c28a91d5
+Revises: 8d2b47e1f06a
+Create Date: 2026-10-16 18:10:47.302915
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b3f6c28a91d5"
+down_revision: str | None = "8d2b47e1f06a"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("messagejob", schema=None) as batch_op:
+        # Existing jobs land in the NORMAL lane.
+        batch_op.add_column(
+            sa.Column("priority", sa.Integer(), nullable=False, server_default="1")
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("messagejob", schema=None) as batch_op:
+        batch_op.drop_column("priority")
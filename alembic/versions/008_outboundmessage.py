@@ -0,0 +1,56 @@
+"""outboundmessage
+
+Revision ID: e71a09c4d2b8
+Revises: b3f6c28a91d5
+Create Date: 2026-10-16 20:51:39.173139
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+import sqlmodel
+import sqlmodel.sql.sqltypes
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e71a09c4d2b8"
+down_revision: str | None = "b3f6c28a91d5"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outboundmessage",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("chat_id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("text", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "SENDING", "SENT", "FAILED", name="outboxstatus"),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("outboundmessage", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_outboundmessage_chat_id"), ["chat_id"], unique=False
+        )
+        batch_op.create_index(
+            batch_op.f("ix_outboundmessage_status"), ["status"], unique=False
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("outboundmessage", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_outboundmessage_status"))
+        batch_op.drop_index(batch_op.f("ix_outboundmessage_chat_id"))
+
+    op.drop_table("outboundmessage")
@@ -0,0 +1,97 @@
+"""Benchmark webhook ingest throughput (jobs/s) with and without group commit.
+
+Fires enqueues at a file-backed SQLite queue from many concurrent callers,
+the way overlapping webhook requests arrive, and reports how fast they are
+stored and how long each caller waits for its commit. Each round runs once
+with ``ingest_group_commit_seconds=0`` (a commit per job) and once with the
+configured window, so the two can be compared on the same disk.
+
+    uv run python benchmarks/ingest_throughput.py --jobs 2000 --concurrency 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlmodel import SQLModel
+
+from choresir.config import Settings
+from choresir.db import create_engine, create_session_factory
+from choresir.models import MessageJob
+from choresir.worker.backends import create_job_queue
+
+
+async def run(
+    jobs: int, concurrency: int, window: float, max_jobs: int
+) -> tuple[float, float]:
+    """Return jobs/s and the median per-enqueue latency in milliseconds."""
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(
+            database_url=f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}",
+            ingest_group_commit_seconds=window,
+            ingest_group_commit_max_jobs=max_jobs,
+        )
+        engine = create_engine(settings)
+        session_factory = create_session_factory(engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        queue = create_job_queue(settings, session_factory)
+        latencies: list[float] = []
+        next_id = iter(range(jobs))
+
+        async def caller() -> None:
+            for i in next_id:
+                started = time.perf_counter()
+                await queue.enqueue(
+                    MessageJob(
+                        id=f"bench-{i}",
+                        sender_id=f"{i % 50}@c.us",
+                        group_id="group@g.us",
+                        body="done with the dishes",
+                    )
+                )
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(concurrency):
+                tg.create_task(caller())
+        elapsed = time.perf_counter() - started
+        await engine.dispose()
+    return jobs / elapsed, statistics.median(latencies) * 1000
+
+
+def main() -> None:
+    defaults = Settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument(
+        "--window", type=float, default=defaults.ingest_group_commit_seconds
+    )
+    parser.add_argument(
+        "--max-jobs", type=int, default=defaults.ingest_group_commit_max_jobs
+    )
+    args = parser.parse_args()
+    for label, window in (("commit per job", 0.0), ("group commit", args.window)):
+        results = [
+            asyncio.run(run(args.jobs, args.concurrency, window, args.max_jobs))
+            for _ in range(args.rounds)
+        ]
+        rates = sorted(rate for rate, _ in results)
+        latency = statistics.median(ms for _, ms in results)
+        print(
+            f"{label:>14}: {args.jobs} jobs, {args.concurrency} callers: "
+            f"best {rates[-1]:.0f} jobs/s, median {rates[len(rates) // 2]:.0f}, "
+            f"median enqueue {latency:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
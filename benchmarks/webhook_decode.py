@@ -0,0 +1,160 @@
+"""Benchmark decoding a WAHA message webhook: dict parsing vs the typed decoder.
+
+Builds a message event shaped like WAHA's, including the ``_data`` blob the
+engine attaches to every message, and times the old path (``json.loads``
+then chained ``.get`` calls) against ``decode_event``, reporting the time
+and the peak memory allocated per webhook for each.
+
+    uv run python benchmarks/webhook_decode.py --iterations 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from choresir.webhook.payloads import MessageEvent, decode_event
+
+
+def _webhook_body(quoted_messages: int) -> bytes:
+    """A group message event as WAHA's WEBJS engine sends it."""
+    quoted = {
+        "id": {
+            "fromMe": True,
+            "remote": "120363000000000000@g.us",
+            "id": "3EB0C767D26A1B2C3D4E",
+            "participant": "447700900000@c.us",
+            "_serialized": "true_120363000000000000@g.us_3EB0C767D26A1B2C3D4E",
+        },
+        "body": "Reminder: bins go out tonight",
+        "type": "chat",
+        "t": 1760000000,
+        "ack": 3,
+    }
+    data = {
+        "id": quoted["id"],
+        "viewed": False,
+        "body": "done with the bins",
+        "type": "chat",
+        "t": 1760000100,
+        "notifyName": "Sam",
+        "from": "120363000000000000@g.us",
+        "to": "447700900000@c.us",
+        "author": "447700900123@c.us",
+        "ack": 1,
+        "isNewMsg": True,
+        "star": False,
+        "kicNotified": False,
+        "recvFresh": True,
+        "isFromTemplate": False,
+        "mentionedJidList": [],
+        "groupMentions": [],
+        "labels": [],
+        "links": [],
+        "quotedMsg": quoted,
+        "quotedStanzaID": "3EB0C767D26A1B2C3D4E",
+        "quotedParticipant": {"server": "c.us", "user": "447700900000"},
+        "messageSecret": list(range(32)),
+        "history": [quoted] * quoted_messages,
+    }
+    envelope = {
+        "id": "evt_01JABCDEF0123456789",
+        "timestamp": 1760000100123,
+        "event": "message",
+        "session": "default",
+        "metadata": {},
+        "me": {"id": "447700900000@c.us", "pushName": "choresir"},
+        "payload": {
+            "id": "false_120363000000000000@g.us_3EB0A1B2C3D4E5F6_447700900123@c.us",
+            "timestamp": 1760000100,
+            "from": "120363000000000000@g.us",
+            "fromMe": False,
+            "source": "app",
+            "to": "447700900000@c.us",
+            "participant": "447700900123@c.us",
+            "body": "done with the bins",
+            "hasMedia": False,
+            "media": None,
+            "ack": 1,
+            "ackName": "SERVER",
+            "vCards": [],
+            "replyTo": {
+                "id": "3EB0C767D26A1B2C3D4E",
+                "participant": "447700900000@c.us",
+                "body": "Reminder: bins go out tonight",
+            },
+            "_data": data,
+        },
+        "engine": "WEBJS",
+        "environment": {"version": "2025.9.1", "engine": "WEBJS", "tier": "CORE"},
+    }
+    return json.dumps(envelope).encode()
+
+
+def _decode_dict(body: bytes) -> tuple[str, str, str, bool]:
+    """The pre-typed path: parse everything, then pick fields by hand."""
+    payload = json.loads(body)
+    message = payload.get("payload", {})
+    quoted = message.get("replyTo") or {}
+    return (
+        message.get("id", ""),
+        message.get("participant", message.get("from", "")),
+        message.get("body", ""),
+        bool((payload.get("me") or {}).get("id") and quoted.get("participant")),
+    )
+
+
+def _decode_typed(body: bytes) -> tuple[str, str, str, bool]:
+    event = decode_event(body)
+    assert isinstance(event, MessageEvent)
+    message = event.payload
+    quoted = message.reply_to
+    return (
+        message.id,
+        message.participant or message.from_,
+        message.body,
+        bool(event.me and event.me.id and quoted and quoted.participant),
+    )
+
+
+def _measure(
+    decode: Callable[[bytes], object], body: bytes, iterations: int
+) -> tuple[float, int]:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        decode(body)
+    per_call = (time.perf_counter() - started) / iterations
+
+    tracemalloc.start()
+    decode(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument(
+        "--history",
+        type=int,
+        default=5,
+        help="quoted messages embedded in _data, to scale the blob",
+    )
+    args = parser.parse_args()
+    body = _webhook_body(args.history)
+    assert _decode_dict(body) == _decode_typed(body)
+    print(f"{len(body)} byte webhook, {args.iterations} iterations")
+    for name, decode in (("json.loads", _decode_dict), ("typed", _decode_typed)):
+        per_call, peak = _measure(decode, body, args.iterations)
+        print(
+            f"{name:>10}: {per_call * 1e6:7.1f} us/webhook, "
+            f"peak {peak / 1024:6.1f} KiB allocated"
+        )
+
+
+if __name__ == "__main__":
+    main()
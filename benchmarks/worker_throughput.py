@@ -0,0 +1,100 @@
+"""Benchmark message-worker throughput (jobs/s) against a stubbed agent.
+
+Fills a file-backed SQLite queue with jobs from a handful of senders, runs
+the real worker pool over it with a process function that does the agent's
+database work (one household-context read) but no LLM call, and reports
+how fast the queue drains. ``--backend memory`` keeps the queue itself in
+memory, isolating the pool's overhead from SQLite's queue writes.
+
+    uv run python benchmarks/worker_throughput.py --jobs 2000 --senders 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from choresir.config import Settings
+from choresir.db import create_engine, create_session_factory
+from choresir.enums import QueueBackend
+from choresir.models import MessageJob, Task
+from choresir.worker.backends import create_job_queue
+from choresir.worker.processor import message_worker_loop
+
+_UNLIMITED = 1_000_000_000
+
+
+async def _stub_agent(job: MessageJob, session: AsyncSession) -> None:
+    """Stand in for the agent: read household context, skip the LLM."""
+    await session.exec(select(Task).limit(20))
+
+
+async def run(jobs: int, senders: int, pool_size: int, backend: QueueBackend) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(
+            database_url=f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}",
+            global_rate_limit_count=_UNLIMITED,
+            per_user_rate_limit_count=_UNLIMITED,
+            worker_pool_size=pool_size,
+            worker_claim_batch_size=max(pool_size * 4, 10),
+            queue_backend=backend,
+        )
+        engine = create_engine(settings)
+        session_factory = create_session_factory(engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        queue = create_job_queue(settings, session_factory)
+        for i in range(jobs):
+            await queue.enqueue(
+                MessageJob(
+                    id=f"bench-{i}",
+                    sender_id=f"{i % senders}@c.us",
+                    group_id="group@g.us",
+                    body="done with the dishes",
+                )
+            )
+
+        started = time.perf_counter()
+        worker = asyncio.create_task(
+            message_worker_loop(session_factory, _stub_agent, settings, queue=queue)
+        )
+        try:
+            while (await queue.backlog())[0]:
+                await asyncio.sleep(0.05)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        await engine.dispose()
+    return jobs / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--senders", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument(
+        "--backend", type=QueueBackend, choices=list(QueueBackend), default="sqlite"
+    )
+    args = parser.parse_args()
+    rates = [
+        asyncio.run(run(args.jobs, args.senders, args.pool_size, args.backend))
+        for _ in range(args.rounds)
+    ]
+    print(
+        f"{args.jobs} jobs, {args.senders} senders, pool {args.pool_size}, "
+        f"{args.backend} queue: "
+        f"best {max(rates):.0f} jobs/s, median {sorted(rates)[len(rates) // 2]:.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from choresir.admin.pages import register_pages
 from choresir.config import Settings
+from choresir.worker.backends import JobQueue
+from choresir.worker.notifier import JobNotifier
 
 
 def _auth_before(req, sess):
@@ -19,6 +21,8 @@ def _auth_before(req, sess):
 def create_admin_app(
     settings: Settings,
     session_factory: async_sessionmaker,
+    queue: JobQueue,
+    notifier: JobNotifier,
 ):
     """Create and return a FastHTML admin app with auth and routes."""
     beforeware = Beforeware(
@@ -28,6 +32,6 @@ def create_admin_app(
 
     app, rt = fast_app(before=beforeware, secret_key=settings.admin_secret)
 
-    register_pages(rt, session_factory, settings)
+    register_pages(rt, session_factory, settings, queue, notifier)
 
     return app
@@ -13,6 +13,7 @@ from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from choresir.config import Settings
 from choresir.enums import (
+    JobStatus,
     MemberRole,
     TaskStatus,
     TaskVisibility,
@@ -21,6 +22,8 @@ from choresir.enums import (
 from choresir.services.member_service import MemberService
 from choresir.services.messaging import NullSender
 from choresir.services.task_service import TaskService
+from choresir.worker.backends import JobQueue
+from choresir.worker.notifier import JobNotifier
 
 logger = logging.getLogger(__name__)
 
@@ -656,6 +659,41 @@ def _build_tasks_routes(
         return RedirectResponse("/admin/tasks", status_code=303)  # noqa: F405
 
 
+def _build_jobs_routes(rt, queue: JobQueue, notifier: JobNotifier) -> None:
+    """Register message job page routes."""
+
+    @rt("/jobs")
+    async def jobs_get(sess, replayed: str = ""):
+        depth = await queue.depth()
+        rows = [
+            Tr(Td(status.value), Td(depth.get(status, 0)))  # noqa: F405
+            for status in JobStatus
+        ]
+        replayed_msg = (
+            P(f"Requeued {replayed} dead-lettered jobs.", style="color:green")  # noqa: F405
+            if replayed
+            else None
+        )
+        return Titled(  # noqa: F405
+            "Message Jobs",
+            replayed_msg,
+            Table(Tr(Th("Status"), Th("Jobs")), *rows),  # noqa: F405
+            Form(  # noqa: F405
+                _csrf_input(sess),
+                Button("Replay Dead Letters"),  # noqa: F405
+                action="/admin/jobs/replay",
+                method="POST",
+            ),
+            P(A("Back to Dashboard", href="/admin")),  # noqa: F405
+        )
+
+    @rt("/jobs/replay")
+    async def jobs_replay_post(_csrf: str, sess):
+        _check_csrf(sess, _csrf)
+        replayed = await queue.replay_dead_letters(on_commit=notifier.notify)
+        return RedirectResponse(f"/admin/jobs?replayed={replayed}", status_code=303)  # noqa: F405
+
+
 def _build_auth_routes(rt, settings: Settings) -> None:
     """Register authentication page routes.
 
@@ -703,6 +741,7 @@ def _build_dashboard_route(rt) -> None:
             Div(  # noqa: F405
                 P(A("Members", href="/admin/members")),  # noqa: F405
                 P(A("Tasks", href="/admin/tasks")),  # noqa: F405
+                P(A("Message Jobs", href="/admin/jobs")),  # noqa: F405
                 P(A("Household Settings", href="/admin/settings")),  # noqa: F405
                 P(A("WAHA Session", href="/admin/waha")),  # noqa: F405
                 P(A("Logout", href="/admin/logout")),  # noqa: F405
@@ -714,9 +753,12 @@ def register_pages(
     rt,
     session_factory: async_sessionmaker,
     settings: Settings,
+    queue: JobQueue,
+    notifier: JobNotifier,
 ) -> None:
     """Register all admin page routes on the given FastHTML route decorator."""
     _build_dashboard_route(rt)
+    _build_jobs_routes(rt, queue, notifier)
     _build_auth_routes(rt, settings)
     _build_members_routes(rt, session_factory, settings)
     _build_tasks_routes(rt, session_factory, settings)
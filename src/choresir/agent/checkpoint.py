@@ -0,0 +1,132 @@
+"""Checkpointed agent runs that resume, rather than repeat, after a failure."""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Sequence
+from datetime import UTC, datetime
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from choresir.agent.agent import AgentDeps
+from choresir.models.job import AgentCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+async def save_checkpoint(
+    session: AsyncSession,
+    job_id: str,
+    prompt: str,
+    messages: Sequence[ModelMessage],
+) -> None:
+    """Record a run's history and commit it with the session's pending writes."""
+    values = {
+        "job_id": job_id,
+        "prompt": prompt,
+        "messages": ModelMessagesTypeAdapter.dump_json(list(messages)),
+        "updated_at": datetime.now(UTC),
+    }
+    stmt = insert(AgentCheckpoint).values(values)
+    stmt = stmt.on_conflict_do_update(index_elements=["job_id"], set_=values)
+    await session.exec(stmt)
+    await session.commit()
+
+
+async def load_checkpoint(
+    session: AsyncSession,
+    job_id: str,
+) -> tuple[str, list[ModelMessage]] | None:
+    """Return the checkpointed prompt and history for a job, if any."""
+    checkpoint = await session.get(AgentCheckpoint, job_id)
+    if checkpoint is None:
+        return None
+    return checkpoint.prompt, ModelMessagesTypeAdapter.validate_json(
+        checkpoint.messages
+    )
+
+
+async def clear_checkpoint(session: AsyncSession, job_id: str) -> None:
+    """Drop a job's checkpoint; committed with the job's completion."""
+    await session.exec(
+        delete(AgentCheckpoint).where(col(AgentCheckpoint.job_id) == job_id)
+    )
+
+
+async def _run(
+    agent: Agent[AgentDeps, str],
+    job_id: str,
+    prompt: str,
+    user_prompt: str | None,
+    history: list[ModelMessage] | None,
+    deps: AgentDeps,
+    session: AsyncSession,
+) -> tuple[str, list[ModelMessage]]:
+    saved = len(history or ())
+    try:
+        async with agent.iter(user_prompt, message_history=history, deps=deps) as run:
+            async for node in run:
+                messages = run.all_messages()
+                if Agent.is_model_request_node(node) and messages:
+                    # The next request carries the tool results just produced.
+                    messages = [*messages, node.request]
+                if len(messages) > saved:
+                    await save_checkpoint(session, job_id, prompt, messages)
+                    saved = len(messages)
+    except Exception:
+        # Discard writes made after the last checkpoint; they will be redone.
+        await session.rollback()
+        raise
+    if run.result is None:
+        raise RuntimeError(f"Agent run for job {job_id} ended without a result")
+    return run.result.output, run.all_messages()
+
+
+async def run_agent_checkpointed(
+    agent: Agent[AgentDeps, str],
+    job_id: str,
+    prompt: str,
+    deps: AgentDeps,
+    session: AsyncSession,
+) -> str:
+    """Run the agent for a job, checkpointing its history after every step.
+
+    Each model response and each batch of tool results is committed on
+    ``session`` together with whatever the tools wrote, so a retry of the
+    job resumes from the last completed step: model calls are not repeated
+    and tools that already ran are not called again. Messages coalesced into
+    the job since its checkpoint, which extend its prompt, are answered by a
+    follow-up run on the resumed history. A prompt that was rewritten rather
+    than extended no longer matches the history, so the checkpoint is
+    dropped and the run starts over. The checkpoint is cleared on success,
+    to be committed with the job's completion.
+    """
+    checkpoint = await load_checkpoint(session, job_id)
+    if checkpoint is not None and not prompt.startswith(checkpoint[0]):
+        logger.warning(
+            "Prompt of job %s changed since its checkpoint; starting over", job_id
+        )
+        checkpoint = None
+    if checkpoint is None:
+        output, _ = await _run(agent, job_id, prompt, prompt, None, deps, session)
+    else:
+        resumed_prompt, history = checkpoint
+        logger.info(
+            "Resuming agent run for job %s from %d messages", job_id, len(history)
+        )
+        output, history = await _run(
+            agent, job_id, resumed_prompt, None, history, deps, session
+        )
+        if prompt != resumed_prompt:
+            follow_up = prompt.removeprefix(resumed_prompt).strip("\n")
+            more, _ = await _run(
+                agent, job_id, prompt, follow_up, history, deps, session
+            )
+            output = f"{output}\n\n{more}"
+    await clear_checkpoint(session, job_id)
+    return output
@@ -4,7 +4,8 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from contextlib import asynccontextmanager
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import Path
 
 import httpx
@@ -12,7 +13,8 @@ from alembic import command
 from alembic.config import Config as AlembicConfig
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
-from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
 from tenacity import (
     retry,
     retry_if_exception_type,
@@ -22,19 +24,41 @@ from tenacity import (
 
 from choresir.admin.app import create_admin_app
 from choresir.agent.agent import AgentDeps, create_agent
+from choresir.agent.checkpoint import clear_checkpoint, run_agent_checkpointed
 from choresir.config import Settings
 from choresir.db import create_engine, create_session_factory
+from choresir.enums import ProcessRole, QueueBackend
 from choresir.errors import RateLimitExceededError, WebhookAuthError
+from choresir.leader import LeaderElection, lead
+from choresir.metrics import PipelineMetrics, create_metrics_router
 from choresir.models.job import MessageJob
-from choresir.scheduler.setup import create_scheduler, register_schedules
+from choresir.scheduler.setup import (
+    create_scheduler,
+    register_retention,
+    register_schedules,
+)
 from choresir.services.member_service import MemberService
-from choresir.services.messaging import WAHAClient
+from choresir.services.messaging import OutboxWriter, WAHAClient
 from choresir.services.task_service import TaskService
+from choresir.webhook.admission import AdmissionController
+from choresir.webhook.dedup import RecentMessageIds
+from choresir.webhook.priority import PriorityRules
 from choresir.webhook.router import create_webhook_router
+from choresir.worker.backends import JobQueue, create_job_queue
+from choresir.worker.limiters import RateLimiter, create_rate_limiter
+from choresir.worker.notifier import JobNotifier, watch_enqueues
+from choresir.worker.outbox import outbox_sender_loop
 from choresir.worker.processor import message_worker_loop
 
 logger = logging.getLogger(__name__)
 
+# Tools commit as they go, so part of the request may already be done;
+# asking for a plain resend could repeat it.
+DEADLINE_REPLY = (
+    "Sorry, that took too long to finish. Anything I already did is saved, "
+    "so please check before asking again."
+)
+
 
 async def run_migrations(engine: AsyncEngine, database_url: str) -> None:
     cfg = AlembicConfig(str(Path("alembic.ini")))
@@ -54,68 +78,207 @@ async def run_migrations(engine: AsyncEngine, database_url: str) -> None:
     retry=retry_if_exception_type((TimeoutError, httpx.RequestError)),
     reraise=True,
 )
-async def call_agent_with_retry(agent, message: str, deps: AgentDeps) -> str:
-    result = await agent.run(message, deps=deps)
-    return result.output
+async def call_agent_with_retry(
+    agent, job: MessageJob, deps: AgentDeps, session: AsyncSession
+) -> str:
+    # Each attempt resumes from the job's last checkpoint, so a retry after a
+    # dropped connection repeats neither model calls nor completed tool calls.
+    return await run_agent_checkpointed(agent, job.id, job.body, deps, session)
+
+
+async def drain(task: asyncio.Task, deadline_seconds: float, name: str) -> None:
+    """Wait up to ``deadline_seconds`` for a stopping task, then cancel it."""
+    try:
+        async with asyncio.timeout(deadline_seconds):
+            await asyncio.gather(task, return_exceptions=True)
+    except TimeoutError:
+        logger.warning(
+            "%s did not drain within %.0fs, cancelled", name, deadline_seconds
+        )
+
+
+@asynccontextmanager
+async def run_scheduler(
+    session_factory: async_sessionmaker, sender: WAHAClient, settings: Settings
+) -> AsyncIterator[None]:
+    """Run the cron-triggered jobs while this process leads the scheduler role.
+
+    Every replica campaigns for the ``scheduler`` lease; only the holder runs
+    reminders and retention, so they fire once however many replicas run.
+    """
+
+    @asynccontextmanager
+    async def scheduled() -> AsyncIterator[None]:
+        scheduler = create_scheduler()
+        async with scheduler:
+            await register_schedules(
+                scheduler, session_factory, sender, settings.group_chat_id
+            )
+            await register_retention(scheduler, session_factory, settings)
+            logger.info("Scheduler jobs registered, starting scheduler in background")
+            await scheduler.start_in_background()
+            logger.info("Scheduler started in background mode")
+            yield
+
+    election = LeaderElection(session_factory, "scheduler", settings)
+    leading = asyncio.create_task(lead(election, scheduled))
+    try:
+        yield
+    finally:
+        leading.cancel()
+        await asyncio.gather(leading, return_exceptions=True)
+
 
+@asynccontextmanager
+async def run_workers(
+    session_factory: async_sessionmaker,
+    sender: WAHAClient,
+    settings: Settings,
+    queue: JobQueue,
+    notifier: JobNotifier,
+    metrics: PipelineMetrics,
+    limiter: RateLimiter,
+    watch: bool = False,
+) -> AsyncIterator[None]:
+    """Run the message worker pool and the outbox sender loop until exit.
 
-def create_app(settings: Settings | None = None) -> FastAPI:
-    """Build a fully wired FastAPI application with no global mutable state."""
+    With ``watch`` set, as when the webhook runs in another process, new
+    jobs are spotted by watching the job table rather than via ``notifier``.
+    On exit the workers drain first, so replies from the jobs they finish
+    are committed, and then the outbox flushes what is ready to send.
+    """
+    outbox_notifier = JobNotifier()
+    workers_stopping = asyncio.Event()
+    outbox_stopping = asyncio.Event()
+    agent = create_agent(settings)
+
+    async def process_message(job: MessageJob, session: AsyncSession) -> None:
+        # Replies and notifications commit with the job and are delivered by
+        # the outbox sender loop.
+        outbox = OutboxWriter(session, outbox_notifier.notify)
+        task_service = TaskService(session, outbox, settings.max_takeovers_per_week)
+        member_service = MemberService(session)
+        deps = AgentDeps(
+            task_service=task_service,
+            member_service=member_service,
+            sender_id=job.sender_id,
+        )
+        response = await call_agent_with_retry(agent, job, deps, session)
+        await outbox.send(job.group_id, response)
+
+    async def reply_out_of_time(job: MessageJob, session: AsyncSession) -> None:
+        # The run is abandoned, not resumed, so its checkpoint goes too; the
+        # writes it already committed stay.
+        await clear_checkpoint(session, job.id)
+        await OutboxWriter(session, outbox_notifier.notify).send(
+            job.group_id, DEADLINE_REPLY
+        )
+
+    worker_task = asyncio.create_task(
+        message_worker_loop(
+            session_factory,
+            process_message,
+            settings,
+            notifier,
+            limiter=limiter,
+            metrics=metrics,
+            queue=queue,
+            stopping=workers_stopping,
+            on_deadline=reply_out_of_time,
+        )
+    )
+    outbox_task = asyncio.create_task(
+        outbox_sender_loop(
+            session_factory,
+            sender.send_once,
+            settings,
+            outbox_notifier,
+            metrics,
+            stopping=outbox_stopping,
+        )
+    )
+    watcher = None
+    if watch:
+        watcher = asyncio.create_task(
+            watch_enqueues(
+                session_factory, notifier, settings.worker_enqueue_watch_seconds
+            )
+        )
+    try:
+        yield
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+            await asyncio.gather(watcher, return_exceptions=True)
+        workers_stopping.set()
+        await drain(worker_task, settings.worker_drain_seconds, "Message workers")
+        outbox_stopping.set()
+        outbox_notifier.notify()
+        await drain(outbox_task, settings.outbox_drain_seconds, "Outbox sender")
+
+
+def create_app(
+    settings: Settings | None = None,
+    role: ProcessRole = ProcessRole.ALL,
+) -> FastAPI:
+    """Build a fully wired FastAPI application with no global mutable state.
+
+    ``role`` selects what this process runs, so the webhook, the message
+    workers and the scheduler can be deployed as separate processes sharing
+    one database. Every role serves ``/health`` and ``/metrics``; ``web``
+    adds the webhook and admin app, ``worker`` the worker pool and outbox
+    sender, and ``scheduler`` the cron jobs. ``all`` runs everything.
+    """
     settings = settings or Settings()
+    serves_web = role in (ProcessRole.WEB, ProcessRole.ALL)
+    runs_workers = role in (ProcessRole.WORKER, ProcessRole.ALL)
+    runs_scheduler = role in (ProcessRole.SCHEDULER, ProcessRole.ALL)
+    if settings.queue_backend == QueueBackend.MEMORY and role != ProcessRole.ALL:
+        raise ValueError("The memory queue backend can only run with role 'all'")
 
     engine = create_engine(settings)
     session_factory = create_session_factory(engine)
+    queue = create_job_queue(settings, session_factory)
+    notifier = JobNotifier()
+    metrics = PipelineMetrics()
+    limiter = create_rate_limiter(settings, session_factory) if runs_workers else None
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         await run_migrations(engine, settings.database_url)
 
-        async with httpx.AsyncClient(base_url=settings.waha_url, timeout=10.0) as http:
+        async with (
+            httpx.AsyncClient(base_url=settings.waha_url, timeout=10.0) as http,
+            AsyncExitStack() as roles,
+        ):
             sender = WAHAClient(
                 settings.waha_url,
                 settings.waha_api_key,
                 "default",
                 http,
             )
-
-            scheduler = create_scheduler()
-            async with scheduler:
-                await register_schedules(
-                    scheduler, session_factory, sender, settings.group_chat_id
+            if runs_scheduler:
+                await roles.enter_async_context(
+                    run_scheduler(session_factory, sender, settings)
                 )
-                logger.info(
-                    "Scheduler jobs registered, starting scheduler in background"
+            if limiter is not None:
+                await roles.enter_async_context(
+                    run_workers(
+                        session_factory,
+                        sender,
+                        settings,
+                        queue,
+                        notifier,
+                        metrics,
+                        limiter,
+                        watch=not serves_web,
+                    )
                 )
-                await scheduler.start_in_background()
-                logger.info("Scheduler started in background mode")
-
-                agent = create_agent(settings)
-
-                async def process_message(job: MessageJob) -> None:
-                    async with session_factory() as session:
-                        task_service = TaskService(
-                            session, sender, settings.max_takeovers_per_week
-                        )
-                        member_service = MemberService(session)
-                        deps = AgentDeps(
-                            task_service=task_service,
-                            member_service=member_service,
-                            sender_id=job.sender_id,
-                        )
-                        response = await call_agent_with_retry(agent, job.body, deps)
-                        await sender.send(job.group_id, response)
-
-                worker_task = asyncio.create_task(
-                    message_worker_loop(session_factory, process_message, settings)
-                )
-
-                app.state.session_factory = session_factory
-                app.state.sender = sender
 
-                yield
+            app.state.session_factory = session_factory
+            app.state.sender = sender
 
-                worker_task.cancel()
-                await asyncio.gather(worker_task, return_exceptions=True)
+            yield
 
         await engine.dispose()
 
@@ -125,6 +288,10 @@ def create_app(settings: Settings | None = None) -> FastAPI:
     async def health() -> dict[str, str]:
         return {"status": "ok"}
 
+    app.include_router(create_metrics_router(queue, metrics, limiter))
+    if not serves_web:
+        return app
+
     @app.exception_handler(WebhookAuthError)
     async def webhook_auth_handler(
         request: Request, exc: WebhookAuthError
@@ -138,11 +305,20 @@ def create_app(settings: Settings | None = None) -> FastAPI:
         return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
 
     webhook_router = create_webhook_router(
-        session_factory, settings.waha_webhook_secret
+        session_factory,
+        settings.waha_webhook_secret,
+        notifier,
+        metrics,
+        PriorityRules.from_settings(settings),
+        AdmissionController(queue, settings, metrics),
+        queue,
+        RecentMessageIds(
+            settings.webhook_dedup_max_entries, settings.webhook_dedup_ttl_seconds
+        ),
     )
     app.include_router(webhook_router)
 
-    admin_app = create_admin_app(settings, session_factory)
+    admin_app = create_admin_app(settings, session_factory, queue, notifier)
     app.mount("/admin", admin_app)
 
     return app
@@ -0,0 +1,57 @@
+"""Command-line entry point: run one role of the service per process."""
+
+from __future__ import annotations
+
+import argparse
+import functools
+from collections.abc import Sequence
+
+import uvicorn
+
+from choresir.app import create_app
+from choresir.enums import ProcessRole
+
+# Each role serves /health and /metrics, so co-located roles need their own port.
+DEFAULT_PORTS = {
+    ProcessRole.WEB: 8001,
+    ProcessRole.ALL: 8001,
+    ProcessRole.WORKER: 8002,
+    ProcessRole.SCHEDULER: 8003,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="choresir",
+        description="Run the choresir webhook, message workers and/or scheduler.",
+    )
+    parser.add_argument(
+        "role",
+        type=ProcessRole,
+        choices=list(ProcessRole),
+        help="which part of the service this process runs",
+    )
+    parser.add_argument("--host", default="0.0.0.0")  # nosec B104 — container bind
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="defaults to 8001 for web/all, 8002 worker, 8003 scheduler",
+    )
+    parser.add_argument("--log-level", default="warning")
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Parse arguments and serve the selected role until interrupted."""
+    args = build_parser().parse_args(argv)
+    uvicorn.run(
+        functools.partial(create_app, role=args.role),
+        factory=True,
+        host=args.host,
+        port=args.port or DEFAULT_PORTS[args.role],
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,13 @@ from __future__ import annotations
 
 from pydantic_settings import BaseSettings
 
+from choresir.enums import (
+    JobPriority,
+    QueueBackend,
+    RateLimitBackend,
+    StaleJobPolicy,
+)
+
 
 class Settings(BaseSettings):
     """Choresir configuration, loaded from env vars with sensible defaults."""
@@ -28,10 +35,89 @@ class Settings(BaseSettings):
     admin_password: str = ""
 
     # Rate limiting
+    rate_limit_backend: RateLimitBackend = RateLimitBackend.MEMORY
     global_rate_limit_count: int = 20
     global_rate_limit_seconds: int = 60
     per_user_rate_limit_count: int = 5
     per_user_rate_limit_seconds: int = 60
+    per_user_limiter_max_entries: int = 1024
+
+    # Worker
+    # The memory queue loses pending jobs on restart; for benchmarks and demos.
+    queue_backend: QueueBackend = QueueBackend.SQLITE
+    worker_pool_size: int = 4
+    worker_shard_count: int = 16
+    worker_claim_batch_size: int = 10
+    worker_lease_seconds: int = 60
+    worker_reap_interval_seconds: float = 30.0
+    worker_max_deferred: int = 1000
+    worker_coalesce_window_seconds: float = 0.0
+    job_max_attempts: int = 5
+    job_backoff_base_seconds: float = 2.0
+    job_backoff_max_seconds: float = 300.0
+    worker_idle_poll_seconds: float = 30.0
+    # A worker-only process cannot be notified by the webhook process, so it
+    # checks the database for commits from other processes this often instead
+    worker_enqueue_watch_seconds: float = 0.25
+    # End-to-end latency budget per job from receipt (0 disables), with a
+    # floor so backlogged jobs still get a real attempt
+    job_deadline_seconds: float = 30.0
+    job_min_run_seconds: float = 10.0
+    # Shutdown: how long in-flight jobs, then ready replies, get to finish.
+    # The two run back to back, so the container's stop grace period must
+    # exceed their sum or the process is killed before leases are returned.
+    worker_drain_seconds: float = 20.0
+    outbox_drain_seconds: float = 10.0
+
+    # Priority lanes: the highest lane among matching rules wins
+    job_priority_default: JobPriority = JobPriority.NORMAL
+    job_priority_direct_message: JobPriority = JobPriority.HIGH
+    job_priority_admin: JobPriority = JobPriority.HIGH
+    job_priority_onboarding: JobPriority = JobPriority.HIGH
+    job_priority_bot_reply: JobPriority = JobPriority.HIGH
+    job_priority_max_wait_seconds: float = 120.0
+
+    # Stale-message expiry, per priority lane (0 disables a lane's TTL)
+    job_ttl_policy: StaleJobPolicy = StaleJobPolicy.EXPIRE
+    job_ttl_low_seconds: float = 1800.0
+    job_ttl_normal_seconds: float = 3600.0
+    job_ttl_high_seconds: float = 21600.0
+
+    # Webhook ingestion: enqueues arriving behind an in-flight commit share the
+    # next one, waiting at most this long for it
+    ingest_group_commit_seconds: float = 0.005
+    ingest_group_commit_max_jobs: int = 100
+
+    # Webhook redeliveries of recently stored message ids skip the database
+    webhook_dedup_max_entries: int = 4096
+    webhook_dedup_ttl_seconds: float = 600.0
+
+    # Webhook admission control: past the deprioritize thresholds non-essential
+    # messages drop to the LOW lane; past the reject thresholds they are only
+    # stored for audit. HIGH-lane messages are always enqueued.
+    admission_refresh_seconds: float = 5.0
+    admission_deprioritize_depth: int = 200
+    admission_deprioritize_age_seconds: float = 300.0
+    admission_reject_depth: int = 1000
+    admission_reject_age_seconds: float = 1800.0
+
+    # Outbox: replies are delivered by a separate sender loop
+    outbox_concurrency: int = 4
+    outbox_batch_size: int = 20
+    outbox_lease_seconds: int = 60
+    outbox_send_timeout_seconds: float = 30.0
+    outbox_max_attempts: int = 8
+    outbox_backoff_base_seconds: float = 2.0
+    outbox_backoff_max_seconds: float = 300.0
+    outbox_idle_poll_seconds: float = 5.0
+
+    # Leader election: singleton roles (the scheduler) run on one process
+    leader_lease_seconds: float = 30.0
+    leader_renew_seconds: float = 10.0
+
+    # Retention
+    job_retention_days: int = 30
+    job_archive_batch_size: int = 200
 
     # Domain
     max_takeovers_per_week: int = 3
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from enum import StrEnum
+from enum import IntEnum, StrEnum
 
 
 class TaskStatus(StrEnum):
@@ -42,6 +42,8 @@ class JobStatus(StrEnum):
     PROCESSING = "processing"
     DONE = "done"
     FAILED = "failed"
+    EXPIRED = "expired"
+    REJECTED = "rejected"
 
 
 class TaskVisibility(StrEnum):
@@ -49,3 +51,58 @@ class TaskVisibility(StrEnum):
 
     SHARED = "shared"
     PERSONAL = "personal"
+
+
+class JobPriority(IntEnum):
+    """Claim priority lane of a queued message job; higher is claimed first."""
+
+    LOW = 0
+    NORMAL = 1
+    HIGH = 2
+
+
+class StaleJobPolicy(StrEnum):
+    """What the worker does with pending jobs older than their lane's TTL."""
+
+    EXPIRE = "expire"
+    CATCH_UP = "catch_up"
+
+
+class OutboxStatus(StrEnum):
+    """Delivery state of an outbound chat message."""
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class AdmissionDecision(StrEnum):
+    """How the webhook treats a new message given the current backlog."""
+
+    ACCEPTED = "accepted"
+    DEPRIORITIZED = "deprioritized"
+    REJECTED = "rejected"
+
+
+class ProcessRole(StrEnum):
+    """Which parts of the service a process runs."""
+
+    WEB = "web"
+    WORKER = "worker"
+    SCHEDULER = "scheduler"
+    ALL = "all"
+
+
+class QueueBackend(StrEnum):
+    """Where message jobs are queued between the webhook and the workers."""
+
+    MEMORY = "memory"
+    SQLITE = "sqlite"
+
+
+class RateLimitBackend(StrEnum):
+    """Where rate-limit token buckets live."""
+
+    MEMORY = "memory"
+    SQLITE = "sqlite"
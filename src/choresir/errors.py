@@ -33,6 +33,14 @@ class RateLimitExceededError(ChoresirError):
     """Per-user or global rate limit hit."""
 
 
+class LeaseLostError(ChoresirError):
+    """A worker's claim on a job lapsed and the job moved on without it."""
+
+    def __init__(self, job_ids: list[str]) -> None:
+        self.job_ids = job_ids
+        super().__init__(f"Lease lost on jobs: {', '.join(job_ids)}")
+
+
 class WebhookAuthError(ChoresirError):
     """Invalid webhook signature."""
 
@@ -0,0 +1,168 @@
+"""Lease-based leader election in SQLite for singleton roles."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager
+
+from sqlalchemy import delete, or_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from choresir.config import Settings
+from choresir.models.leader import LeaderLease
+
+logger = logging.getLogger(__name__)
+
+
+def default_holder_id() -> str:
+    """Identify this process uniquely among replicas sharing the database."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def try_acquire(
+    session: AsyncSession,
+    name: str,
+    holder: str,
+    ttl_seconds: float,
+) -> bool:
+    """Take or renew the ``name`` lease for ``holder``; return True if held.
+
+    A single upsert claims the row when it is free, already ours, or lapsed,
+    so two processes racing for it cannot both win.
+    """
+    now = time.time()
+    stmt = insert(LeaderLease).values(
+        name=name, holder=holder, expires_at=now + ttl_seconds
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"holder": stmt.excluded.holder, "expires_at": stmt.excluded.expires_at},
+        where=or_(
+            col(LeaderLease.holder) == holder,
+            col(LeaderLease.expires_at) < now,
+        ),
+    ).returning(LeaderLease.holder)
+    result = await session.exec(stmt)
+    held = result.scalar_one_or_none() == holder
+    await session.commit()
+    return held
+
+
+async def release(session: AsyncSession, name: str, holder: str) -> None:
+    """Give up the ``name`` lease if ``holder`` still has it."""
+    await session.exec(
+        delete(LeaderLease).where(
+            col(LeaderLease.name) == name, col(LeaderLease.holder) == holder
+        )
+    )
+    await session.commit()
+
+
+class LeaderElection:
+    """Campaigns for, holds and renews one named lease.
+
+    The lease lasts ``leader_lease_seconds`` and is renewed every
+    ``leader_renew_seconds``. A leader that cannot renew, because the
+    database is unreachable, steps down before its lease can lapse, so by
+    the time another process takes over the old leader has already stopped.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        name: str,
+        settings: Settings,
+        holder: str | None = None,
+    ) -> None:
+        self.name = name
+        self.holder = holder or default_holder_id()
+        self._session_factory = session_factory
+        self._ttl = settings.leader_lease_seconds
+        self._renew = settings.leader_renew_seconds
+        self._valid_until = 0.0  # monotonic
+        self.is_leader = False
+
+    @property
+    def renew_seconds(self) -> float:
+        return self._renew
+
+    async def campaign(self) -> None:
+        """Wait until this process holds the lease."""
+        while not await self._acquire():
+            await asyncio.sleep(self._renew)
+        self.is_leader = True
+        logger.info("%s became %s leader", self.holder, self.name)
+
+    async def hold(self) -> None:
+        """Keep renewing the lease; return once leadership is lost."""
+        while True:
+            await asyncio.sleep(self._renew)
+            if await self._acquire():
+                continue
+            # Unrenewed, another process may take over once the lease lapses;
+            # stop with a renewal interval to spare rather than overlap.
+            if time.monotonic() + self._renew >= self._valid_until:
+                break
+        self.is_leader = False
+        logger.warning("%s lost %s leadership", self.holder, self.name)
+
+    async def resign(self) -> None:
+        """Release the lease so another process can take over at once."""
+        self.is_leader = False
+        try:
+            async with self._session_factory() as session:
+                await release(session, self.name, self.holder)
+        except Exception:
+            logger.exception("Failed to release %s leadership", self.name)
+
+    async def _acquire(self) -> bool:
+        started = time.monotonic()
+        try:
+            async with self._session_factory() as session:
+                held = await try_acquire(session, self.name, self.holder, self._ttl)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error renewing %s leadership", self.name)
+            return False
+        if held:
+            self._valid_until = started + self._ttl
+        else:
+            self._valid_until = 0.0
+        return held
+
+
+async def lead(
+    election: LeaderElection,
+    role: Callable[[], AbstractAsyncContextManager[object]],
+) -> None:
+    """Run ``role`` only while ``election`` holds its lease, until cancelled.
+
+    The role's context is entered on winning the lease and exited on losing
+    it, then the process campaigns again. If the role fails, say its setup
+    hits a database error, the failure is logged and the lease given up, and
+    the process campaigns again after a renewal interval. The lease is
+    released on exit.
+    """
+    try:
+        while True:
+            await election.campaign()
+            try:
+                async with role():
+                    await election.hold()
+            except Exception:
+                logger.exception("%s role failed, stepping down", election.name)
+                await election.resign()
+                await asyncio.sleep(election.renew_seconds)
+    finally:
+        if election.is_leader:
+            await election.resign()
@@ -0,0 +1,207 @@
+"""In-process pipeline metrics rendered in the Prometheus text format."""
+
+from __future__ import annotations
+
+import bisect
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from choresir.enums import JobStatus
+from choresir.worker.backends import JobQueue
+from choresir.worker.limiters import MemoryRateLimiter, RateLimiter
+
+_LabelSet = tuple[tuple[str, str], ...]
+
+# Reply latency spans sub-second cache hits to multi-minute LLM backoffs.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _format_labels(labels: _LabelSet) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels)
+    return "{" + pairs + "}"
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]: ...
+
+
+class Counter(_Metric):
+    """Monotonic count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._values: dict[_LabelSet, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def set_total(self, total: float, **labels: str) -> None:
+        """Copy in a running total that is counted elsewhere."""
+        self._values[tuple(sorted(labels.items()))] = total
+
+    def _samples(self) -> Iterator[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(labels)} {value:g}"
+
+
+class Gauge(Counter):
+    """Point-in-time value, optionally split by labels."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket distribution of observed values."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation)
+        self._bounds = sorted(buckets)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def _samples(self) -> Iterator[str]:
+        cumulative = 0
+        for bound, count in zip(self._bounds, self._counts, strict=False):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}'
+        yield f'{self.name}_bucket{{le="+Inf"}} {self.count}'
+        yield f"{self.name}_sum {self.sum:g}"
+        yield f"{self.name}_count {self.count}"
+
+
+class PipelineMetrics:
+    """The message pipeline's instruments, shared by the webhook and worker."""
+
+    def __init__(self) -> None:
+        self.enqueued = Counter(
+            "choresir_jobs_enqueued_total",
+            "Webhook messages received, by whether they were new or duplicates.",
+        )
+        self.queue_wait = Histogram(
+            "choresir_job_queue_wait_seconds",
+            "Time from enqueue to claim by a worker.",
+        )
+        self.processing_time = Histogram(
+            "choresir_job_processing_seconds",
+            "Time from claim to completion.",
+        )
+        self.queue_depth = Gauge(
+            "choresir_queue_depth",
+            "Message jobs in the queue, by status.",
+        )
+        self.dedup_lookups = Counter(
+            "choresir_webhook_dedup_lookups_total",
+            "Webhook checks of the recent message id cache, by hit or miss.",
+        )
+        self.admission = Counter(
+            "choresir_admission_decisions_total",
+            "Webhook admission decisions, by outcome.",
+        )
+        self.backlog_depth = Gauge(
+            "choresir_admission_backlog_depth",
+            "Active jobs as estimated by webhook admission control.",
+        )
+        self.backlog_oldest_age = Gauge(
+            "choresir_admission_backlog_oldest_age_seconds",
+            "Age of the oldest active job as estimated by admission control.",
+        )
+        self.rate_limit_deferrals = Counter(
+            "choresir_rate_limit_deferrals_total",
+            "Jobs held back because a rate limit was exhausted.",
+        )
+        self.expired = Counter(
+            "choresir_jobs_expired_total",
+            "Pending jobs dropped for outliving their priority lane's TTL.",
+        )
+        self.outbox_deliveries = Counter(
+            "choresir_outbox_deliveries_total",
+            "Outbound message delivery attempts, by outcome.",
+        )
+        self.failures = Counter(
+            "choresir_job_failures_total",
+            "Failed job attempts, by what happened to the job next.",
+        )
+        self.user_limiters = Gauge(
+            "choresir_user_limiters",
+            "Per-user rate limiters held in worker memory.",
+        )
+        self.user_limiter_evictions = Counter(
+            "choresir_user_limiter_evictions_total",
+            "Drained per-user rate limiters evicted from worker memory.",
+        )
+
+    def _metrics(self) -> list[_Metric]:
+        return [m for m in vars(self).values() if isinstance(m, _Metric)]
+
+    def render(self) -> str:
+        """Render every instrument in the Prometheus text exposition format."""
+        lines = [line for metric in self._metrics() for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+def create_metrics_router(
+    queue: JobQueue,
+    metrics: PipelineMetrics,
+    limiter: RateLimiter | None = None,
+) -> APIRouter:
+    """Create the router serving ``GET /metrics`` for the given instruments.
+
+    ``limiter`` is the workers' rate limiter, if this process runs them; an
+    in-memory one reports its per-user store at every scrape.
+    """
+    router = APIRouter()
+
+    @router.get("/metrics", response_class=PlainTextResponse)
+    async def get_metrics() -> PlainTextResponse:
+        """Refresh queue depth and limiter stats, then render all metrics."""
+        depth = await queue.depth()
+        for status in JobStatus:
+            metrics.queue_depth.set(depth.get(status, 0), status=status.value)
+        if isinstance(limiter, MemoryRateLimiter):
+            store = limiter.user_limiters
+            metrics.user_limiters.set(len(store))
+            metrics.user_limiter_evictions.set_total(store.evictions)
+        return PlainTextResponse(
+            metrics.render(), media_type="text/plain; version=0.0.4"
+        )
+
+    return router
@@ -1,12 +1,26 @@
 """SQLModel table definitions — re-exported for convenient imports."""
 
-from choresir.models.job import MessageJob
+from choresir.models.job import (
+    AgentCheckpoint,
+    ArchivedJob,
+    DeadLetterJob,
+    MessageJob,
+)
+from choresir.models.leader import LeaderLease
 from choresir.models.member import Member
+from choresir.models.outbox import OutboundMessage
+from choresir.models.rate_limit import RateLimitBucket
 from choresir.models.task import CompletionHistory, Task
 
 __all__ = [
+    "AgentCheckpoint",
+    "ArchivedJob",
     "CompletionHistory",
+    "DeadLetterJob",
+    "LeaderLease",
     "Member",
     "MessageJob",
+    "OutboundMessage",
+    "RateLimitBucket",
     "Task",
 ]
@@ -1,28 +1,87 @@
-"""MessageJob table model for the SQLite-backed job queue."""
+"""Job queue table models: jobs, dead letters, archive and agent checkpoints."""
 
 from __future__ import annotations
 
 from datetime import UTC, datetime
 
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel
 
-from choresir.enums import JobStatus
+from choresir.enums import JobPriority, JobStatus
 
 
 def _utcnow() -> datetime:
     return datetime.now(UTC)
 
 
+# Predicate of the partial claim index. SQLite only uses a partial index when
+# the query repeats its WHERE term verbatim with literals, so queries on
+# active jobs add this exact clause alongside their own status filter.
+ACTIVE_JOB = text("status IN ('PENDING', 'PROCESSING')")
+
+
 class MessageJob(SQLModel, table=True):
     """Queued WhatsApp message for async processing."""
 
+    __table_args__ = (
+        # Serves the claim query (equality on status, range on run_after) and
+        # covers only active rows, so its size tracks the backlog rather than
+        # every message ever received.
+        Index(
+            "ix_messagejob_active",
+            "status",
+            "run_after",
+            "created_at",
+            sqlite_where=ACTIVE_JOB,
+        ),
+    )
+
     id: str = Field(primary_key=True)
     sender_id: str = Field(index=True)
     group_id: str
     body: str
-    status: JobStatus = Field(default=JobStatus.PENDING, index=True)
+    status: JobStatus = Field(default=JobStatus.PENDING)
+    priority: int = Field(default=JobPriority.NORMAL)
     attempts: int = Field(default=0)
     run_after: datetime | None = None
     created_at: datetime = Field(default_factory=_utcnow)
     claimed_at: datetime | None = None
+    lease_expires_at: datetime | None = None
     completed_at: datetime | None = None
+
+
+class DeadLetterJob(SQLModel, table=True):
+    """A message job that exhausted its retries, kept for inspection and replay."""
+
+    id: str = Field(primary_key=True, foreign_key="messagejob.id")
+    sender_id: str
+    group_id: str
+    body: str
+    attempts: int
+    error: str
+    created_at: datetime
+    last_attempt_at: datetime
+    dead_at: datetime = Field(default_factory=_utcnow)
+
+
+class ArchivedJob(SQLModel, table=True):
+    """A finished message job moved out of the hot queue table by retention."""
+
+    id: str = Field(primary_key=True)
+    sender_id: str
+    group_id: str
+    body: bytes  # zlib-compressed UTF-8
+    status: JobStatus
+    attempts: int
+    created_at: datetime
+    completed_at: datetime | None = None
+    archived_at: datetime = Field(default_factory=_utcnow)
+
+
+class AgentCheckpoint(SQLModel, table=True):
+    """Message history of a job's unfinished agent run, so a retry can resume it."""
+
+    job_id: str = Field(primary_key=True)
+    prompt: str
+    messages: bytes  # pydantic-ai ModelMessagesTypeAdapter JSON
+    updated_at: datetime = Field(default_factory=_utcnow)
@@ -0,0 +1,13 @@
+"""LeaderLease table model for electing singleton roles across processes."""
+
+from __future__ import annotations
+
+from sqlmodel import Field, SQLModel
+
+
+class LeaderLease(SQLModel, table=True):
+    """The process currently leading a singleton role, and until when."""
+
+    name: str = Field(primary_key=True)
+    holder: str
+    expires_at: float  # Unix time the lease lapses unless renewed
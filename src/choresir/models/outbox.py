@@ -0,0 +1,28 @@
+"""OutboundMessage table model for the transactional reply outbox."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from sqlmodel import Field, SQLModel
+
+from choresir.enums import OutboxStatus
+
+
+def _utcnow() -> datetime:
+    return datetime.now(UTC)
+
+
+class OutboundMessage(SQLModel, table=True):
+    """A chat message committed for delivery by the outbox sender loop."""
+
+    id: int | None = Field(default=None, primary_key=True)
+    chat_id: str = Field(index=True)
+    text: str
+    status: OutboxStatus = Field(default=OutboxStatus.PENDING, index=True)
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime | None = None
+    lease_expires_at: datetime | None = None
+    last_error: str | None = None
+    created_at: datetime = Field(default_factory=_utcnow)
+    sent_at: datetime | None = None
@@ -0,0 +1,15 @@
+"""RateLimitBucket table model for shared token-bucket state."""
+
+from __future__ import annotations
+
+from sqlmodel import Field, SQLModel
+
+
+class RateLimitBucket(SQLModel, table=True):
+    """Token-bucket level shared by every process using the database."""
+
+    key: str = Field(primary_key=True)
+    tokens: float
+    capacity: float
+    rate: float  # tokens refilled per second
+    updated_at: float  # Unix time of the last refill
@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from datetime import UTC, datetime, timedelta
 
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
@@ -10,6 +12,8 @@ from choresir.enums import TaskStatus
 from choresir.services.member_service import MemberService
 from choresir.services.messaging import MessageSender, NullSender
 from choresir.services.task_service import TaskService
+from choresir.worker.outbox import purge_outbound
+from choresir.worker.queue import archive_finished_jobs
 
 logger = logging.getLogger(__name__)
 
@@ -157,3 +161,38 @@ async def reset_recurring_tasks(
         sender = NullSender()
         svc = TaskService(session, sender, max_takeovers_per_week=0)
         await svc.reset_recurring_tasks()
+
+
+async def archive_message_jobs(
+    session_factory: async_sessionmaker,
+    retention_days: int,
+    batch_size: int,
+) -> None:
+    """Move finished message jobs past the retention window to the archive.
+
+    Delivered and abandoned outbox messages past the window are deleted.
+
+    Each batch is its own short transaction, so webhook inserts and worker
+    claims get the write lock between batches instead of queueing behind
+    one long delete.
+    """
+    cutoff = datetime.now(UTC) - timedelta(days=retention_days)
+    total = 0
+    while True:
+        async with session_factory() as session:
+            moved = await archive_finished_jobs(session, cutoff, batch_size)
+        total += moved
+        if moved < batch_size:
+            break
+        await asyncio.sleep(0)
+    logger.info("Archived %d message jobs older than %d days", total, retention_days)
+
+    purged = 0
+    while True:
+        async with session_factory() as session:
+            deleted = await purge_outbound(session, cutoff, batch_size)
+        purged += deleted
+        if deleted < batch_size:
+            break
+        await asyncio.sleep(0)
+    logger.info("Purged %d delivered outbox messages", purged)
@@ -10,7 +10,9 @@ from apscheduler import AsyncScheduler, ConflictPolicy
 from apscheduler.triggers.cron import CronTrigger
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from choresir.config import Settings
 from choresir.scheduler.jobs import (
+    archive_message_jobs,
     reset_recurring_tasks,
     send_daily_personal_reminders,
     send_daily_summary,
@@ -88,3 +90,23 @@ async def register_schedules(
     )
     logger.info("Registered recurring_reset job every hour UTC")
     logger.info("All scheduler jobs registered")
+
+
+async def register_retention(
+    scheduler: AsyncScheduler,
+    session_factory: async_sessionmaker,
+    settings: Settings,
+) -> None:
+    """Register the nightly archival of finished message jobs."""
+    await scheduler.add_schedule(
+        functools.partial(
+            archive_message_jobs,
+            session_factory,
+            settings.job_retention_days,
+            settings.job_archive_batch_size,
+        ),
+        CronTrigger(hour=3, minute=30, timezone=UTC),
+        id="message_job_retention",
+        conflict_policy=_REPLACE,
+    )
+    logger.info("Registered message_job_retention job at 3:30 UTC")
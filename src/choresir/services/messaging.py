@@ -1,11 +1,14 @@
-"""Messaging service: protocol and WAHA implementation."""
+"""Messaging service: protocol, transactional outbox and WAHA implementation."""
 
 from __future__ import annotations
 
 import logging
+from collections.abc import Callable
 from typing import Protocol
 
 import httpx
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
 from tenacity import (
     retry,
     retry_if_exception_type,
@@ -13,6 +16,8 @@ from tenacity import (
     wait_exponential,
 )
 
+from choresir.models.outbox import OutboundMessage
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,6 +34,34 @@ class NullSender:
         pass
 
 
+class OutboxWriter:
+    """Queue messages in the transactional outbox instead of sending them.
+
+    Messages are added to ``session`` and go out only once it commits,
+    together with the state change that produced them; a rollback discards
+    them. ``on_commit`` is called after each commit that queued messages,
+    e.g. to wake the outbox sender loop.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        on_commit: Callable[[], None] | None = None,
+    ) -> None:
+        self._session = session
+        self._on_commit = on_commit
+
+    async def send(self, chat_id: str, text: str) -> None:
+        self._session.add(OutboundMessage(chat_id=chat_id, text=text))
+        if self._on_commit is not None:
+            event.listen(
+                self._session.sync_session,
+                "after_commit",
+                lambda _session: self._on_commit(),
+                once=True,
+            )
+
+
 class WAHAClient:
     """Send messages via the WAHA HTTP API."""
 
@@ -75,7 +108,11 @@ class WAHAClient:
         reraise=True,
     )
     async def send(self, chat_id: str, text: str) -> None:
-        """POST a text message to WAHA's /api/sendText endpoint."""
+        """POST a text message to WAHA's /api/sendText endpoint, with retries."""
+        await self.send_once(chat_id, text)
+
+    async def send_once(self, chat_id: str, text: str) -> None:
+        """Single sendText attempt, for callers that own their retry policy."""
         resp = await self._http.post(
             f"{self._base_url}/api/sendText",
             json={
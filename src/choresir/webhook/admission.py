@@ -0,0 +1,109 @@
+"""Backlog-aware admission control for incoming messages."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import UTC, datetime
+
+from choresir.config import Settings
+from choresir.enums import AdmissionDecision, JobPriority
+from choresir.metrics import PipelineMetrics
+from choresir.worker.backends import JobQueue
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """Sheds non-essential load at the webhook when the worker falls behind.
+
+    Keeps an estimate of the active backlog (depth and oldest job's age) that
+    is re-read from the queue at most every ``admission_refresh_seconds`` and
+    bumped locally for each enqueue in between, so the hot path costs no
+    query. HIGH-lane messages are always accepted; past the deprioritize
+    thresholds the rest drop to the LOW lane, and past the reject thresholds
+    they are stored as REJECTED for audit but never processed.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        settings: Settings,
+        metrics: PipelineMetrics | None = None,
+    ) -> None:
+        self._queue = queue
+        self._settings = settings
+        self._metrics = metrics
+        self._lock = asyncio.Lock()
+        self._refreshed_at: float | None = None
+        self.depth = 0
+        self.oldest: datetime | None = None
+
+    def oldest_age_seconds(self) -> float:
+        if self.oldest is None:
+            return 0.0
+        return max((datetime.now(UTC) - self.oldest).total_seconds(), 0.0)
+
+    async def admit(
+        self, priority: JobPriority
+    ) -> tuple[AdmissionDecision, JobPriority]:
+        """Decide how to enqueue a message of ``priority``; return the lane to use."""
+        await self._refresh_if_stale()
+        decision = self.decide(priority)
+        if decision == AdmissionDecision.DEPRIORITIZED:
+            priority = JobPriority.LOW
+        if self._metrics is not None:
+            self._metrics.admission.inc(decision=decision.value)
+        return decision, priority
+
+    def decide(self, priority: JobPriority) -> AdmissionDecision:
+        """Classify a message against the current backlog estimate."""
+        if priority >= JobPriority.HIGH:
+            return AdmissionDecision.ACCEPTED
+        settings = self._settings
+        age = self.oldest_age_seconds()
+        if (
+            self.depth >= settings.admission_reject_depth
+            or age >= settings.admission_reject_age_seconds
+        ):
+            return AdmissionDecision.REJECTED
+        if (
+            self.depth >= settings.admission_deprioritize_depth
+            or age >= settings.admission_deprioritize_age_seconds
+        ):
+            return AdmissionDecision.DEPRIORITIZED
+        return AdmissionDecision.ACCEPTED
+
+    def record_enqueued(self) -> None:
+        """Count a newly enqueued job until the next refresh re-reads the queue."""
+        self.depth += 1
+        if self.oldest is None:
+            self.oldest = datetime.now(UTC)
+        self._publish()
+
+    async def _refresh_if_stale(self) -> None:
+        interval = self._settings.admission_refresh_seconds
+        if self._fresh(interval):
+            return
+        async with self._lock:
+            if self._fresh(interval):
+                return
+            try:
+                self.depth, self.oldest = await self._queue.backlog()
+            except Exception:
+                # Keep admitting on the stale estimate rather than fail the hook.
+                logger.exception("Error refreshing backlog estimate")
+            self._refreshed_at = time.monotonic()
+            self._publish()
+
+    def _fresh(self, interval: float) -> bool:
+        return (
+            self._refreshed_at is not None
+            and time.monotonic() - self._refreshed_at < interval
+        )
+
+    def _publish(self) -> None:
+        if self._metrics is not None:
+            self._metrics.backlog_depth.set(self.depth)
+            self._metrics.backlog_oldest_age.set(self.oldest_age_seconds())
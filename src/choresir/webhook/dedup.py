@@ -0,0 +1,45 @@
+"""Recently seen message ids, to answer webhook redeliveries from memory."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+
+
+class RecentMessageIds:
+    """Bounded, time-windowed set of message ids the webhook already stored.
+
+    WAHA redelivers a webhook when our response is slow, typically within
+    seconds, so a short window catches nearly every duplicate without a
+    write transaction. Ids are kept in insertion order and dropped once
+    older than ``ttl_seconds`` or beyond ``max_entries``. A miss proves
+    nothing: the job table's primary key stays the source of truth.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._seen_at: OrderedDict[str, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._seen_at)
+
+    def seen(self, message_id: str) -> bool:
+        """True if ``message_id`` was stored within the window."""
+        seen_at = self._seen_at.get(message_id)
+        return seen_at is not None and time.monotonic() - seen_at < self._ttl_seconds
+
+    def add(self, message_id: str) -> None:
+        """Remember ``message_id`` as stored, refreshing its window."""
+        now = time.monotonic()
+        self._seen_at.pop(message_id, None)
+        self._seen_at[message_id] = now
+        self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        while self._seen_at:
+            message_id, seen_at = next(iter(self._seen_at.items()))
+            over_capacity = len(self._seen_at) > self._max_entries
+            if not over_capacity and now - seen_at < self._ttl_seconds:
+                return
+            del self._seen_at[message_id]
@@ -0,0 +1,76 @@
+"""Typed decoding of the WAHA webhook events the service acts on."""
+
+from __future__ import annotations
+
+from typing import Annotated, Literal
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+
+class QuotedMessage(BaseModel):
+    """The message a reply quotes; only its author matters here."""
+
+    participant: str | None = None
+
+
+class MessagePayload(BaseModel):
+    """A received WhatsApp message.
+
+    In group chats ``from_`` is the group and ``participant`` the author;
+    in direct chats ``from_`` is the author and ``to`` the bot.
+    """
+
+    id: str = ""
+    from_: str = Field("", alias="from")
+    to: str = ""
+    body: str = ""
+    from_me: bool = Field(False, alias="fromMe")
+    participant: str | None = None
+    reply_to: QuotedMessage | None = Field(None, alias="replyTo")
+
+
+class Account(BaseModel):
+    """The WhatsApp account the WAHA session runs as."""
+
+    id: str | None = None
+
+
+class MessageEvent(BaseModel):
+    event: Literal["message"]
+    payload: MessagePayload = Field(default_factory=MessagePayload)
+    me: Account | None = None
+
+
+class GroupJoinPayload(BaseModel):
+    recipients: list[str] = Field(default_factory=list)
+
+
+class GroupJoinEvent(BaseModel):
+    event: Literal["group.v2.join"]
+    payload: GroupJoinPayload = Field(default_factory=GroupJoinPayload)
+
+
+type WebhookEvent = MessageEvent | GroupJoinEvent
+
+# Validated straight from the request bytes, dispatched on "event". Fields
+# not declared above, such as the bulky "_data" blob, are skipped rather
+# than built into Python objects.
+_events: TypeAdapter[WebhookEvent] = TypeAdapter(
+    Annotated[MessageEvent | GroupJoinEvent, Field(discriminator="event")]
+)
+
+
+def decode_event(body: bytes) -> WebhookEvent | None:
+    """Decode a webhook body, or return None for events the service ignores.
+
+    Raises ``ValidationError`` for malformed JSON or a known event whose
+    fields have the wrong types.
+    """
+    try:
+        return _events.validate_json(body)
+    except ValidationError as exc:
+        errors = exc.errors()
+        untagged = ("union_tag_invalid", "union_tag_not_found")
+        if len(errors) == 1 and errors[0]["type"] in untagged:
+            return None
+        raise
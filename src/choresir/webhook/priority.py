@@ -0,0 +1,67 @@
+"""Priority lane assignment for incoming WhatsApp messages."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from choresir.config import Settings
+from choresir.enums import JobPriority, MemberRole, MemberStatus
+from choresir.models.member import Member
+from choresir.webhook.payloads import MessageEvent
+
+
+def _user_part(whatsapp_id: str) -> str:
+    return whatsapp_id.split("@", 1)[0]
+
+
+def is_reply_to_bot(event: MessageEvent) -> bool:
+    """True when a WAHA message event quotes a message the bot sent."""
+    bot_id = event.me.id if event.me else None
+    quoted = event.payload.reply_to
+    author = quoted.participant if quoted else None
+    # WAHA may report the same account as @c.us or @lid, so match the number.
+    return bool(bot_id and author) and _user_part(author) == _user_part(bot_id)
+
+
+@dataclass(frozen=True)
+class PriorityRules:
+    """Which lane each kind of message is enqueued in.
+
+    When several rules match, the highest lane wins; messages matching no
+    rule go to ``default``.
+    """
+
+    default: JobPriority = JobPriority.NORMAL
+    direct_message: JobPriority = JobPriority.HIGH
+    admin: JobPriority = JobPriority.HIGH
+    onboarding: JobPriority = JobPriority.HIGH
+    bot_reply: JobPriority = JobPriority.HIGH
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> PriorityRules:
+        return cls(
+            default=settings.job_priority_default,
+            direct_message=settings.job_priority_direct_message,
+            admin=settings.job_priority_admin,
+            onboarding=settings.job_priority_onboarding,
+            bot_reply=settings.job_priority_bot_reply,
+        )
+
+    def assign(
+        self,
+        *,
+        direct: bool,
+        member: Member | None,
+        replies_to_bot: bool,
+    ) -> JobPriority:
+        """Pick the lane for a message from its chat, author and context."""
+        matched: list[JobPriority] = []
+        if direct:
+            matched.append(self.direct_message)
+        if member is not None and member.role == MemberRole.ADMIN:
+            matched.append(self.admin)
+        if member is not None and member.status == MemberStatus.PENDING:
+            matched.append(self.onboarding)
+        if replies_to_bot:
+            matched.append(self.bot_reply)
+        return max(matched, default=self.default)
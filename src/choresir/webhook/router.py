@@ -2,26 +2,45 @@
 
 from __future__ import annotations
 
-import json
-from typing import Any
+from datetime import UTC, datetime
 
 from fastapi import APIRouter, Request
-from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from choresir.errors import WebhookAuthError
+from choresir.enums import AdmissionDecision, JobStatus
+from choresir.errors import NotFoundError, WebhookAuthError
+from choresir.metrics import PipelineMetrics
 from choresir.models.job import MessageJob
 from choresir.services.member_service import MemberService
+from choresir.webhook.admission import AdmissionController
 from choresir.webhook.auth import validate_webhook
+from choresir.webhook.dedup import RecentMessageIds
+from choresir.webhook.payloads import GroupJoinEvent, decode_event
+from choresir.webhook.priority import PriorityRules, is_reply_to_bot
+from choresir.worker.backends import JobQueue, SQLiteJobQueue
+from choresir.worker.notifier import JobNotifier
 
 
 def create_webhook_router(
     session_factory: async_sessionmaker[AsyncSession],
     webhook_secret: str,
+    notifier: JobNotifier | None = None,
+    metrics: PipelineMetrics | None = None,
+    priority_rules: PriorityRules | None = None,
+    admission: AdmissionController | None = None,
+    queue: JobQueue | None = None,
+    recent_ids: RecentMessageIds | None = None,
 ) -> APIRouter:
-    """Create and return the webhook router with closed-over dependencies."""
+    """Create and return the webhook router with closed-over dependencies.
+
+    Jobs go to ``queue``, by default the SQLite queue on ``session_factory``;
+    pass the worker's queue when using another backend. With ``recent_ids``,
+    redeliveries of a message stored moments ago are answered from memory.
+    """
     router = APIRouter()
+    rules = priority_rules or PriorityRules()
+    jobs = queue or SQLiteJobQueue(session_factory)
 
     @router.post("/webhook")
     async def receive_webhook(request: Request) -> dict[str, str]:
@@ -34,51 +53,89 @@ def create_webhook_router(
         if not validate_webhook(body, signature, webhook_secret):
             raise WebhookAuthError("Invalid webhook signature")
 
-        payload: dict[str, Any] = json.loads(body)
+        event = decode_event(body)
+
+        # Handle group.v2.join events for auto-registration
+        if isinstance(event, GroupJoinEvent):
+            async with session_factory() as session:
+                member_service = MemberService(session)
+                for whatsapp_id in event.payload.recipients:
+                    await member_service.register_pending(whatsapp_id)
+            return {"status": "ok"}
 
         # Only process "message" events
-        if payload.get("event") != "message":
-            # Handle group.v2.join events for auto-registration
-            if payload.get("event") == "group.v2.join":
-                recipients: list[str] = payload.get("payload", {}).get("recipients", [])
-                async with session_factory() as session:
-                    member_service = MemberService(session)
-                    for whatsapp_id in recipients:
-                        await member_service.register_pending(whatsapp_id)
+        if event is None:
             return {"status": "ok"}
 
-        message = payload.get("payload", {})
+        message = event.payload
 
         # Filter out messages sent by the bot itself
-        if message.get("fromMe", False):
+        if message.from_me:
             return {"status": "ok"}
 
-        message_id: str = message.get("id", "")
-        from_id: str = message.get("from", "")
-        to_id: str = message.get("to", "")
-        message_body: str = message.get("body", "")
+        message_id = message.id
+        from_id = message.from_
+        to_id = message.to
+        message_body = message.body
+
+        if recent_ids is not None and message_id:
+            hit = recent_ids.seen(message_id)
+            if metrics is not None:
+                metrics.dedup_lookups.inc(result="hit" if hit else "miss")
+            if hit:
+                if metrics is not None:
+                    metrics.enqueued.inc(outcome="duplicate")
+                return {"status": "ok"}
 
         # In group messages, "from" is the group JID and the actual
         # sender is in "participant".  For DMs, "from" is the sender.
-        if from_id.endswith("@g.us"):
-            group_id = from_id
-            sender_id = message.get("participant", from_id)
-        else:
+        direct = not from_id.endswith("@g.us")
+        if direct:
             sender_id = from_id
             group_id = to_id
+        else:
+            group_id = from_id
+            sender_id = message.participant or from_id
 
-        # INSERT OR IGNORE for deduplication via primary key
-        stmt = sqlite_insert(MessageJob).values(
-            id=message_id,
-            sender_id=sender_id,
-            group_id=group_id,
-            body=message_body,
+        async with session_factory() as session:
+            try:
+                member = await MemberService(session).get_by_whatsapp_id(sender_id)
+            except NotFoundError:
+                member = None
+            priority = rules.assign(
+                direct=direct,
+                member=member,
+                replies_to_bot=is_reply_to_bot(event),
+            )
+            decision = AdmissionDecision.ACCEPTED
+            if admission is not None:
+                decision, priority = await admission.admit(priority)
+        rejected = decision == AdmissionDecision.REJECTED
+
+        # Duplicate message ids are dropped. Rejected messages are stored
+        # already terminal, for audit only.
+        new = await jobs.enqueue(
+            MessageJob(
+                id=message_id,
+                sender_id=sender_id,
+                group_id=group_id,
+                body=message_body,
+                priority=priority,
+                status=JobStatus.REJECTED if rejected else JobStatus.PENDING,
+                completed_at=datetime.now(UTC) if rejected else None,
+            )
         )
-        stmt = stmt.on_conflict_do_nothing(index_elements=["id"])
 
-        async with session_factory() as session:
-            await session.exec(stmt)
-            await session.commit()
+        if recent_ids is not None and message_id:
+            recent_ids.add(message_id)
+        queued = new and not rejected
+        if metrics is not None:
+            outcome = "queued" if new else "duplicate"
+            metrics.enqueued.inc(outcome="rejected" if rejected else outcome)
+        if queued and admission is not None:
+            admission.record_enqueued()
+        if queued and notifier is not None:
+            notifier.notify()
 
         return {"status": "ok"}
 
@@ -0,0 +1,528 @@
+"""Job queue backends: the durable SQLite queue and an in-memory one."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import Counter, defaultdict
+from collections.abc import Callable, Collection, Mapping
+from datetime import UTC, datetime, timedelta
+from typing import Protocol
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from choresir.config import Settings
+from choresir.enums import JobStatus, QueueBackend
+from choresir.errors import LeaseLostError
+from choresir.models.job import DeadLetterJob, MessageJob
+from choresir.worker import queue
+from choresir.worker.queue import DEFAULT_MAX_WAIT_SECONDS
+
+
+class JobQueue(Protocol):
+    """Storage for message jobs between the webhook and the worker pool.
+
+    Methods that finish a job attempt take the job's ``session``: the one
+    ``process_fn`` ran the agent on. A backend commits it with the state
+    change, atomically where it can. They are fenced on the claim that
+    returned the job: if its lease lapsed and the job was reaped or claimed
+    again, they raise ``LeaseLostError`` and commit nothing.
+    """
+
+    async def enqueue(self, job: MessageJob) -> bool:
+        """Add a job unless its id was seen before; return True if it was new."""
+        ...
+
+    async def claim(
+        self,
+        limit: int,
+        lease_seconds: int,
+        *,
+        sender_id: str | None = None,
+        group_id: str | None = None,
+        max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+    ) -> list[MessageJob]:
+        """Lease up to ``limit`` ready jobs; see ``queue.claim_jobs``."""
+        ...
+
+    async def complete(
+        self, session: AsyncSession, jobs: Collection[MessageJob]
+    ) -> None: ...
+
+    async def absorb(
+        self, session: AsyncSession, head: MessageJob, jobs: Collection[MessageJob]
+    ) -> None:
+        """Fold coalesced ``jobs`` into ``head``; see ``queue.absorb_jobs``."""
+        ...
+
+    async def defer(
+        self, session: AsyncSession, job: MessageJob, delay_seconds: float
+    ) -> None: ...
+
+    async def retry(
+        self, session: AsyncSession, job: MessageJob, delay_seconds: float
+    ) -> None: ...
+
+    async def fail(self, session: AsyncSession, job: MessageJob, error: str) -> None:
+        """Mark a job FAILED and dead-letter it with ``error``."""
+        ...
+
+    async def extend_leases(
+        self, jobs: Collection[MessageJob], lease_seconds: int
+    ) -> set[str]:
+        """Extend leases still held on these claims; return the ids lost."""
+        ...
+
+    async def release_leases(self, jobs: Collection[MessageJob]) -> int:
+        """Return unfinished claimed jobs to pending; return how many were."""
+        ...
+
+    async def reap_expired_leases(self, max_attempts: int) -> int: ...
+
+    async def replay_dead_letters(
+        self,
+        job_ids: Collection[str] | None = None,
+        on_commit: Callable[[], None] | None = None,
+    ) -> int:
+        """Requeue dead letters; see ``queue.replay_dead_letters``."""
+        ...
+
+    async def expire_stale(
+        self, ttl_seconds: Mapping[int, float], *, catch_up: bool = False
+    ) -> int: ...
+
+    async def next_run_after(self) -> datetime | None: ...
+
+    async def depth(self) -> dict[JobStatus, int]: ...
+
+    async def backlog(self) -> tuple[int, datetime | None]:
+        """Return the number of active jobs and the oldest one's ``created_at``."""
+        ...
+
+
+# A job waiting for the next group commit, and where its outcome goes.
+type _PendingEnqueue = tuple[MessageJob, asyncio.Future[bool]]
+
+
+class SQLiteJobQueue:
+    """The durable queue: ``messagejob`` rows, via the functions in ``queue``.
+
+    With ``group_commit_seconds`` set, enqueues are group-committed. One
+    arriving while no commit is in flight is committed at once; those that
+    arrive behind it wait until that commit finishes, or at most
+    ``group_commit_seconds``, and then up to ``group_commit_max_jobs`` are
+    inserted in a single transaction. Each caller still returns only after
+    its row is committed, so a burst of webhooks shares one fsync on
+    SQLite's single writer instead of queueing for one each, and a lone
+    webhook pays no wait.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        group_commit_seconds: float = 0.0,
+        group_commit_max_jobs: int = 100,
+    ) -> None:
+        self._session_factory = session_factory
+        self._group_commit_seconds = group_commit_seconds
+        self._group_commit_max_jobs = group_commit_max_jobs
+        self._pending: list[_PendingEnqueue] = []
+        self._flush_timer: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task[None]] = set()
+
+    async def enqueue(self, job: MessageJob) -> bool:
+        if self._group_commit_seconds <= 0:
+            async with self._session_factory() as session:
+                return await queue.enqueue_job(session, job)
+        loop = asyncio.get_running_loop()
+        new = loop.create_future()
+        self._pending.append((job, new))
+        if len(self._pending) >= self._group_commit_max_jobs or not self._flushes:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(
+                self._group_commit_seconds, self._flush
+            )
+        # A caller that gives up still has its job committed with the batch.
+        return await asyncio.shield(new)
+
+    def _flush(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._commit(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushed)
+
+    def _flushed(self, task: asyncio.Task[None]) -> None:
+        self._flushes.discard(task)
+        if self._pending and not self._flushes:
+            self._flush()
+
+    async def _commit(self, batch: list[_PendingEnqueue]) -> None:
+        try:
+            async with self._session_factory() as session:
+                results = await queue.enqueue_jobs(session, [job for job, _ in batch])
+        except Exception as exc:
+            for _, new in batch:
+                new.set_exception(exc)
+            return
+        for (_, new), result in zip(batch, results, strict=True):
+            new.set_result(result)
+
+    async def claim(
+        self,
+        limit: int,
+        lease_seconds: int,
+        *,
+        sender_id: str | None = None,
+        group_id: str | None = None,
+        max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+    ) -> list[MessageJob]:
+        async with self._session_factory() as session:
+            return await queue.claim_jobs(
+                session,
+                limit,
+                lease_seconds,
+                sender_id=sender_id,
+                group_id=group_id,
+                max_wait_seconds=max_wait_seconds,
+            )
+
+    async def complete(
+        self, session: AsyncSession, jobs: Collection[MessageJob]
+    ) -> None:
+        await queue.complete_jobs(session, jobs)
+
+    async def absorb(
+        self, session: AsyncSession, head: MessageJob, jobs: Collection[MessageJob]
+    ) -> None:
+        await queue.absorb_jobs(session, head, jobs)
+
+    async def defer(
+        self, session: AsyncSession, job: MessageJob, delay_seconds: float
+    ) -> None:
+        await queue.defer_job(session, job, delay_seconds)
+
+    async def retry(
+        self, session: AsyncSession, job: MessageJob, delay_seconds: float
+    ) -> None:
+        await queue.retry_job(session, job, delay_seconds)
+
+    async def fail(self, session: AsyncSession, job: MessageJob, error: str) -> None:
+        await queue.dead_letter_job(session, job, error)
+
+    async def extend_leases(
+        self, jobs: Collection[MessageJob], lease_seconds: int
+    ) -> set[str]:
+        async with self._session_factory() as session:
+            return await queue.extend_leases(session, jobs, lease_seconds)
+
+    async def release_leases(self, jobs: Collection[MessageJob]) -> int:
+        async with self._session_factory() as session:
+            return await queue.release_leases(session, jobs)
+
+    async def reap_expired_leases(self, max_attempts: int) -> int:
+        async with self._session_factory() as session:
+            return await queue.reap_expired_leases(session, max_attempts)
+
+    async def replay_dead_letters(
+        self,
+        job_ids: Collection[str] | None = None,
+        on_commit: Callable[[], None] | None = None,
+    ) -> int:
+        async with self._session_factory() as session:
+            return await queue.replay_dead_letters(session, job_ids, on_commit)
+
+    async def expire_stale(
+        self, ttl_seconds: Mapping[int, float], *, catch_up: bool = False
+    ) -> int:
+        async with self._session_factory() as session:
+            return await queue.expire_stale_jobs(
+                session, ttl_seconds, catch_up=catch_up
+            )
+
+    async def next_run_after(self) -> datetime | None:
+        async with self._session_factory() as session:
+            return await queue.next_run_after(session)
+
+    async def depth(self) -> dict[JobStatus, int]:
+        async with self._session_factory() as session:
+            return await queue.queue_depth(session)
+
+    async def backlog(self) -> tuple[int, datetime | None]:
+        async with self._session_factory() as session:
+            return await queue.backlog_stats(session)
+
+
+_ACTIVE = (JobStatus.PENDING, JobStatus.PROCESSING)
+
+
+def _copy(job: MessageJob) -> MessageJob:
+    return MessageJob(**job.model_dump())
+
+
+class MemoryJobQueue:
+    """Process-local queue with the SQLite backend's semantics, minus durability.
+
+    Jobs live in a dict for the life of the process, so ids stay
+    deduplicated but nothing survives a restart; meant for benchmarks,
+    tests and ephemeral demo deployments. Every operation runs without
+    awaiting, so it is atomic on the event loop. Callers get copies of
+    stored jobs, as they would get detached rows from SQLite.
+    """
+
+    def __init__(self) -> None:
+        self._jobs: dict[str, MessageJob] = {}
+        self.dead_letters: dict[str, DeadLetterJob] = {}
+
+    async def enqueue(self, job: MessageJob) -> bool:
+        if job.id in self._jobs:
+            return False
+        stored = _copy(job)
+        if stored.created_at.tzinfo is None:
+            stored.created_at = stored.created_at.replace(tzinfo=UTC)
+        self._jobs[job.id] = stored
+        return True
+
+    async def claim(
+        self,
+        limit: int,
+        lease_seconds: int,
+        *,
+        sender_id: str | None = None,
+        group_id: str | None = None,
+        max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+    ) -> list[MessageJob]:
+        now = datetime.now(UTC)
+        starved_before = now - timedelta(seconds=max_wait_seconds)
+        ready = [
+            job
+            for job in self._jobs.values()
+            if job.status == JobStatus.PENDING
+            and (job.run_after is None or job.run_after <= now)
+            and (sender_id is None or job.sender_id == sender_id)
+            and (group_id is None or job.group_id == group_id)
+        ]
+        ready.sort(
+            key=lambda job: (
+                job.created_at > starved_before,
+                -job.priority,
+                job.created_at,
+            )
+        )
+        claimed = []
+        for job in ready[:limit]:
+            job.status = JobStatus.PROCESSING
+            job.claimed_at = now
+            job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+            claimed.append(_copy(job))
+        return queue.fifo_per_sender(claimed)
+
+    async def complete(
+        self, session: AsyncSession, jobs: Collection[MessageJob]
+    ) -> None:
+        self._check_held(jobs)
+        # Commit the agent's writes first; a crash in between re-runs the job.
+        await session.commit()
+        now = datetime.now(UTC)
+        for job in jobs:
+            self._update(
+                job.id, status=JobStatus.DONE, completed_at=now, lease_expires_at=None
+            )
+
+    async def absorb(
+        self, session: AsyncSession, head: MessageJob, jobs: Collection[MessageJob]
+    ) -> None:
+        self._check_held([head, *jobs])
+        now = datetime.now(UTC)
+        for job in jobs:
+            self._update(
+                job.id, status=JobStatus.DONE, completed_at=now, lease_expires_at=None
+            )
+        self._update(head.id, body=head.body, priority=head.priority)
+
+    async def defer(
+        self, session: AsyncSession, job: MessageJob, delay_seconds: float
+    ) -> None:
+        self._check_held([job])
+        self._update(
+            job.id,
+            status=JobStatus.PENDING,
+            run_after=datetime.now(UTC) + timedelta(seconds=delay_seconds),
+            lease_expires_at=None,
+        )
+
+    async def retry(
+        self, session: AsyncSession, job: MessageJob, delay_seconds: float
+    ) -> None:
+        self._check_held([job])
+        self._update(
+            job.id,
+            status=JobStatus.PENDING,
+            attempts=self._jobs[job.id].attempts + 1,
+            run_after=datetime.now(UTC) + timedelta(seconds=delay_seconds),
+            lease_expires_at=None,
+        )
+
+    async def fail(self, session: AsyncSession, job: MessageJob, error: str) -> None:
+        self._check_held([job])
+        self._dead_letter(job, error, datetime.now(UTC))
+
+    async def extend_leases(
+        self, jobs: Collection[MessageJob], lease_seconds: int
+    ) -> set[str]:
+        expires = datetime.now(UTC) + timedelta(seconds=lease_seconds)
+        lost = set()
+        for job in jobs:
+            if self._holds(job):
+                self._jobs[job.id].lease_expires_at = expires
+            else:
+                lost.add(job.id)
+        return lost
+
+    async def release_leases(self, jobs: Collection[MessageJob]) -> int:
+        released = 0
+        for held in jobs:
+            if self._holds(held):
+                job = self._jobs[held.id]
+                job.status = JobStatus.PENDING
+                job.lease_expires_at = None
+                released += 1
+        return released
+
+    async def reap_expired_leases(self, max_attempts: int) -> int:
+        now = datetime.now(UTC)
+        expired = [
+            job
+            for job in self._jobs.values()
+            if job.status == JobStatus.PROCESSING
+            and job.lease_expires_at is not None
+            and job.lease_expires_at < now
+        ]
+        for job in expired:
+            if job.attempts + 1 >= max_attempts:
+                self._dead_letter(job, queue.LEASE_EXPIRED_ERROR, now)
+                continue
+            job.status = JobStatus.PENDING
+            job.attempts += 1
+            job.run_after = None
+            job.lease_expires_at = None
+        return len(expired)
+
+    async def replay_dead_letters(
+        self,
+        job_ids: Collection[str] | None = None,
+        on_commit: Callable[[], None] | None = None,
+    ) -> int:
+        ids = [
+            job_id
+            for job_id in self.dead_letters
+            if job_ids is None or job_id in job_ids
+        ]
+        for job_id in ids:
+            del self.dead_letters[job_id]
+            self._update(
+                job_id,
+                status=JobStatus.PENDING,
+                attempts=0,
+                run_after=None,
+                claimed_at=None,
+                lease_expires_at=None,
+            )
+        if ids and on_commit is not None:
+            on_commit()
+        return len(ids)
+
+    async def expire_stale(
+        self, ttl_seconds: Mapping[int, float], *, catch_up: bool = False
+    ) -> int:
+        now = datetime.now(UTC)
+        stale = sorted(
+            (
+                job
+                for job in self._jobs.values()
+                if job.status == JobStatus.PENDING
+                and ttl_seconds.get(job.priority, 0) > 0
+                and job.created_at < now - timedelta(seconds=ttl_seconds[job.priority])
+            ),
+            key=lambda job: job.created_at,
+        )
+        if catch_up:
+            conversations: dict[tuple[str, str], list[MessageJob]] = defaultdict(list)
+            for job in stale:
+                conversations[(job.sender_id, job.group_id)].append(job)
+            for jobs in conversations.values():
+                head = jobs.pop()
+                head.body = queue.catch_up_body([*jobs, head])
+                stale = [job for job in stale if job is not head]
+        for job in stale:
+            job.status = JobStatus.EXPIRED
+            job.completed_at = now
+        return len(stale)
+
+    async def next_run_after(self) -> datetime | None:
+        return min(
+            (
+                job.run_after
+                for job in self._jobs.values()
+                if job.status == JobStatus.PENDING and job.run_after is not None
+            ),
+            default=None,
+        )
+
+    async def depth(self) -> dict[JobStatus, int]:
+        return dict(Counter(job.status for job in self._jobs.values()))
+
+    async def backlog(self) -> tuple[int, datetime | None]:
+        active = [job for job in self._jobs.values() if job.status in _ACTIVE]
+        return len(active), min((job.created_at for job in active), default=None)
+
+    def _check_held(self, jobs: Collection[MessageJob]) -> None:
+        """Raise ``LeaseLostError`` unless every job's claim is still current."""
+        lost = [job.id for job in jobs if not self._holds(job)]
+        if lost:
+            raise LeaseLostError(lost)
+
+    def _holds(self, job: MessageJob) -> bool:
+        stored = self._jobs.get(job.id)
+        return (
+            stored is not None
+            and stored.status == JobStatus.PROCESSING
+            and stored.claimed_at == job.claimed_at
+        )
+
+    def _update(self, job_id: str, **values: object) -> None:
+        job = self._jobs[job_id]
+        for field, value in values.items():
+            setattr(job, field, value)
+
+    def _dead_letter(self, job: MessageJob, error: str, now: datetime) -> None:
+        stored = self._jobs[job.id]
+        self.dead_letters[job.id] = DeadLetterJob(
+            id=job.id,
+            sender_id=job.sender_id,
+            group_id=job.group_id,
+            body=job.body,
+            attempts=job.attempts + 1,
+            error=error,
+            created_at=job.created_at,
+            last_attempt_at=job.claimed_at or now,
+            dead_at=now,
+        )
+        stored.status = JobStatus.FAILED
+        stored.attempts = job.attempts + 1
+        stored.lease_expires_at = None
+
+
+def create_job_queue(
+    settings: Settings, session_factory: async_sessionmaker
+) -> JobQueue:
+    """Build the job queue selected by ``settings.queue_backend``."""
+    if settings.queue_backend == QueueBackend.MEMORY:
+        return MemoryJobQueue()
+    return SQLiteJobQueue(
+        session_factory,
+        settings.ingest_group_commit_seconds,
+        settings.ingest_group_commit_max_jobs,
+    )
@@ -0,0 +1,221 @@
+"""Global and per-user rate limiters, in process memory or shared via SQLite."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Protocol
+
+from aiolimiter import AsyncLimiter
+from sqlalchemy import ColumnElement, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import aliased
+from sqlmodel import col
+
+from choresir.config import Settings
+from choresir.enums import RateLimitBackend
+from choresir.models.rate_limit import RateLimitBucket
+
+GLOBAL_BUCKET_KEY = "global"
+
+
+def _is_drained(limiter: AsyncLimiter) -> bool:
+    """True when the bucket has fully leaked, i.e. a fresh limiter is equivalent."""
+    return limiter.has_capacity(limiter.max_rate)
+
+
+class UserLimiterStore:
+    """LRU map of per-user AsyncLimiters with safe eviction.
+
+    ``max_entries`` is a hard cap. Past it the least recently used entry
+    whose bucket has drained is evicted, since recreating it later hands
+    back exactly the capacity it would have had; only when every bucket is
+    still draining does the oldest go regardless, letting that sender shed
+    the rest of their throttle rather than letting the store grow. Under the
+    cap, drained entries idle for a full rate period are evicted too.
+    """
+
+    def __init__(self, max_rate: float, time_period: float, max_entries: int) -> None:
+        self._max_rate = max_rate
+        self._time_period = time_period
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[AsyncLimiter, float]] = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._entries
+
+    def get(self, user_id: str) -> AsyncLimiter:
+        """Return the user's limiter, creating it lazily and marking it used."""
+        now = time.monotonic()
+        entry = self._entries.pop(user_id, None)
+        limiter = entry[0] if entry else AsyncLimiter(self._max_rate, self._time_period)
+        self._entries[user_id] = (limiter, now)
+        self._evict(now)
+        return limiter
+
+    def _evict(self, now: float) -> None:
+        while len(self._entries) > max(self._max_entries, 1):
+            # Never the entry just handed out, which is last.
+            candidates = islice(self._entries.items(), len(self._entries) - 1)
+            drained = (uid for uid, (lim, _) in candidates if _is_drained(lim))
+            del self._entries[next(drained, next(iter(self._entries)))]
+            self.evictions += 1
+        while len(self._entries) > 1:
+            user_id, (limiter, last_used) = next(iter(self._entries.items()))
+            if now - last_used < self._time_period or not _is_drained(limiter):
+                return
+            del self._entries[user_id]
+            self.evictions += 1
+
+
+def seconds_until_capacity(limiter: AsyncLimiter, amount: float = 1) -> float:
+    """Return how long until ``limiter`` can admit ``amount``, 0 if it can now."""
+    if limiter.has_capacity(amount):
+        return 0.0
+    # has_capacity() has just leaked the bucket up to now, so the current level
+    # is exact. aiolimiter exposes no public ETA, hence the private read.
+    rate = limiter.max_rate / limiter.time_period
+    return (limiter._level + amount - limiter.max_rate) / rate
+
+
+class RateLimiter(Protocol):
+    """Admission control for one message against the global and sender limits."""
+
+    async def acquire(self, sender_id: str) -> float:
+        """Take one global and one per-sender token, or report the wait.
+
+        Returns 0 once both tokens are taken. Otherwise takes nothing and
+        returns the seconds until both limits can admit the sender again.
+        """
+        ...
+
+
+class MemoryRateLimiter:
+    """Process-local limiters; the fast path for a single worker process."""
+
+    def __init__(self, settings: Settings) -> None:
+        self.global_limiter = AsyncLimiter(
+            settings.global_rate_limit_count,
+            settings.global_rate_limit_seconds,
+        )
+        self.user_limiters = UserLimiterStore(
+            settings.per_user_rate_limit_count,
+            settings.per_user_rate_limit_seconds,
+            settings.per_user_limiter_max_entries,
+        )
+
+    async def acquire(self, sender_id: str) -> float:
+        user_limiter = self.user_limiters.get(sender_id)
+        wait = max(
+            seconds_until_capacity(self.global_limiter),
+            seconds_until_capacity(user_limiter),
+        )
+        if wait > 0:
+            return wait
+        # Both have capacity, so neither acquire() suspends.
+        await self.global_limiter.acquire()
+        await user_limiter.acquire()
+        return 0.0
+
+
+class SQLiteRateLimiter:
+    """Token buckets stored in SQLite and shared by every process on the DB.
+
+    Each bucket row carries its level and the time it was last refilled.
+    Refill and take happen in a single UPDATE guarded by a check that both
+    the global and the sender's bucket hold a whole token, so concurrent
+    processes never overdraw a limit and a throttled sender never burns a
+    global token. Buckets survive restarts along with the rest of the queue.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, settings: Settings) -> None:
+        self._session_factory = session_factory
+        self._global = (
+            float(settings.global_rate_limit_count),
+            settings.global_rate_limit_count / settings.global_rate_limit_seconds,
+        )
+        self._per_user = (
+            float(settings.per_user_rate_limit_count),
+            settings.per_user_rate_limit_count / settings.per_user_rate_limit_seconds,
+        )
+
+    async def acquire(self, sender_id: str) -> float:
+        now = time.time()
+        keys = [GLOBAL_BUCKET_KEY, f"user:{sender_id}"]
+        async with self._session_factory() as session:
+            # The upsert opens the write transaction, so the take below cannot
+            # interleave with another process's take on the same database.
+            seed = insert(RateLimitBucket).values(
+                [
+                    {
+                        "key": key,
+                        "tokens": capacity,
+                        "capacity": capacity,
+                        "rate": rate,
+                        "updated_at": now,
+                    }
+                    for key, (capacity, rate) in zip(
+                        keys, (self._global, self._per_user), strict=True
+                    )
+                ]
+            )
+            await session.execute(
+                seed.on_conflict_do_update(
+                    index_elements=["key"],
+                    set_={
+                        "capacity": seed.excluded.capacity,
+                        "rate": seed.excluded.rate,
+                    },
+                )
+            )
+
+            other = aliased(RateLimitBucket)
+            admissible = (
+                select(func.count())
+                .where(col(other.key).in_(keys), _refilled(other, now) >= 1)
+                .scalar_subquery()
+            )
+            taken = await session.execute(
+                update(RateLimitBucket)
+                .where(col(RateLimitBucket.key).in_(keys), admissible == len(keys))
+                .values(tokens=_refilled(RateLimitBucket, now) - 1, updated_at=now)
+                .returning(RateLimitBucket.key)
+            )
+            if taken.scalars().all():
+                await session.commit()
+                return 0.0
+
+            result = await session.execute(
+                select(RateLimitBucket).where(col(RateLimitBucket.key).in_(keys))
+            )
+            buckets = result.scalars().all()
+            await session.commit()
+        wait = max(
+            (1 - min(b.capacity, b.tokens + (now - b.updated_at) * b.rate)) / b.rate
+            for b in buckets
+        )
+        # Clock skew between processes can leave the estimate at zero.
+        return max(wait, 0.01)
+
+
+def _refilled(bucket: type[RateLimitBucket], now: float) -> ColumnElement[float]:
+    """SQL expression for a bucket's level after refilling up to ``now``."""
+    return func.min(
+        col(bucket.capacity),
+        col(bucket.tokens) + (now - col(bucket.updated_at)) * col(bucket.rate),
+    )
+
+
+def create_rate_limiter(
+    settings: Settings, session_factory: async_sessionmaker
+) -> RateLimiter:
+    """Build the limiter backend selected by ``settings.rate_limit_backend``."""
+    if settings.rate_limit_backend == RateLimitBackend.SQLITE:
+        return SQLiteRateLimiter(session_factory, settings)
+    return MemoryRateLimiter(settings)
@@ -0,0 +1,71 @@
+"""Wake-up signal between the webhook and the worker loop."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from choresir.worker.queue import database_version, latest_job_rowid
+
+logger = logging.getLogger(__name__)
+
+
+class JobNotifier:
+    """Wake an idle worker as soon as a job is enqueued.
+
+    The flag is level-triggered: a notify that lands while the worker is busy
+    claiming is remembered, so the next wait returns immediately rather than
+    sleeping on a job that is already committed.
+    """
+
+    def __init__(self) -> None:
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        """Signal that new work may be ready."""
+        self._event.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Block until notified or ``timeout`` elapses; True if notified."""
+        try:
+            async with asyncio.timeout(timeout):
+                await self._event.wait()
+        except TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+
+async def watch_enqueues(
+    session_factory: async_sessionmaker, notifier: JobNotifier, interval: float
+) -> None:
+    """Notify ``notifier`` whenever another process enqueues a job.
+
+    Stands in for the webhook's in-process notify when the workers run in a
+    process of their own. Each check reads SQLite's ``data_version`` on a
+    connection held for the purpose, and the job table is only read for its
+    newest rowid once another connection has committed, so an idle watcher
+    costs one pragma per ``interval``.
+    """
+    last_version: int | None = None
+    last_rowid: int | None = None
+    while True:
+        try:
+            async with session_factory() as probe:
+                while True:
+                    version = await database_version(probe)
+                    if version != last_version:
+                        async with session_factory() as session:
+                            latest = await latest_job_rowid(session)
+                        if last_rowid is not None and latest != last_rowid:
+                            notifier.notify()
+                        last_version, last_rowid = version, latest
+                    await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error checking for new jobs")
+            last_version = None
+        await asyncio.sleep(interval)
@@ -0,0 +1,281 @@
+"""Outbox operations and the sender loop that delivers agent replies."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import and_, delete, exists, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import aliased
+from sqlmodel import col
+
+from choresir.config import Settings
+from choresir.enums import OutboxStatus
+from choresir.metrics import PipelineMetrics
+from choresir.models.outbox import OutboundMessage
+from choresir.worker.notifier import JobNotifier
+from choresir.worker.queue import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+_ERROR_BACKOFF = 1.0
+
+type SendFn = Callable[[str, str], Awaitable[None]]
+
+
+async def claim_outbound(
+    session: AsyncSession,
+    limit: int,
+    lease_seconds: int,
+) -> list[OutboundMessage]:
+    """Claim up to ``limit`` deliverable messages, at most one per chat.
+
+    A message is only deliverable once every earlier message to the same
+    chat has been sent or given up on, so replies arrive in order even
+    while one of them is backing off. Messages whose sending lease lapsed,
+    because the sender loop died mid-delivery, are claimable again.
+    """
+    now = datetime.now(UTC)
+    earlier = aliased(OutboundMessage)
+    blocked = exists().where(
+        col(earlier.chat_id) == col(OutboundMessage.chat_id),
+        col(earlier.id) < col(OutboundMessage.id),
+        col(earlier.status).in_([OutboxStatus.PENDING, OutboxStatus.SENDING]),
+    )
+    ready = (
+        select(OutboundMessage.id)
+        .where(
+            or_(
+                and_(
+                    col(OutboundMessage.status) == OutboxStatus.PENDING,
+                    or_(
+                        col(OutboundMessage.next_attempt_at).is_(None),
+                        col(OutboundMessage.next_attempt_at) <= now,
+                    ),
+                ),
+                and_(
+                    col(OutboundMessage.status) == OutboxStatus.SENDING,
+                    col(OutboundMessage.lease_expires_at) < now,
+                ),
+            ),
+            ~blocked,
+        )
+        .order_by(col(OutboundMessage.id))
+        .limit(limit)
+    )
+    stmt = (
+        update(OutboundMessage)
+        .where(col(OutboundMessage.id).in_(ready))
+        .values(
+            status=OutboxStatus.SENDING,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+        )
+        .returning(OutboundMessage)
+    )
+    result = await session.execute(stmt)
+    messages = list(result.scalars().all())
+    await session.commit()
+    messages.sort(key=lambda message: message.id or 0)
+    return messages
+
+
+async def mark_sent(session: AsyncSession, message: OutboundMessage) -> None:
+    """Record a successful delivery."""
+    await session.execute(
+        update(OutboundMessage)
+        .where(col(OutboundMessage.id) == message.id)
+        .values(
+            status=OutboxStatus.SENT,
+            sent_at=datetime.now(UTC),
+            lease_expires_at=None,
+        )
+    )
+    await session.commit()
+
+
+async def retry_outbound(
+    session: AsyncSession,
+    message: OutboundMessage,
+    delay_seconds: float,
+    error: str,
+) -> None:
+    """Return a message to pending after a failed delivery attempt."""
+    await session.execute(
+        update(OutboundMessage)
+        .where(col(OutboundMessage.id) == message.id)
+        .values(
+            status=OutboxStatus.PENDING,
+            attempts=message.attempts + 1,
+            next_attempt_at=datetime.now(UTC) + timedelta(seconds=delay_seconds),
+            lease_expires_at=None,
+            last_error=error,
+        )
+    )
+    await session.commit()
+
+
+async def fail_outbound(
+    session: AsyncSession,
+    message: OutboundMessage,
+    error: str,
+) -> None:
+    """Give up on a message; later messages to its chat are unblocked."""
+    await session.execute(
+        update(OutboundMessage)
+        .where(col(OutboundMessage.id) == message.id)
+        .values(
+            status=OutboxStatus.FAILED,
+            attempts=message.attempts + 1,
+            lease_expires_at=None,
+            last_error=error,
+        )
+    )
+    await session.commit()
+
+
+async def purge_outbound(
+    session: AsyncSession,
+    older_than: datetime,
+    limit: int,
+) -> int:
+    """Delete up to ``limit`` sent or failed messages created before ``older_than``."""
+    finished = (
+        select(OutboundMessage.id)
+        .where(
+            col(OutboundMessage.status).in_([OutboxStatus.SENT, OutboxStatus.FAILED]),
+            col(OutboundMessage.created_at) < older_than,
+        )
+        .limit(limit)
+    )
+    result = await session.execute(
+        delete(OutboundMessage).where(col(OutboundMessage.id).in_(finished))
+    )
+    await session.commit()
+    return result.rowcount
+
+
+class _OutboxSender:
+    """Claims committed replies and delivers them with bounded concurrency."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        send: SendFn,
+        settings: Settings,
+        notifier: JobNotifier,
+        metrics: PipelineMetrics | None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._send = send
+        self._settings = settings
+        self._notifier = notifier
+        self._metrics = metrics
+        self._slots = asyncio.Semaphore(settings.outbox_concurrency)
+
+    async def run(self, stopping: asyncio.Event) -> None:
+        settings = self._settings
+        while True:
+            try:
+                async with self._session_factory() as session:
+                    messages = await claim_outbound(
+                        session,
+                        settings.outbox_batch_size,
+                        settings.outbox_lease_seconds,
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error claiming outbound messages")
+                await asyncio.sleep(_ERROR_BACKOFF)
+                continue
+
+            if not messages:
+                if stopping.is_set():
+                    return
+                await self._notifier.wait(settings.outbox_idle_poll_seconds)
+                continue
+
+            async with asyncio.TaskGroup() as tg:
+                for message in messages:
+                    tg.create_task(self._deliver(message))
+
+    async def _deliver(self, message: OutboundMessage) -> None:
+        timeout = self._settings.outbox_send_timeout_seconds
+        try:
+            async with self._slots, asyncio.timeout(timeout):
+                await self._send(message.chat_id, message.text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            await self._record_failure(message, exc)
+            return
+        try:
+            async with self._session_factory() as session:
+                await mark_sent(session, message)
+        except Exception:
+            # The lease will lapse and the message be re-sent; log it loudly.
+            logger.exception("Sent message %s but failed to record it", message.id)
+            return
+        self._count("sent")
+
+    async def _record_failure(self, message: OutboundMessage, exc: Exception) -> None:
+        settings = self._settings
+        error = f"{type(exc).__name__}: {exc}"
+        try:
+            async with self._session_factory() as session:
+                if message.attempts + 1 >= settings.outbox_max_attempts:
+                    logger.error(
+                        "Giving up on message %s to %s: %s",
+                        message.id,
+                        message.chat_id,
+                        error,
+                    )
+                    await fail_outbound(session, message, error)
+                    self._count("failed")
+                    return
+                delay = backoff_delay(
+                    message.attempts,
+                    settings.outbox_backoff_base_seconds,
+                    settings.outbox_backoff_max_seconds,
+                )
+                logger.warning(
+                    "Delivery of message %s failed (%s), retrying in %.1fs",
+                    message.id,
+                    error,
+                    delay,
+                )
+                await retry_outbound(session, message, delay, error)
+                self._count("retry")
+        except Exception:
+            logger.exception("Failed to record delivery failure for %s", message.id)
+
+    def _count(self, outcome: str) -> None:
+        if self._metrics is not None:
+            self._metrics.outbox_deliveries.inc(outcome=outcome)
+
+
+async def outbox_sender_loop(
+    session_factory: async_sessionmaker,
+    send: SendFn,
+    settings: Settings,
+    notifier: JobNotifier | None = None,
+    metrics: PipelineMetrics | None = None,
+    stopping: asyncio.Event | None = None,
+) -> None:
+    """Deliver committed outbox messages until stopped or cancelled.
+
+    Runs apart from the message workers, with its own concurrency
+    (``outbox_concurrency``) and retry policy (``outbox_max_attempts`` with
+    jittered backoff), so a slow or failing WAHA never holds a worker slot
+    or causes the agent run that produced a reply to be repeated. ``send``
+    should make a single attempt. Sleeps on ``notifier`` while idle.
+    Once ``stopping`` is set, and ``notifier`` woken, the loop flushes every
+    message that is ready to send and returns when none are left.
+    """
+    sender = _OutboxSender(
+        session_factory, send, settings, notifier or JobNotifier(), metrics
+    )
+    await sender.run(stopping or asyncio.Event())
@@ -1,131 +1,579 @@
-"""Worker loop with rate limiting and retry logic for message processing."""
+"""Sharded worker pool with rate limiting and retry logic for message processing."""
 
 from __future__ import annotations
 
 import asyncio
+import heapq
+import itertools
 import logging
+import traceback
+import zlib
+from collections import deque
 from collections.abc import Callable, Coroutine
+from datetime import UTC, datetime
 from typing import Any
 
-from aiolimiter import AsyncLimiter
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from choresir.config import Settings
+from choresir.enums import JobPriority, StaleJobPolicy
+from choresir.errors import LeaseLostError
+from choresir.metrics import PipelineMetrics
 from choresir.models.job import MessageJob
-from choresir.worker.queue import claim_next_job, complete_job, fail_job, retry_job
+from choresir.worker.backends import JobQueue, SQLiteJobQueue
+from choresir.worker.limiters import RateLimiter, create_rate_limiter
+from choresir.worker.notifier import JobNotifier
+from choresir.worker.queue import backoff_delay
 
 logger = logging.getLogger(__name__)
 
-_POLL_INTERVAL = 1.0
-_RATE_LIMIT_RETRY_DELAY = 5
+_ERROR_BACKOFF = 1.0
 
+# Handles one (possibly coalesced) job on the session its completion commits on.
+type ProcessFn = Callable[[MessageJob, AsyncSession], Coroutine[Any, Any, None]]
 
-def init_limiters(
-    settings: Settings,
-) -> tuple[AsyncLimiter, dict[str, AsyncLimiter]]:
-    """Create global limiter and empty per-user dict from settings."""
-    global_limiter = AsyncLimiter(
-        settings.global_rate_limit_count,
-        settings.global_rate_limit_seconds,
+
+async def _idle_timeout(queue: JobQueue, settings: Settings) -> float:
+    """Seconds to sleep before the next deferred job becomes claimable."""
+    earliest = await queue.next_run_after()
+    if earliest is None:
+        return settings.worker_idle_poll_seconds
+    until = (earliest - datetime.now(UTC)).total_seconds()
+    return min(max(until, 0.0), settings.worker_idle_poll_seconds)
+
+
+def merge_jobs(jobs: list[MessageJob]) -> MessageJob:
+    """Fold a sender's consecutive messages into one transient job for the agent."""
+    head = jobs[0]
+    if len(jobs) == 1:
+        return head
+    return MessageJob(
+        id=head.id,
+        sender_id=head.sender_id,
+        group_id=head.group_id,
+        body="\n".join(job.body for job in jobs),
+        priority=max(job.priority for job in jobs),
+        attempts=head.attempts,
+        created_at=head.created_at,
+        claimed_at=head.claimed_at,
     )
-    user_limiters: dict[str, AsyncLimiter] = {}
-    return global_limiter, user_limiters
 
 
-def get_user_limiter(
-    user_limiters: dict[str, AsyncLimiter],
-    user_id: str,
-    settings: Settings,
-) -> AsyncLimiter:
-    """Lazy-create and return a per-user rate limiter."""
-    if user_id not in user_limiters:
-        user_limiters[user_id] = AsyncLimiter(
-            settings.per_user_rate_limit_count,
-            settings.per_user_rate_limit_seconds,
+def _seconds_between(start: datetime, end: datetime) -> float:
+    # SQLite hands datetimes back naive; they are stored as UTC.
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=UTC)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=UTC)
+    return (end - start).total_seconds()
+
+
+def _age_seconds(job: MessageJob) -> float:
+    return _seconds_between(job.created_at, datetime.now(UTC))
+
+
+def job_budget(job: MessageJob, settings: Settings) -> float | None:
+    """Seconds left of the job's end-to-end latency budget, or None if unbounded.
+
+    The budget runs from ``created_at``, so time spent queued counts against
+    it, but a run always gets at least ``job_min_run_seconds`` so a backlog
+    after an outage is still answered rather than cut short on arrival.
+    """
+    if settings.job_deadline_seconds <= 0:
+        return None
+    remaining = settings.job_deadline_seconds - _age_seconds(job)
+    return max(remaining, settings.job_min_run_seconds)
+
+
+def shard_for(sender_id: str, shard_count: int) -> int:
+    """Map a sender to a stable shard so their messages stay in order."""
+    return zlib.crc32(sender_id.encode()) % shard_count
+
+
+class _WorkerPool:
+    """One claiming dispatcher feeding per-shard serial worker coroutines.
+
+    Shards keep each sender's jobs in order; rate-limited and coalescing jobs
+    are parked in memory under their lease. See "Internal: Worker Pool" in
+    docs/DESIGN.md.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        process_fn: ProcessFn,
+        settings: Settings,
+        notifier: JobNotifier,
+        limiter: RateLimiter | None = None,
+        metrics: PipelineMetrics | None = None,
+        queue: JobQueue | None = None,
+        on_deadline: ProcessFn | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._queue = queue or SQLiteJobQueue(session_factory)
+        self._process_fn = process_fn
+        self._on_deadline = on_deadline
+        self._settings = settings
+        self._notifier = notifier
+        self._limiter = limiter or create_rate_limiter(settings, session_factory)
+        self._metrics = metrics or PipelineMetrics()
+        self._ttl_seconds = {
+            JobPriority.LOW: settings.job_ttl_low_seconds,
+            JobPriority.NORMAL: settings.job_ttl_normal_seconds,
+            JobPriority.HIGH: settings.job_ttl_high_seconds,
+        }
+        self._slots = asyncio.Semaphore(settings.worker_pool_size)
+        self._shards: list[asyncio.Queue[tuple[MessageJob, bool]]] = [
+            asyncio.Queue() for _ in range(settings.worker_shard_count)
+        ]
+        self._max_in_flight = max(
+            settings.worker_claim_batch_size, settings.worker_pool_size
         )
-    return user_limiters[user_id]
+        self._in_flight = 0
+        self._held: dict[str, MessageJob] = {}
+        self._delays: list[tuple[float, int, str]] = []
+        self._delays_changed = asyncio.Event()
+        self._delay_seq = itertools.count()
+        self._parked: dict[str, deque[MessageJob]] = {}
+        self._parked_count = 0
+        self._scheduled: set[str] = set()
+        self._draining = False
+        self._running = 0
+        self._drained = asyncio.Event()
 
+    async def run(self, stopping: asyncio.Event) -> None:
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(self._run_shard(s)) for s in self._shards]
+                tasks.append(tg.create_task(self._reap()))
+                tasks.append(tg.create_task(self._heartbeat()))
+                tasks.append(tg.create_task(self._release_delayed()))
+                dispatcher = tg.create_task(self._dispatch())
+                await stopping.wait()
+                dispatcher.cancel()
+                await self._drain()
+                for task in tasks:
+                    task.cancel()
+        finally:
+            await self._return_held()
 
-async def _process_job(
-    job: MessageJob,
-    session_factory: async_sessionmaker,
-    process_fn: Callable[[MessageJob], Coroutine[Any, Any, None]],
-    global_limiter: AsyncLimiter,
-    user_limiters: dict[str, AsyncLimiter],
-    settings: Settings,
-) -> None:
-    """Process a single claimed job with rate limiting and error handling."""
-    try:
-        # Check global rate limit
-        if not global_limiter.has_capacity(1):
-            logger.info("Global rate limit reached, deferring job %s", job.id)
-            async with session_factory() as session:
-                await retry_job(session, job, _RATE_LIMIT_RETRY_DELAY)
+    async def _drain(self) -> None:
+        """Stop starting jobs and wait for the running ones to finish."""
+        self._draining = True
+        logger.info("Draining worker pool, %d jobs running", self._running)
+        if self._running:
+            await self._drained.wait()
+
+    async def _return_held(self) -> None:
+        if not self._held:
             return
+        try:
+            returned = await self._queue.release_leases(list(self._held.values()))
+        except Exception:
+            logger.exception("Failed to return %d held jobs", len(self._held))
+            return
+        self._held.clear()
+        if returned:
+            logger.info("Returned %d unfinished jobs to the queue", returned)
 
-        # Check per-user rate limit
-        user_limiter = get_user_limiter(user_limiters, job.sender_id, settings)
-        if not user_limiter.has_capacity(1):
-            logger.info(
-                "Per-user rate limit for %s, deferring job %s",
-                job.sender_id,
-                job.id,
-            )
-            async with session_factory() as session:
-                await retry_job(session, job, _RATE_LIMIT_RETRY_DELAY)
+    async def _reap(self) -> None:
+        while True:
+            try:
+                reaped = await self._queue.reap_expired_leases(
+                    self._settings.job_max_attempts
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error reaping expired job leases")
+            else:
+                if reaped:
+                    self._metrics.failures.inc(reaped, outcome="lease_expired")
+                    logger.warning("Returned %d expired job leases to queue", reaped)
+                    self._notifier.notify()
+            await asyncio.sleep(self._settings.worker_reap_interval_seconds)
+
+    async def _heartbeat(self) -> None:
+        lease = self._settings.worker_lease_seconds
+        while True:
+            await asyncio.sleep(lease / 3)
+            held = list(self._held.values())
+            try:
+                lost = await self._queue.extend_leases(held, lease)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error extending job leases")
+                continue
+            for job in held:
+                # Skip jobs that finished, or were claimed afresh, meanwhile.
+                if job.id in lost and self._held.get(job.id) is job:
+                    del self._held[job.id]
+                    logger.warning(
+                        "Lost lease on job %s; its outcome will not be recorded",
+                        job.id,
+                    )
+
+    async def _run_shard(self, shard: asyncio.Queue[tuple[MessageJob, bool]]) -> None:
+        while True:
+            job, released = await shard.get()
+            if self._draining or (not released and self._divert(job)):
+                continue
+            async with self._slots:
+                if self._draining:
+                    # Still held: its lease is returned when the pool stops.
+                    continue
+                self._running += 1
+                try:
+                    finished = await self._process(job, released)
+                finally:
+                    self._running -= 1
+                    if self._draining and not self._running:
+                        self._drained.set()
+            if finished:
+                if released:
+                    self._unpark(job)
+                self._held.pop(job.id, None)
+                self._release_capacity()
+
+    def _divert(self, job: MessageJob) -> bool:
+        """Park a fresh job ahead of processing when order or coalescing needs it."""
+        if job.sender_id in self._parked:
+            # Keep this sender's order: queue up behind their parked jobs, even
+            # past the cap, since running it now would overtake them.
+            self._park(job, 0.0)
+            return True
+        window = self._settings.worker_coalesce_window_seconds
+        if window > 0 and self._parked_count < self._settings.worker_max_deferred:
+            self._park(job, max(window - _age_seconds(job), 0.0))
+            return True
+        return False
+
+    def _release_capacity(self) -> None:
+        self._in_flight -= 1
+        if self._in_flight == self._max_in_flight - 1:
+            # The dispatcher was saturated; let it claim again.
+            self._notifier.notify()
+
+    def _park(self, job: MessageJob, delay: float) -> None:
+        """Hold a job in its sender's parked FIFO for at least ``delay``.
+
+        A released head keeps its place and is rescheduled; any other job
+        joins the back, where it waits on the head's existing heap entry.
+        """
+        parked = self._parked.get(job.sender_id)
+        if parked is None:
+            self._parked[job.sender_id] = deque([job])
+            self._parked_count += 1
+            self._schedule(job.sender_id, delay)
+        elif parked[0] is job:
+            self._schedule(job.sender_id, delay)
+        else:
+            parked.append(job)
+            self._parked_count += 1
+        # Parked jobs stay held and leased but no longer count against the
+        # claim cap, so one throttled sender cannot starve everyone else.
+        self._release_capacity()
+
+    def _unpark(self, job: MessageJob) -> None:
+        parked = self._parked[job.sender_id]
+        parked.popleft()
+        self._parked_count -= 1
+        if parked:
+            self._schedule(job.sender_id, 0.0)
+        else:
+            del self._parked[job.sender_id]
+
+    def _schedule(self, sender_id: str, delay: float) -> None:
+        if sender_id in self._scheduled:
+            # One heap entry per sender: its head is already due for release.
             return
+        self._scheduled.add(sender_id)
+        ready_at = asyncio.get_running_loop().time() + delay
+        heapq.heappush(self._delays, (ready_at, next(self._delay_seq), sender_id))
+        self._delays_changed.set()
+
+    async def _release_delayed(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._delays_changed.clear()
+            delay = self._delays[0][0] - loop.time() if self._delays else None
+            if delay is None or delay > 0:
+                try:
+                    async with asyncio.timeout(delay):
+                        await self._delays_changed.wait()
+                except TimeoutError:
+                    pass
+                continue
+
+            _, _, sender_id = heapq.heappop(self._delays)
+            self._scheduled.discard(sender_id)
+            job = self._parked[sender_id][0]
+            self._in_flight += 1
+            self._shards[shard_for(sender_id, len(self._shards))].put_nowait(
+                (job, True)
+            )
+
+    async def _process(self, job: MessageJob, released: bool) -> bool:
+        """Process a claimed job; return False if it was parked for later.
+
+        The whole lifecycle runs on one session: ``process_fn`` gets it for
+        the agent's reads and writes, and completion is committed on it too,
+        together with anything the agent left uncommitted. A failure rolls
+        the session back before the retry is recorded on it.
+        """
+        jobs = [job]
+        async with self._session_factory() as session:
+            try:
+                wait = await self._limiter.acquire(job.sender_id)
+                if wait > 0:
+                    self._metrics.rate_limit_deferrals.inc()
+                    logger.info(
+                        "Rate limit reached for %s, deferring job %s by %.1fs",
+                        job.sender_id,
+                        job.id,
+                        wait,
+                    )
+                    # A released head is already counted against the cap.
+                    if released or (
+                        self._parked_count < self._settings.worker_max_deferred
+                    ):
+                        self._park(job, wait)
+                        return False
+                    # Parking is full; fall back to a durable run_after.
+                    await self._requeue(session, job, wait)
+                    return True
+
+                if released and self._settings.worker_coalesce_window_seconds > 0:
+                    jobs = await self._coalesce(job)
+
+                await self._run_within_budget(merge_jobs(jobs), session)
+                await self._queue.complete(session, jobs)
+                self._observe_completion(jobs)
+
+            except asyncio.CancelledError:
+                raise
+            except LeaseLostError as exc:
+                # Another worker owns the job now; nothing here was committed.
+                logger.warning("Dropped outcome of job %s: %s", job.id, exc)
+                self._metrics.failures.inc(outcome="lease_lost")
+            except Exception as exc:
+                logger.exception("Error processing job %s", job.id)
+                await self._record_failures(session, jobs, exc)
+        # A cancelled run skips this, so its follow-ups' leases are returned too.
+        for merged in jobs:
+            if merged is not job:
+                self._held.pop(merged.id, None)
+        return True
+
+    async def _run_within_budget(self, job: MessageJob, session: AsyncSession) -> None:
+        """Run ``process_fn``, cancelling it once the job's budget is spent.
+
+        A cancelled run loses only the writes made since its last commit;
+        tools and checkpoints that already committed stay. ``on_deadline``
+        then gets the rolled-back session, to leave a fallback reply, and the
+        job completes rather than retrying, since a retry would start out of
+        budget too.
+        """
+        budget = asyncio.timeout(job_budget(job, self._settings))
+        try:
+            async with budget:
+                await self._process_fn(job, session)
+        except TimeoutError:
+            if not budget.expired():
+                raise
+            logger.warning("Job %s ran out of its latency budget", job.id)
+            self._metrics.failures.inc(outcome="deadline")
+            await session.rollback()
+            if self._on_deadline is not None:
+                await self._on_deadline(job, session)
+
+    async def _coalesce(self, head: MessageJob) -> list[MessageJob]:
+        """Absorb the sender's next messages into ``head`` while in the same chat.
+
+        Only an unbroken run is merged: the sender's first message in another
+        chat ends it, and everything after stays parked behind, in order.
+        """
+        jobs = [head]
+        parked = self._parked[head.sender_id]
+        while len(parked) > 1 and parked[1].group_id == head.group_id:
+            jobs.append(parked[1])
+            del parked[1]
+            self._parked_count -= 1
+        if len(parked) == 1:
+            # Follow-ups that arrived after the last dispatcher claim.
+            claimed = await self._queue.claim(
+                self._settings.worker_claim_batch_size,
+                self._settings.worker_lease_seconds,
+                sender_id=head.sender_id,
+                max_wait_seconds=self._settings.job_priority_max_wait_seconds,
+            )
+            self._observe_claims(claimed)
+            self._held.update((job.id, job) for job in claimed)
+            claimed.sort(key=lambda job: job.created_at)
+            for job in claimed:
+                if len(parked) == 1 and job.group_id == head.group_id:
+                    jobs.append(job)
+                else:
+                    parked.append(job)
+                    self._parked_count += 1
+        if len(jobs) > 1:
+            logger.info("Coalesced %d messages from %s", len(jobs), head.sender_id)
+        jobs.sort(key=lambda job: job.created_at)
+        return jobs
+
+    async def _expire_stale(self) -> None:
+        """Drop or collapse backlog that outlived its TTL before claiming it."""
+        expired = await self._queue.expire_stale(
+            self._ttl_seconds,
+            catch_up=self._settings.job_ttl_policy == StaleJobPolicy.CATCH_UP,
+        )
+        if expired:
+            self._metrics.expired.inc(expired)
+            logger.warning("Expired %d stale message jobs", expired)
 
-        # Acquire rate limit capacity and process
-        async with global_limiter, user_limiter:
-            await process_fn(job)
+    def _observe_claims(self, jobs: list[MessageJob]) -> None:
+        for job in jobs:
+            if job.claimed_at is not None:
+                self._metrics.queue_wait.observe(
+                    _seconds_between(job.created_at, job.claimed_at)
+                )
 
-        async with session_factory() as session:
-            await complete_job(session, job)
+    def _observe_completion(self, jobs: list[MessageJob]) -> None:
+        now = datetime.now(UTC)
+        for job in jobs:
+            if job.claimed_at is not None:
+                self._metrics.processing_time.observe(
+                    _seconds_between(job.claimed_at, now)
+                )
 
-    except asyncio.CancelledError:
-        raise
-    except Exception:
-        logger.exception("Error processing job %s", job.id)
+    async def _requeue(
+        self, session: AsyncSession, job: MessageJob, delay: float
+    ) -> None:
+        await self._queue.defer(session, job, delay)
+        # Wake the dispatcher so its idle timeout accounts for the new run_after.
+        self._notifier.notify()
+
+    async def _record_failures(
+        self, session: AsyncSession, jobs: list[MessageJob], exc: Exception
+    ) -> None:
         try:
-            async with session_factory() as session:
-                await fail_job(session, job)
+            await session.rollback()
         except Exception:
-            logger.exception("Failed to mark job %s as failed", job.id)
+            logger.exception("Failed to roll back job session")
+        if len(jobs) > 1:
+            # Retry a coalesced run as the one job it ran as, so the retry
+            # resumes its checkpoint instead of redoing each message alone.
+            merged = merge_jobs(jobs)
+            try:
+                await self._queue.absorb(session, merged, jobs[1:])
+            except LeaseLostError:
+                logger.warning("Lease lost while folding job %s", merged.id)
+            except Exception:
+                logger.exception("Failed to fold coalesced job %s", merged.id)
+            else:
+                jobs = [merged]
+        for failed in jobs:
+            try:
+                await self._handle_failure(session, failed, exc)
+            except LeaseLostError:
+                logger.warning("Lease on failed job %s was lost", failed.id)
+            except Exception:
+                logger.exception("Failed to record failure for job %s", failed.id)
+
+    async def _handle_failure(
+        self, session: AsyncSession, job: MessageJob, exc: Exception
+    ) -> None:
+        settings = self._settings
+        if job.attempts + 1 >= settings.job_max_attempts:
+            logger.error(
+                "Job %s exhausted %d attempts, dead-lettering",
+                job.id,
+                settings.job_max_attempts,
+            )
+            await self._queue.fail(
+                session, job, "".join(traceback.format_exception(exc))
+            )
+            self._metrics.failures.inc(outcome="dead_letter")
+            return
+
+        delay = backoff_delay(
+            job.attempts,
+            settings.job_backoff_base_seconds,
+            settings.job_backoff_max_seconds,
+        )
+        logger.info("Retrying job %s in %.1fs", job.id, delay)
+        await self._queue.retry(session, job, delay)
+        self._metrics.failures.inc(outcome="retry")
+        self._notifier.notify()
+
+    async def _dispatch(self) -> None:
+        while True:
+            capacity = self._max_in_flight - self._in_flight
+            if capacity <= 0:
+                await self._notifier.wait(self._settings.worker_idle_poll_seconds)
+                continue
+
+            try:
+                await self._expire_stale()
+                jobs = await self._queue.claim(
+                    min(capacity, self._settings.worker_claim_batch_size),
+                    self._settings.worker_lease_seconds,
+                    max_wait_seconds=self._settings.job_priority_max_wait_seconds,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error claiming jobs")
+                await asyncio.sleep(_ERROR_BACKOFF)
+                continue
+
+            if not jobs:
+                try:
+                    timeout = await _idle_timeout(self._queue, self._settings)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Error reading next deferred job")
+                    timeout = _ERROR_BACKOFF
+                await self._notifier.wait(timeout)
+                continue
+
+            self._observe_claims(jobs)
+            for job in jobs:
+                self._held[job.id] = job
+                self._in_flight += 1
+                shard = shard_for(job.sender_id, len(self._shards))
+                self._shards[shard].put_nowait((job, False))
 
 
 async def message_worker_loop(
     session_factory: async_sessionmaker,
-    process_fn: Callable[[MessageJob], Coroutine[Any, Any, None]],
+    process_fn: ProcessFn,
     settings: Settings,
+    notifier: JobNotifier | None = None,
+    limiter: RateLimiter | None = None,
+    metrics: PipelineMetrics | None = None,
+    queue: JobQueue | None = None,
+    stopping: asyncio.Event | None = None,
+    on_deadline: ProcessFn | None = None,
 ) -> None:
-    """Run the message processing worker in an infinite loop.
+    """Run the message processing worker pool until stopped or cancelled.
 
-    Claims jobs from the queue, applies rate limits, calls process_fn,
-    and handles retries and failures. Designed to run as a background
-    coroutine cancelled during shutdown.
+    Calls ``process_fn`` with each claimed job and the session its completion
+    commits on, and ``on_deadline`` on that session once the job's latency
+    budget is spent. Setting ``stopping`` drains the pool; cancelling gives up
+    on running jobs. Either way unfinished jobs return to the queue without
+    spending an attempt.
     """
-    global_limiter, user_limiters = init_limiters(settings)
-
-    while True:
-        try:
-            async with session_factory() as session:
-                job = await claim_next_job(session)
-        except asyncio.CancelledError:
-            raise
-        except Exception:
-            logger.exception("Error claiming next job")
-            await asyncio.sleep(_POLL_INTERVAL)
-            continue
-
-        if job is None:
-            await asyncio.sleep(_POLL_INTERVAL)
-            continue
-
-        await _process_job(
-            job,
-            session_factory,
-            process_fn,
-            global_limiter,
-            user_limiters,
-            settings,
-        )
+    pool = _WorkerPool(
+        session_factory,
+        process_fn,
+        settings,
+        notifier or JobNotifier(),
+        limiter,
+        metrics,
+        queue,
+        on_deadline,
+    )
+    await pool.run(stopping or asyncio.Event())
@@ -2,74 +2,648 @@
 
 from __future__ import annotations
 
+import random
+import re
+import zlib
+from collections import defaultdict, deque
+from collections.abc import Callable, Collection, Mapping, Sequence
 from datetime import UTC, datetime, timedelta
 
-from sqlalchemy import update
+from sqlalchemy import (
+    ColumnElement,
+    and_,
+    case,
+    delete,
+    exists,
+    func,
+    literal_column,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import col
 
 from choresir.enums import JobStatus
-from choresir.models.job import MessageJob
+from choresir.errors import LeaseLostError
+from choresir.models.job import (
+    ACTIVE_JOB,
+    AgentCheckpoint,
+    ArchivedJob,
+    DeadLetterJob,
+    MessageJob,
+)
 
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_MAX_WAIT_SECONDS = 120.0
+LEASE_EXPIRED_ERROR = "Lease expired before the job completed"
 
-async def claim_next_job(session: AsyncSession) -> MessageJob | None:
-    """Atomically claim the next pending job ready for processing."""
-    now = datetime.now(UTC)
+
+def backoff_delay(attempts: int, base_seconds: float, max_seconds: float) -> float:
+    """Full-jitter exponential backoff for a job that has failed ``attempts`` times.
+
+    Jitter spreads retries from a shared outage over the whole window so they
+    don't hit the LLM or WAHA again in lockstep.
+    """
+    ceiling = min(max_seconds, base_seconds * 2**attempts)
+    return random.uniform(0, ceiling)  # nosec B311 — jitter, not crypto
+
+
+async def enqueue_job(session: AsyncSession, job: MessageJob) -> bool:
+    """Insert a job unless its id is already queued; return True if it was new.
+
+    The WhatsApp message id is the primary key, so ``INSERT OR IGNORE``
+    drops WAHA's redeliveries of a message already received.
+    """
+    (new,) = await enqueue_jobs(session, [job])
+    return new
+
+
+async def enqueue_jobs(session: AsyncSession, jobs: Sequence[MessageJob]) -> list[bool]:
+    """Insert a batch of jobs in one transaction; return which of them were new.
+
+    One multi-row ``INSERT OR IGNORE`` and one commit cover the whole batch.
+    A repeated id within the batch counts as new only the first time.
+    """
+    if not jobs:
+        return []
     stmt = (
-        update(MessageJob)
+        insert(MessageJob)
+        .values(
+            [
+                {
+                    "id": job.id,
+                    "sender_id": job.sender_id,
+                    "group_id": job.group_id,
+                    "body": job.body,
+                    "priority": job.priority,
+                    "status": job.status,
+                    "created_at": job.created_at,
+                    "completed_at": job.completed_at,
+                }
+                for job in jobs
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=["id"])
+        .returning(MessageJob.id)
+    )
+    result = await session.execute(stmt)
+    inserted = set(result.scalars().all())
+    await session.commit()
+    new = []
+    for job in jobs:
+        new.append(job.id in inserted)
+        inserted.discard(job.id)
+    return new
+
+
+async def claim_jobs(
+    session: AsyncSession,
+    limit: int,
+    lease_seconds: int = DEFAULT_LEASE_SECONDS,
+    *,
+    sender_id: str | None = None,
+    group_id: str | None = None,
+    max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+) -> list[MessageJob]:
+    """Atomically claim up to ``limit`` ready pending jobs, highest priority first.
+
+    The candidate ids are chosen by an ordered, limited subquery inside the
+    same UPDATE, so the whole batch flips to PROCESSING in one statement and
+    rows beyond the limit are left untouched for the next claim. Each claimed
+    job holds a lease for ``lease_seconds``; see ``reap_expired_leases``.
+    ``sender_id`` and ``group_id`` narrow the claim to one conversation.
+
+    Jobs are taken by priority lane, oldest first within a lane. As a
+    starvation guard, any job that has waited ``max_wait_seconds`` jumps
+    ahead of every lane, so a steady stream of high-priority messages cannot
+    hold low-priority ones back indefinitely.
+    """
+    now = datetime.now(UTC)
+    starved_before = now - timedelta(seconds=max_wait_seconds)
+    starved = case((col(MessageJob.created_at) <= starved_before, 1), else_=0)
+    ready = (
+        select(MessageJob.id)
         .where(
+            ACTIVE_JOB,
             col(MessageJob.status) == JobStatus.PENDING,
             (col(MessageJob.run_after) <= now) | (col(MessageJob.run_after).is_(None)),
         )
-        .values(status=JobStatus.PROCESSING, claimed_at=now)
+        .order_by(
+            starved.desc(),
+            col(MessageJob.priority).desc(),
+            col(MessageJob.created_at),
+        )
+        .limit(limit)
+    )
+    if sender_id is not None:
+        ready = ready.where(col(MessageJob.sender_id) == sender_id)
+    if group_id is not None:
+        ready = ready.where(col(MessageJob.group_id) == group_id)
+    stmt = (
+        update(MessageJob)
+        .where(col(MessageJob.id).in_(ready))
+        .values(
+            status=JobStatus.PROCESSING,
+            claimed_at=now,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+        )
         .returning(MessageJob)
     )
     result = await session.execute(stmt)
-    row = result.first()
+    jobs = list(result.scalars().all())
     await session.commit()
-    if row is None:
-        return None
-    return row[0]
+    # SQLite does not guarantee RETURNING order, so restore the claim order.
+    naive_cutoff = starved_before.replace(tzinfo=None)
+    jobs.sort(
+        key=lambda job: (
+            _naive(job.created_at) > naive_cutoff,
+            -job.priority,
+            job.created_at,
+        )
+    )
+    return fifo_per_sender(jobs)
 
 
-async def complete_job(session: AsyncSession, job: MessageJob) -> None:
-    """Mark a job as successfully completed."""
+def _naive(value: datetime) -> datetime:
+    return value.astimezone(UTC).replace(tzinfo=None) if value.tzinfo else value
+
+
+def fifo_per_sender(jobs: list[MessageJob]) -> list[MessageJob]:
+    """Keep the batch's priority order across senders but FIFO within each one.
+
+    A sender's high-priority message must not overtake their own earlier
+    messages, or replies would arrive out of order.
+    """
+    by_sender: dict[str, deque[MessageJob]] = defaultdict(deque)
+    for job in sorted(jobs, key=lambda job: job.created_at):
+        by_sender[job.sender_id].append(job)
+    return [by_sender[job.sender_id].popleft() for job in jobs]
+
+
+async def claim_next_job(
+    session: AsyncSession,
+    lease_seconds: int = DEFAULT_LEASE_SECONDS,
+) -> MessageJob | None:
+    """Atomically claim the oldest pending job ready for processing."""
+    jobs = await claim_jobs(session, 1, lease_seconds)
+    return jobs[0] if jobs else None
+
+
+async def extend_leases(
+    session: AsyncSession,
+    jobs: Collection[MessageJob],
+    lease_seconds: int,
+) -> set[str]:
+    """Push the leases of claimed jobs forward; return the ids no longer held.
+
+    Fenced on the claim like every other lease write, so a job reaped and
+    claimed again elsewhere is reported lost instead of extended.
+    """
+    if not jobs:
+        return set()
+    now = datetime.now(UTC)
+    stmt = (
+        update(MessageJob)
+        .where(_claims(jobs))
+        .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+        .returning(MessageJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    held = set(result.scalars().all())
+    await session.commit()
+    return {job.id for job in jobs} - held
+
+
+async def release_leases(session: AsyncSession, jobs: Collection[MessageJob]) -> int:
+    """Hand claimed jobs back to pending without spending an attempt.
+
+    Used when a worker shuts down holding jobs it never finished, so another
+    worker can pick them up at once instead of waiting out the lease.
+    """
+    if not jobs:
+        return 0
+    stmt = (
+        update(MessageJob)
+        .where(_claims(jobs))
+        .values(status=JobStatus.PENDING, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.rowcount
+
+
+async def reap_expired_leases(session: AsyncSession, max_attempts: int) -> int:
+    """Recover PROCESSING jobs whose lease ran out; return how many were reaped.
+
+    A lapsed lease means the worker holding the job died or stalled without
+    heartbeating, so the attempt is counted. Jobs with retries left return to
+    PENDING and are claimable immediately; the rest are dead-lettered.
+    """
     now = datetime.now(UTC)
+    expired = (
+        ACTIVE_JOB,
+        col(MessageJob.status) == JobStatus.PROCESSING,
+        col(MessageJob.lease_expires_at) < now,
+    )
+    result = await session.execute(
+        select(MessageJob).where(*expired, col(MessageJob.attempts) + 1 >= max_attempts)
+    )
+    exhausted = list(result.scalars().all())
+    for job in exhausted:
+        await _dead_letter(session, job, LEASE_EXPIRED_ERROR, now)
     stmt = (
         update(MessageJob)
-        .where(col(MessageJob.id) == job.id)
-        .values(status=JobStatus.DONE, completed_at=now)
+        .where(*expired)
+        .values(
+            status=JobStatus.PENDING,
+            attempts=col(MessageJob.attempts) + 1,
+            run_after=None,
+            lease_expires_at=None,
+        )
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.rowcount + len(exhausted)
+
+
+async def next_run_after(session: AsyncSession) -> datetime | None:
+    """Return the earliest deferred ``run_after`` among pending jobs, if any."""
+    stmt = select(func.min(MessageJob.run_after)).where(
+        ACTIVE_JOB,
+        col(MessageJob.status) == JobStatus.PENDING,
+    )
+    result = await session.execute(stmt)
+    earliest = result.scalar_one_or_none()
+    if earliest is not None and earliest.tzinfo is None:
+        earliest = earliest.replace(tzinfo=UTC)
+    return earliest
+
+
+async def database_version(session: AsyncSession) -> int:
+    """Return SQLite's ``data_version``, which moves when another connection commits.
+
+    The value is only comparable across calls on the same connection, so the
+    caller keeps ``session`` open between them. Reading it touches no table.
+    """
+    result = await session.execute(text("PRAGMA data_version"))
+    return result.scalar_one()
+
+
+async def latest_job_rowid(session: AsyncSession) -> int:
+    """Return the newest job's rowid, which moves on every enqueue; 0 if none."""
+    stmt = select(func.max(literal_column("rowid"))).select_from(MessageJob)
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none() or 0
+
+
+async def expire_stale_jobs(
+    session: AsyncSession,
+    ttl_seconds: Mapping[int, float],
+    *,
+    catch_up: bool = False,
+) -> int:
+    """Expire pending jobs older than their priority lane's TTL; return the count.
+
+    ``ttl_seconds`` maps a priority lane to its TTL; lanes that are missing or
+    have a TTL of 0 never expire. With ``catch_up`` each conversation's stale
+    jobs are folded into its newest one, which stays pending as a single
+    catch-up run keeping its place in line; the rest become EXPIRED.
+    """
+    now = datetime.now(UTC)
+    lanes = [
+        and_(
+            col(MessageJob.priority) == lane,
+            col(MessageJob.created_at) < now - timedelta(seconds=ttl),
+        )
+        for lane, ttl in ttl_seconds.items()
+        if ttl > 0
+    ]
+    if not lanes:
+        return 0
+    stmt = (
+        select(MessageJob)
+        .where(ACTIVE_JOB, col(MessageJob.status) == JobStatus.PENDING, or_(*lanes))
+        .order_by(col(MessageJob.created_at))
+    )
+    stale = list((await session.execute(stmt)).scalars().all())
+    if not stale:
+        return 0
+
+    expired_ids = {job.id for job in stale}
+    if catch_up:
+        conversations: dict[tuple[str, str], list[MessageJob]] = defaultdict(list)
+        for job in stale:
+            conversations[(job.sender_id, job.group_id)].append(job)
+        for jobs in conversations.values():
+            head = jobs[-1]
+            expired_ids.discard(head.id)
+            body = catch_up_body(jobs)
+            if body != head.body:
+                await session.execute(
+                    update(MessageJob)
+                    .where(col(MessageJob.id) == head.id)
+                    .values(body=body)
+                )
+    await session.execute(
+        update(MessageJob)
+        .where(col(MessageJob.id).in_(expired_ids))
+        .values(status=JobStatus.EXPIRED, completed_at=now)
+    )
+    await session.commit()
+    return len(expired_ids)
+
+
+_CATCH_UP_HEADER = re.compile(
+    r"\[Catching up on (\d+) messages? sent while I was unavailable\]\n"
+)
+
+
+def catch_up_body(jobs: list[MessageJob]) -> str:
+    """Join ``jobs`` under one catch-up header, unwrapping earlier catch-ups.
+
+    A catch-up run that went stale again is folded in by its messages, so
+    headers never nest and an unchanged run gets back its own body.
+    """
+    count = 0
+    bodies = []
+    for job in jobs:
+        folded = _CATCH_UP_HEADER.match(job.body)
+        if folded:
+            count += int(folded[1])
+            bodies.append(job.body[folded.end() :])
+        else:
+            count += 1
+            bodies.append(job.body)
+    noun = "message" if count == 1 else "messages"
+    header = f"[Catching up on {count} {noun} sent while I was unavailable]"
+    return "\n".join([header, *bodies])
+
+
+async def queue_depth(session: AsyncSession) -> dict[JobStatus, int]:
+    """Count message jobs per status; statuses with no jobs are omitted."""
+    stmt = select(MessageJob.status, func.count()).group_by(col(MessageJob.status))
+    result = await session.execute(stmt)
+    return {JobStatus(status): count for status, count in result.all()}
+
+
+async def backlog_stats(session: AsyncSession) -> tuple[int, datetime | None]:
+    """Return the number of active jobs and the oldest one's ``created_at``."""
+    stmt = select(func.count(), func.min(MessageJob.created_at)).where(ACTIVE_JOB)
+    depth, oldest = (await session.execute(stmt)).one()
+    if oldest is not None and oldest.tzinfo is None:
+        oldest = oldest.replace(tzinfo=UTC)
+    return depth, oldest
+
+
+async def complete_job(session: AsyncSession, job: MessageJob) -> None:
+    """Mark a job as successfully completed."""
+    await complete_jobs(session, [job])
+
+
+def _still_held(job: MessageJob) -> ColumnElement[bool]:
+    """Match ``job`` only while the claim that returned it is still current.
+
+    A reaped job is PENDING or claimed afresh with a new ``claimed_at``, so a
+    worker whose lease lapsed can no longer finish, retry or fail it.
+    """
+    return and_(
+        col(MessageJob.id) == job.id,
+        col(MessageJob.status) == JobStatus.PROCESSING,
+        col(MessageJob.claimed_at) == job.claimed_at,
+    )
+
+
+def _claims(jobs: Collection[MessageJob]) -> ColumnElement[bool]:
+    """Like ``_still_held`` for many jobs, as one row-value ``IN`` list.
+
+    A worker can hold a thousand parked jobs, more than an ``OR`` of
+    per-job clauses fits under SQLite's expression depth limit.
+    """
+    return and_(
+        col(MessageJob.status) == JobStatus.PROCESSING,
+        tuple_(col(MessageJob.id), col(MessageJob.claimed_at)).in_(
+            [(job.id, job.claimed_at) for job in jobs]
+        ),
+    )
+
+
+async def _update_held(
+    session: AsyncSession, jobs: Collection[MessageJob], **values: object
+) -> None:
+    """Apply ``values`` to jobs still held, or roll back and raise if any was lost.
+
+    The rollback also drops whatever else the session holds uncommitted,
+    such as the agent's reply, so a lost job's outcome is never committed.
+    """
+    result = await session.execute(
+        update(MessageJob)
+        .where(or_(*(_still_held(job) for job in jobs)))
+        .values(**values)
+        .returning(MessageJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    held = set(result.scalars().all())
+    lost = [job.id for job in jobs if job.id not in held]
+    if lost:
+        await session.rollback()
+        raise LeaseLostError(lost)
+
+
+async def complete_jobs(session: AsyncSession, jobs: Collection[MessageJob]) -> None:
+    """Mark several jobs as completed in one statement.
+
+    Raises ``LeaseLostError``, committing nothing, if any lease was lost.
+    """
+    now = datetime.now(UTC)
+    await _update_held(
+        session, jobs, status=JobStatus.DONE, completed_at=now, lease_expires_at=None
+    )
+    await session.commit()
+
+
+async def absorb_jobs(
+    session: AsyncSession, head: MessageJob, jobs: Collection[MessageJob]
+) -> None:
+    """Fold ``jobs`` into ``head`` for good, so they are retried as one job.
+
+    ``head`` takes its merged body and priority and ``jobs`` complete, since
+    the head's run answers them. Committed with the head's retry or
+    dead-lettering; raises ``LeaseLostError`` if any lease was lost.
+    """
+    now = datetime.now(UTC)
+    await _update_held(
+        session, jobs, status=JobStatus.DONE, completed_at=now, lease_expires_at=None
+    )
+    await _update_held(session, [head], body=head.body, priority=head.priority)
+
+
+async def defer_job(
+    session: AsyncSession,
+    job: MessageJob,
+    delay_seconds: float,
+) -> None:
+    """Return a job to pending with a run_after delay, without spending an attempt."""
+    now = datetime.now(UTC)
+    await _update_held(
+        session,
+        [job],
+        status=JobStatus.PENDING,
+        run_after=now + timedelta(seconds=delay_seconds),
+        lease_expires_at=None,
     )
-    await session.execute(stmt)
     await session.commit()
 
 
 async def retry_job(
     session: AsyncSession,
     job: MessageJob,
-    delay_seconds: int,
+    delay_seconds: float,
 ) -> None:
     """Return a job to pending with incremented attempts and a run_after delay."""
     now = datetime.now(UTC)
-    stmt = (
+    await _update_held(
+        session,
+        [job],
+        status=JobStatus.PENDING,
+        attempts=col(MessageJob.attempts) + 1,
+        run_after=now + timedelta(seconds=delay_seconds),
+        lease_expires_at=None,
+    )
+    await session.commit()
+
+
+async def _dead_letter(
+    session: AsyncSession,
+    job: MessageJob,
+    error: str,
+    now: datetime,
+) -> None:
+    attempts = job.attempts + 1
+    await _update_held(
+        session,
+        [job],
+        status=JobStatus.FAILED,
+        attempts=col(MessageJob.attempts) + 1,
+        lease_expires_at=None,
+    )
+    session.add(
+        DeadLetterJob(
+            id=job.id,
+            sender_id=job.sender_id,
+            group_id=job.group_id,
+            body=job.body,
+            attempts=attempts,
+            error=error,
+            created_at=job.created_at,
+            last_attempt_at=job.claimed_at or now,
+            dead_at=now,
+        )
+    )
+
+
+async def dead_letter_job(session: AsyncSession, job: MessageJob, error: str) -> None:
+    """Mark a job FAILED and record it in the dead-letter table, atomically.
+
+    The MessageJob row is kept so its primary key still deduplicates WAHA
+    redeliveries of the same message. Raises ``LeaseLostError`` if the
+    caller's claim on the job has lapsed.
+    """
+    await _dead_letter(session, job, error, datetime.now(UTC))
+    await session.commit()
+
+
+async def replay_dead_letters(
+    session: AsyncSession,
+    job_ids: Collection[str] | None = None,
+    on_commit: Callable[[], None] | None = None,
+) -> int:
+    """Requeue dead-lettered jobs with a fresh retry budget; return the count.
+
+    Replays every dead letter when ``job_ids`` is None. ``on_commit`` is
+    called once the jobs are requeued, e.g. to wake an idle worker.
+    """
+    dead = select(DeadLetterJob.id)
+    if job_ids is not None:
+        dead = dead.where(col(DeadLetterJob.id).in_(job_ids))
+    ids = list((await session.execute(dead)).scalars().all())
+    if not ids:
+        return 0
+    await session.execute(
         update(MessageJob)
-        .where(col(MessageJob.id) == job.id)
+        .where(col(MessageJob.id).in_(ids))
         .values(
             status=JobStatus.PENDING,
-            attempts=job.attempts + 1,
-            run_after=now + timedelta(seconds=delay_seconds),
+            attempts=0,
+            run_after=None,
+            claimed_at=None,
+            lease_expires_at=None,
         )
     )
-    await session.execute(stmt)
+    await session.execute(delete(DeadLetterJob).where(col(DeadLetterJob.id).in_(ids)))
     await session.commit()
+    if on_commit is not None:
+        on_commit()
+    return len(ids)
 
 
-async def fail_job(session: AsyncSession, job: MessageJob) -> None:
-    """Mark a job as permanently failed."""
+async def archive_finished_jobs(
+    session: AsyncSession,
+    older_than: datetime,
+    limit: int,
+) -> int:
+    """Move up to ``limit`` finished jobs created before ``older_than`` to archive.
+
+    Bodies are zlib-compressed on the way into ``archivedjob``, and the copy
+    and the delete commit together, so a job is never lost or in both tables.
+    Dead-lettered jobs stay put until they are replayed or discarded; agent
+    checkpoints left by other failed jobs are deleted with them. Returns
+    how many jobs were moved; fewer than ``limit`` means the backlog is clear.
+    """
+    dead_lettered = exists().where(col(DeadLetterJob.id) == col(MessageJob.id))
     stmt = (
-        update(MessageJob)
-        .where(col(MessageJob.id) == job.id)
-        .values(status=JobStatus.FAILED)
+        select(MessageJob)
+        .where(
+            col(MessageJob.status).in_(
+                [
+                    JobStatus.DONE,
+                    JobStatus.FAILED,
+                    JobStatus.EXPIRED,
+                    JobStatus.REJECTED,
+                ]
+            ),
+            col(MessageJob.created_at) < older_than,
+            ~dead_lettered,
+        )
+        .limit(limit)
+    )
+    jobs = list((await session.execute(stmt)).scalars().all())
+    if not jobs:
+        return 0
+    archived = [
+        {
+            "id": job.id,
+            "sender_id": job.sender_id,
+            "group_id": job.group_id,
+            "body": zlib.compress(job.body.encode()),
+            "status": job.status,
+            "attempts": job.attempts,
+            "created_at": job.created_at,
+            "completed_at": job.completed_at,
+            "archived_at": datetime.now(UTC),
+        }
+        for job in jobs
+    ]
+    ids = [job.id for job in jobs]
+    await session.execute(insert(ArchivedJob).values(archived).on_conflict_do_nothing())
+    await session.execute(
+        delete(AgentCheckpoint).where(col(AgentCheckpoint.job_id).in_(ids))
     )
-    await session.execute(stmt)
+    await session.execute(delete(MessageJob).where(col(MessageJob.id).in_(ids)))
     await session.commit()
+    return len(jobs)
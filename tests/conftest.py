@@ -9,6 +9,9 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 # Ensure all table models are imported so metadata.create_all sees them.
 import choresir.models.job  # noqa: F401
+import choresir.models.leader  # noqa: F401
+import choresir.models.outbox  # noqa: F401
+import choresir.models.rate_limit  # noqa: F401
 from choresir.enums import (
     MemberRole,
     MemberStatus,
@@ -34,6 +37,16 @@ async def engine():
     await eng.dispose()
 
 
+@pytest.fixture
+async def file_engine(tmp_path):
+    """File-backed engine for tests that hold several connections at once."""
+    eng = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with eng.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    yield eng
+    await eng.dispose()
+
+
 @pytest.fixture
 async def session(engine):
     async with AsyncSession(engine, expire_on_commit=False) as s:
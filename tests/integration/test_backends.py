@@ -0,0 +1,258 @@
+"""Integration tests holding both job queue backends to the same contract."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import json
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from choresir.config import Settings
+from choresir.enums import JobPriority, JobStatus, QueueBackend
+from choresir.models.job import MessageJob
+from choresir.webhook.router import create_webhook_router
+from choresir.worker.backends import (
+    MemoryJobQueue,
+    SQLiteJobQueue,
+    create_job_queue,
+)
+from choresir.worker.notifier import JobNotifier
+from choresir.worker.processor import merge_jobs, message_worker_loop
+
+
+@pytest.fixture
+async def sf(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture(params=["sqlite", "sqlite-group-commit", "memory"])
+def queue(request, sf):
+    if request.param == "memory":
+        return MemoryJobQueue()
+    if request.param == "sqlite-group-commit":
+        return SQLiteJobQueue(sf, group_commit_seconds=0.001)
+    return SQLiteJobQueue(sf)
+
+
+def _job(job_id="job-1", sender_id="s@c.us", **kw) -> MessageJob:
+    return MessageJob(id=job_id, sender_id=sender_id, group_id="g@g.us", body="x", **kw)
+
+
+@pytest.mark.anyio
+async def test_enqueue_drops_duplicate_ids(queue):
+    assert await queue.enqueue(_job()) is True
+    assert await queue.enqueue(_job()) is False
+    assert await queue.depth() == {JobStatus.PENDING: 1}
+
+
+@pytest.mark.anyio
+async def test_group_commit_batches_concurrent_enqueues(engine, sf):
+    queue = SQLiteJobQueue(sf, group_commit_seconds=0.01, group_commit_max_jobs=50)
+    commits: list[object] = []
+
+    def capture(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, "commit", capture)
+    try:
+        results = await asyncio.gather(
+            *(queue.enqueue(_job(f"job-{i}", f"{i}@c.us")) for i in range(20)),
+            queue.enqueue(_job("job-0", "0@c.us")),
+        )
+    finally:
+        event.remove(engine.sync_engine, "commit", capture)
+    assert results == [True] * 20 + [False]
+    # The first enqueue commits alone; the rest share the next commit.
+    assert len(commits) == 2
+    assert await queue.depth() == {JobStatus.PENDING: 20}
+
+
+@pytest.mark.anyio
+async def test_group_commit_does_not_delay_a_lone_enqueue(sf):
+    queue = SQLiteJobQueue(sf, group_commit_seconds=60)
+    assert await asyncio.wait_for(queue.enqueue(_job()), timeout=2.0) is True
+
+
+@pytest.mark.anyio
+async def test_group_commit_flushes_full_batch_without_waiting(sf):
+    queue = SQLiteJobQueue(sf, group_commit_seconds=60, group_commit_max_jobs=2)
+    results = await asyncio.wait_for(
+        asyncio.gather(queue.enqueue(_job("a", "a")), queue.enqueue(_job("b", "b"))),
+        timeout=2.0,
+    )
+    assert results == [True, True]
+
+
+@pytest.mark.anyio
+async def test_claim_orders_by_lane_and_leases(queue):
+    now = datetime.now(UTC)
+    await queue.enqueue(_job("job-low", "a@c.us", created_at=now - timedelta(1)))
+    await queue.enqueue(_job("job-high", "b@c.us", priority=JobPriority.HIGH))
+    claimed = await queue.claim(10, 60, max_wait_seconds=10**9)
+    assert [job.id for job in claimed] == ["job-high", "job-low"]
+    assert all(job.status == JobStatus.PROCESSING for job in claimed)
+    assert await queue.claim(10, 60) == []
+
+
+@pytest.mark.anyio
+async def test_complete_retry_and_fail(queue, sf):
+    for job_id in ("job-done", "job-retry", "job-dead"):
+        await queue.enqueue(_job(job_id, f"{job_id}@c.us"))
+    claimed = {job.id: job for job in await queue.claim(10, 60)}
+    async with sf() as session:
+        await queue.complete(session, [claimed["job-done"]])
+        await queue.retry(session, claimed["job-retry"], 3600)
+        await queue.fail(session, claimed["job-dead"], "boom")
+    assert await queue.depth() == {
+        JobStatus.DONE: 1,
+        JobStatus.PENDING: 1,
+        JobStatus.FAILED: 1,
+    }
+    assert await queue.claim(10, 60) == []
+    earliest = await queue.next_run_after()
+    assert earliest > datetime.now(UTC) + timedelta(minutes=59)
+
+
+@pytest.mark.anyio
+async def test_absorb_folds_coalesced_jobs_into_the_head(queue, sf):
+    now = datetime.now(UTC)
+    for i, text in enumerate(["add Ada", "thanks!"]):
+        await queue.enqueue(
+            MessageJob(
+                id=f"job-{i}",
+                sender_id=f"{i}@c.us",
+                group_id="g@g.us",
+                body=text,
+                created_at=now + timedelta(milliseconds=i),
+            )
+        )
+    jobs = sorted(await queue.claim(10, 60), key=lambda job: job.created_at)
+    merged = merge_jobs(jobs)
+    async with sf() as session:
+        await queue.absorb(session, merged, jobs[1:])
+        await queue.retry(session, merged, 0)
+    (again,) = await queue.claim(10, 60)
+    assert again.id == "job-0"
+    assert again.body == "add Ada\nthanks!"
+    assert again.attempts == 1
+    assert await queue.depth() == {JobStatus.PROCESSING: 1, JobStatus.DONE: 1}
+
+
+@pytest.mark.anyio
+async def test_replay_dead_letters_requeues_and_wakes(queue, sf):
+    for job_id in ("job-a", "job-b"):
+        await queue.enqueue(_job(job_id, f"{job_id}@c.us"))
+    async with sf() as session:
+        for job in await queue.claim(10, 60):
+            await queue.fail(session, job, "boom")
+    woken: list[bool] = []
+    assert await queue.replay_dead_letters(["job-a"], lambda: woken.append(True)) == 1
+    assert woken == [True]
+    (again,) = await queue.claim(10, 60)
+    assert again.id == "job-a"
+    assert again.attempts == 0
+    assert await queue.replay_dead_letters() == 1
+    assert await queue.replay_dead_letters() == 0
+    assert (await queue.depth()).get(JobStatus.FAILED, 0) == 0
+
+
+@pytest.mark.anyio
+async def test_reap_returns_lapsed_leases(queue):
+    await queue.enqueue(_job())
+    (job,) = await queue.claim(1, 60)
+    assert await queue.extend_leases([job], -1) == set()
+    assert await queue.reap_expired_leases(max_attempts=3) == 1
+    (again,) = await queue.claim(1, 60)
+    assert again.attempts == 1
+
+
+@pytest.mark.anyio
+async def test_release_leases_requeues_without_attempt(queue):
+    await queue.enqueue(_job())
+    (job,) = await queue.claim(1, 60)
+    assert await queue.release_leases([job]) == 1
+    (again,) = await queue.claim(1, 60)
+    assert again.attempts == 0
+
+
+@pytest.mark.anyio
+async def test_expire_stale_and_backlog(queue):
+    old = datetime.now(UTC) - timedelta(hours=2)
+    await queue.enqueue(_job("job-old", created_at=old))
+    await queue.enqueue(_job("job-new", "t@c.us"))
+    assert await queue.expire_stale({JobPriority.NORMAL: 3600}) == 1
+    depth, oldest = await queue.backlog()
+    assert depth == 1
+    assert oldest > old + timedelta(hours=1)
+
+
+@pytest.mark.anyio
+async def test_expire_stale_catch_up_folds_conversation(queue):
+    old = datetime.now(UTC) - timedelta(hours=2)
+    await queue.enqueue(_job("job-1", created_at=old))
+    await queue.enqueue(_job("job-2", created_at=old + timedelta(seconds=1)))
+    assert await queue.expire_stale({JobPriority.NORMAL: 3600}, catch_up=True) == 1
+    (job,) = await queue.claim(10, 60)
+    assert job.id == "job-2"
+    assert job.body.startswith("[Catching up on 2 messages")
+
+
+@pytest.mark.anyio
+async def test_create_job_queue_follows_settings(sf):
+    memory = Settings(queue_backend=QueueBackend.MEMORY)
+    assert isinstance(create_job_queue(memory, sf), MemoryJobQueue)
+    assert isinstance(create_job_queue(Settings(), sf), SQLiteJobQueue)
+
+
+@pytest.mark.anyio
+async def test_webhook_to_worker_through_memory_queue(sf):
+    secret = "s3cret"
+    queue = MemoryJobQueue()
+    notifier = JobNotifier()
+    processed: list[str] = []
+
+    async def process(job: MessageJob, session) -> None:
+        processed.append(job.body)
+
+    app = FastAPI()
+    app.include_router(create_webhook_router(sf, secret, notifier, queue=queue))
+    body = json.dumps(
+        {
+            "event": "message",
+            "payload": {
+                "id": "wamid-1",
+                "from": "sender@c.us",
+                "to": "group@g.us",
+                "body": "Hello",
+            },
+        }
+    ).encode()
+    signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    worker = asyncio.create_task(
+        message_worker_loop(sf, process, Settings(), notifier, queue=queue)
+    )
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            resp = await client.post(
+                "/webhook", content=body, headers={"X-WAHA-Signature-256": signature}
+            )
+        assert resp.status_code == 200
+        for _ in range(200):
+            if processed:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    assert processed == ["Hello"]
+    assert await queue.depth() == {JobStatus.DONE: 1}
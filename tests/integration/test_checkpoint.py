@@ -0,0 +1,140 @@
+"""Integration tests for checkpointed agent runs."""
+
+from __future__ import annotations
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models.function import FunctionModel
+from sqlmodel import select
+
+from choresir.agent.agent import AgentDeps
+from choresir.agent.checkpoint import load_checkpoint, run_agent_checkpointed
+from choresir.models.job import AgentCheckpoint
+from choresir.models.member import Member
+
+
+class _Script:
+    """Model that calls ``add_member`` for "add" prompts; can fail on demand."""
+
+    def __init__(self, fail_on: set[int] | None = None) -> None:
+        self.fail_on = fail_on or set()
+        self.calls = 0
+        self.prompts: list[str] = []
+
+    def respond(self, messages, info) -> ModelResponse:
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise TimeoutError("provider dropped the connection")
+        last = messages[-1]
+        kinds = {part.part_kind for part in last.parts}
+        if "tool-return" in kinds:
+            return ModelResponse(parts=[TextPart("Added.")])
+        prompt = last.parts[-1].content
+        self.prompts.append(prompt)
+        if prompt.startswith("add"):
+            return ModelResponse(parts=[ToolCallPart("add_member", {"name": "Ada"})])
+        return ModelResponse(parts=[TextPart("You're welcome.")])
+
+
+def _agent(script: _Script, session, tool_calls: list[str]) -> Agent[AgentDeps, str]:
+    agent = Agent(FunctionModel(script.respond), deps_type=AgentDeps)
+
+    @agent.tool_plain
+    async def add_member(name: str) -> str:
+        tool_calls.append(name)
+        session.add(Member(whatsapp_id=f"{name}@c.us", name=name))
+        return "ok"
+
+    return agent
+
+
+async def _members(session) -> list[str]:
+    return list((await session.exec(select(Member.whatsapp_id))).all())
+
+
+@pytest.mark.anyio
+async def test_failed_run_keeps_tool_results_and_their_writes(session, agent_deps):
+    script = _Script(fail_on={2})
+    tool_calls: list[str] = []
+    agent = _agent(script, session, tool_calls)
+
+    with pytest.raises(TimeoutError):
+        await run_agent_checkpointed(agent, "job-1", "add Ada", agent_deps, session)
+
+    prompt, history = await load_checkpoint(session, "job-1")
+    assert prompt == "add Ada"
+    assert isinstance(history[-1], ModelRequest)
+    assert history[-1].parts[0].part_kind == "tool-return"
+    assert await _members(session) == ["Ada@c.us"]
+
+
+@pytest.mark.anyio
+async def test_retry_resumes_without_repeating_tools(session, agent_deps):
+    script = _Script(fail_on={2})
+    tool_calls: list[str] = []
+    agent = _agent(script, session, tool_calls)
+
+    with pytest.raises(TimeoutError):
+        await run_agent_checkpointed(agent, "job-1", "add Ada", agent_deps, session)
+    output = await run_agent_checkpointed(
+        agent, "job-1", "add Ada", agent_deps, session
+    )
+    await session.commit()
+
+    assert output == "Added."
+    assert tool_calls == ["Ada"]
+    assert script.calls == 3
+    assert await _members(session) == ["Ada@c.us"]
+    assert await session.get(AgentCheckpoint, "job-1") is None
+
+
+@pytest.mark.anyio
+async def test_failure_discards_writes_after_last_checkpoint(session, agent_deps):
+    tool_calls: list[str] = []
+
+    def crash(messages, info) -> ModelResponse:
+        raise TimeoutError("provider dropped the connection")
+
+    agent = _agent(_Script(), session, tool_calls)
+    session.add(Member(whatsapp_id="uncommitted@c.us"))
+    with pytest.raises(TimeoutError), agent.override(model=FunctionModel(crash)):
+        await run_agent_checkpointed(agent, "job-1", "hi", agent_deps, session)
+
+    assert await _members(session) == []
+    assert await load_checkpoint(session, "job-1") is None
+
+
+@pytest.mark.anyio
+async def test_resume_answers_messages_coalesced_since_checkpoint(session, agent_deps):
+    script = _Script(fail_on={2})
+    agent = _agent(script, session, [])
+
+    with pytest.raises(TimeoutError):
+        await run_agent_checkpointed(agent, "job-1", "add Ada", agent_deps, session)
+    output = await run_agent_checkpointed(
+        agent, "job-1", "add Ada\nthanks!", agent_deps, session
+    )
+
+    assert script.prompts == ["add Ada", "thanks!"]
+    assert output == "Added.\n\nYou're welcome."
+
+
+@pytest.mark.anyio
+async def test_rewritten_prompt_starts_over_instead_of_resuming(session, agent_deps):
+    script = _Script(fail_on={2})
+    tool_calls: list[str] = []
+    agent = _agent(script, session, tool_calls)
+
+    with pytest.raises(TimeoutError):
+        await run_agent_checkpointed(
+            agent, "job-1", "add Ada\nthanks!", agent_deps, session
+        )
+    output = await run_agent_checkpointed(
+        agent, "job-1", "thanks!", agent_deps, session
+    )
+
+    # No follow-up run on the old history, which never saw this prompt.
+    assert script.prompts == ["add Ada\nthanks!", "thanks!"]
+    assert output == "You're welcome."
+    assert tool_calls == ["Ada"]
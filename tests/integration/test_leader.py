@@ -0,0 +1,110 @@
+"""Integration tests for SQLite lease-based leader election."""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from choresir.config import Settings
+from choresir.leader import LeaderElection, lead, release, try_acquire
+from choresir.models.leader import LeaderLease
+
+
+def _settings(**overrides) -> Settings:
+    values = {"leader_lease_seconds": 0.3, "leader_renew_seconds": 0.05}
+    return Settings(**(values | overrides))
+
+
+@pytest.fixture
+async def sf(engine):
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+@pytest.mark.anyio
+async def test_lease_is_exclusive_while_unexpired(session):
+    assert await try_acquire(session, "scheduler", "a", 60)
+    assert not await try_acquire(session, "scheduler", "b", 60)
+    assert await try_acquire(session, "scheduler", "a", 60)
+
+
+@pytest.mark.anyio
+async def test_lapsed_lease_can_be_taken_over(session):
+    assert await try_acquire(session, "scheduler", "a", -1)
+    assert await try_acquire(session, "scheduler", "b", 60)
+    lease = await session.get(LeaderLease, "scheduler")
+    assert lease is not None
+    assert lease.holder == "b"
+
+
+@pytest.mark.anyio
+async def test_release_only_drops_own_lease(session):
+    assert await try_acquire(session, "scheduler", "a", 60)
+    await release(session, "scheduler", "b")
+    assert not await try_acquire(session, "scheduler", "b", 60)
+    await release(session, "scheduler", "a")
+    assert await try_acquire(session, "scheduler", "b", 60)
+
+
+@pytest.mark.anyio
+async def test_only_one_replica_runs_the_role(sf):
+    running: list[str] = []
+
+    def role_for(holder: str):
+        @asynccontextmanager
+        async def role():
+            running.append(holder)
+            try:
+                yield
+            finally:
+                running.remove(holder)
+
+        return role
+
+    elections = [
+        LeaderElection(sf, "scheduler", _settings(), holder=h) for h in ("a", "b")
+    ]
+    tasks = [asyncio.create_task(lead(e, role_for(e.holder))) for e in elections]
+    await asyncio.sleep(0.2)
+    assert len(running) == 1
+    leader = running[0]
+
+    # Stopping the leader releases the lease and the other replica takes over.
+    index = 0 if leader == "a" else 1
+    tasks[index].cancel()
+    await asyncio.gather(tasks[index], return_exceptions=True)
+    await asyncio.sleep(0.2)
+    assert running == ["b" if leader == "a" else "a"]
+
+    tasks[1 - index].cancel()
+    await asyncio.gather(tasks[1 - index], return_exceptions=True)
+    assert running == []
+
+
+@pytest.mark.anyio
+async def test_role_that_fails_to_start_is_retried(sf):
+    attempts = 0
+    started = asyncio.Event()
+
+    @asynccontextmanager
+    async def role():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("database is locked")
+        started.set()
+        yield
+
+    election = LeaderElection(sf, "scheduler", _settings(), holder="a")
+    task = asyncio.create_task(lead(election, role))
+    try:
+        await asyncio.wait_for(started.wait(), timeout=2.0)
+        # The failure stepped down and campaigned again rather than ending lead.
+        assert not task.done()
+        assert election.is_leader
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    assert attempts == 2
@@ -0,0 +1,244 @@
+"""Integration tests for the transactional reply outbox."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from choresir.config import Settings
+from choresir.enums import JobStatus, OutboxStatus
+from choresir.metrics import PipelineMetrics
+from choresir.models.job import MessageJob
+from choresir.models.outbox import OutboundMessage
+from choresir.services.messaging import OutboxWriter
+from choresir.worker.notifier import JobNotifier
+from choresir.worker.outbox import (
+    claim_outbound,
+    fail_outbound,
+    mark_sent,
+    outbox_sender_loop,
+    purge_outbound,
+    retry_outbound,
+)
+from choresir.worker.processor import message_worker_loop
+
+
+@pytest.fixture
+async def sf(engine):
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+@pytest.fixture
+async def file_sf(file_engine):
+    return async_sessionmaker(file_engine, expire_on_commit=False)
+
+
+async def _queue(sf, chat_id="g@g.us", text="hi", **kw) -> OutboundMessage:
+    message = OutboundMessage(chat_id=chat_id, text=text, **kw)
+    async with sf() as s:
+        s.add(message)
+        await s.commit()
+    return message
+
+
+async def _statuses(sf) -> list[OutboxStatus]:
+    async with sf() as s:
+        stmt = select(OutboundMessage.status).order_by(OutboundMessage.id)
+        return list((await s.execute(stmt)).scalars())
+
+
+@pytest.mark.anyio
+async def test_outbox_sender_queues_on_commit(sf):
+    notified = []
+    async with sf() as s:
+        outbox = OutboxWriter(s, lambda: notified.append(True))
+        await outbox.send("g@g.us", "hello")
+        assert notified == []
+        await s.commit()
+    assert notified == [True]
+    assert await _statuses(sf) == [OutboxStatus.PENDING]
+
+
+@pytest.mark.anyio
+async def test_outbox_sender_discards_on_rollback(sf):
+    notified = []
+    async with sf() as s:
+        outbox = OutboxWriter(s, lambda: notified.append(True))
+        await outbox.send("g@g.us", "hello")
+        await s.rollback()
+    assert notified == []
+    assert await _statuses(sf) == []
+
+
+@pytest.mark.anyio
+async def test_claim_outbound_is_fifo_per_chat(sf):
+    await _queue(sf, "a@g.us", "first")
+    await _queue(sf, "a@g.us", "second")
+    await _queue(sf, "b@g.us", "other")
+    async with sf() as s:
+        claimed = await claim_outbound(s, 10, 60)
+    assert [m.text for m in claimed] == ["first", "other"]
+    assert all(m.status == OutboxStatus.SENDING for m in claimed)
+
+
+@pytest.mark.anyio
+async def test_claim_outbound_holds_chat_while_retry_backs_off(sf):
+    await _queue(sf, "a@g.us", "first")
+    await _queue(sf, "a@g.us", "second")
+    async with sf() as s:
+        (first,) = await claim_outbound(s, 10, 60)
+        await retry_outbound(s, first, 60, "boom")
+        assert await claim_outbound(s, 10, 60) == []
+        await fail_outbound(s, first, "boom")
+        (second,) = await claim_outbound(s, 10, 60)
+    assert second.text == "second"
+
+
+@pytest.mark.anyio
+async def test_claim_outbound_reclaims_lapsed_lease(sf):
+    await _queue(
+        sf,
+        status=OutboxStatus.SENDING,
+        lease_expires_at=datetime.now(UTC) - timedelta(seconds=1),
+    )
+    async with sf() as s:
+        claimed = await claim_outbound(s, 10, 60)
+    assert len(claimed) == 1
+
+
+@pytest.mark.anyio
+async def test_purge_outbound_keeps_undelivered(sf):
+    old = datetime.now(UTC) - timedelta(days=40)
+    await _queue(sf, status=OutboxStatus.SENT, created_at=old)
+    await _queue(sf, status=OutboxStatus.PENDING, created_at=old)
+    async with sf() as s:
+        purged = await purge_outbound(s, datetime.now(UTC) - timedelta(days=30), 10)
+    assert purged == 1
+    assert await _statuses(sf) == [OutboxStatus.PENDING]
+
+
+@pytest.mark.anyio
+async def test_outbox_sender_loop_retries_then_delivers(file_sf):
+    settings = Settings(outbox_backoff_base_seconds=0.01, outbox_idle_poll_seconds=0.01)
+    metrics = PipelineMetrics()
+    delivered: list[tuple[str, str]] = []
+    failures = iter([True])
+
+    async def send(chat_id: str, text: str) -> None:
+        if next(failures, False):
+            raise RuntimeError("WAHA down")
+        delivered.append((chat_id, text))
+
+    await _queue(file_sf, "a@g.us", "first")
+    await _queue(file_sf, "a@g.us", "second")
+    loop = asyncio.create_task(
+        outbox_sender_loop(file_sf, send, settings, JobNotifier(), metrics)
+    )
+    try:
+        for _ in range(300):
+            if await _statuses(file_sf) == [OutboxStatus.SENT, OutboxStatus.SENT]:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        loop.cancel()
+        await asyncio.gather(loop, return_exceptions=True)
+    assert delivered == [("a@g.us", "first"), ("a@g.us", "second")]
+    assert await _statuses(file_sf) == [OutboxStatus.SENT, OutboxStatus.SENT]
+    assert metrics.outbox_deliveries.value(outcome="retry") == 1
+    assert metrics.outbox_deliveries.value(outcome="sent") == 2
+
+
+@pytest.mark.anyio
+async def test_outbox_sender_loop_gives_up_after_max_attempts(file_sf):
+    settings = Settings(
+        outbox_max_attempts=2,
+        outbox_backoff_base_seconds=0.01,
+        outbox_idle_poll_seconds=0.01,
+    )
+
+    async def send(chat_id: str, text: str) -> None:
+        raise RuntimeError("WAHA down")
+
+    message = await _queue(file_sf)
+    loop = asyncio.create_task(outbox_sender_loop(file_sf, send, settings))
+    try:
+        for _ in range(300):
+            if await _statuses(file_sf) == [OutboxStatus.FAILED]:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        loop.cancel()
+        await asyncio.gather(loop, return_exceptions=True)
+    async with file_sf() as s:
+        failed = await s.get(OutboundMessage, message.id)
+    assert failed.status == OutboxStatus.FAILED
+    assert failed.attempts == 2
+    assert failed.last_error == "RuntimeError: WAHA down"
+
+
+@pytest.mark.anyio
+async def test_outbox_sender_loop_flushes_ready_messages_when_stopping(file_sf):
+    delivered: list[str] = []
+
+    async def send(chat_id: str, text: str) -> None:
+        delivered.append(text)
+
+    await _queue(file_sf, "a@g.us", "first")
+    await _queue(file_sf, "b@g.us", "second")
+    stopping = asyncio.Event()
+    stopping.set()
+    await asyncio.wait_for(
+        outbox_sender_loop(file_sf, send, Settings(), stopping=stopping),
+        timeout=2.0,
+    )
+    assert sorted(delivered) == ["first", "second"]
+    assert await _statuses(file_sf) == [OutboxStatus.SENT, OutboxStatus.SENT]
+
+
+@pytest.mark.anyio
+async def test_failed_job_leaves_no_reply_in_outbox(file_sf):
+    settings = Settings(job_backoff_base_seconds=60)
+
+    async def process(job: MessageJob, session) -> None:
+        await OutboxWriter(session).send(job.group_id, f"reply to {job.id}")
+        if job.id == "job-bad":
+            raise RuntimeError("agent crashed after replying")
+
+    async with file_sf() as s:
+        for job_id, sender_id in [("job-good", "a@c.us"), ("job-bad", "b@c.us")]:
+            s.add(
+                MessageJob(id=job_id, sender_id=sender_id, group_id="g@g.us", body="x")
+            )
+        await s.commit()
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        for _ in range(200):
+            async with file_sf() as s:
+                good = await s.get(MessageJob, "job-good")
+                bad = await s.get(MessageJob, "job-bad")
+                if good.status == JobStatus.DONE and bad.attempts == 1:
+                    break
+            await asyncio.sleep(0.01)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    async with file_sf() as s:
+        texts = list((await s.execute(select(OutboundMessage.text))).scalars())
+    assert texts == ["reply to job-good"]
+
+
+@pytest.mark.anyio
+async def test_mark_sent_records_delivery(sf):
+    await _queue(sf)
+    async with sf() as s:
+        (message,) = await claim_outbound(s, 10, 60)
+        await mark_sent(s, message)
+        sent = await s.get(OutboundMessage, message.id)
+        await s.refresh(sent)
+    assert sent.status == OutboxStatus.SENT
+    assert sent.sent_at is not None
+    assert sent.lease_expires_at is None
@@ -0,0 +1,98 @@
+"""Integration tests for the SQLite-backed shared rate limiter."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from choresir.config import Settings
+from choresir.enums import RateLimitBackend
+from choresir.models.rate_limit import RateLimitBucket
+from choresir.worker.limiters import (
+    GLOBAL_BUCKET_KEY,
+    MemoryRateLimiter,
+    SQLiteRateLimiter,
+    create_rate_limiter,
+)
+
+
+def _settings(**overrides) -> Settings:
+    values = {
+        "global_rate_limit_count": 3,
+        "global_rate_limit_seconds": 60,
+        "per_user_rate_limit_count": 2,
+        "per_user_rate_limit_seconds": 60,
+    }
+    return Settings(**(values | overrides))
+
+
+@pytest.fixture
+async def sf(engine):
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+@pytest.fixture
+async def file_sf(file_engine):
+    return async_sessionmaker(file_engine, expire_on_commit=False)
+
+
+@pytest.mark.anyio
+async def test_sqlite_limiter_enforces_per_user_limit(sf):
+    limiter = SQLiteRateLimiter(sf, _settings())
+    assert await limiter.acquire("a@c.us") == 0.0
+    assert await limiter.acquire("a@c.us") == 0.0
+    wait = await limiter.acquire("a@c.us")
+    assert 0 < wait <= 30
+
+
+@pytest.mark.anyio
+async def test_sqlite_limiter_refusal_takes_no_global_token(sf):
+    limiter = SQLiteRateLimiter(sf, _settings(per_user_rate_limit_count=1))
+    assert await limiter.acquire("a@c.us") == 0.0
+    assert await limiter.acquire("a@c.us") > 0
+    async with sf() as session:
+        bucket = await session.get(RateLimitBucket, GLOBAL_BUCKET_KEY)
+    assert bucket is not None
+    assert bucket.tokens == pytest.approx(2, abs=0.01)
+
+
+@pytest.mark.anyio
+async def test_sqlite_limiter_state_is_shared_between_instances(sf):
+    first = SQLiteRateLimiter(sf, _settings())
+    second = SQLiteRateLimiter(sf, _settings())
+    assert await first.acquire("a@c.us") == 0.0
+    assert await second.acquire("b@c.us") == 0.0
+    assert await first.acquire("c@c.us") == 0.0
+    assert await second.acquire("d@c.us") > 0
+
+
+@pytest.mark.anyio
+async def test_sqlite_limiter_refills_over_time(sf):
+    limiter = SQLiteRateLimiter(
+        sf, _settings(per_user_rate_limit_count=1, per_user_rate_limit_seconds=1)
+    )
+    assert await limiter.acquire("a@c.us") == 0.0
+    wait = await limiter.acquire("a@c.us")
+    assert wait > 0
+    await asyncio.sleep(wait)
+    assert await limiter.acquire("a@c.us") == 0.0
+
+
+@pytest.mark.anyio
+async def test_sqlite_limiter_never_overdraws_under_concurrency(file_sf):
+    limiters = [SQLiteRateLimiter(file_sf, _settings()) for _ in range(4)]
+    waits = await asyncio.gather(
+        *(limiters[i % 4].acquire(f"u{i}@c.us") for i in range(12))
+    )
+    assert sum(1 for wait in waits if wait == 0.0) == 3
+
+
+def test_create_rate_limiter_selects_backend():
+    memory = create_rate_limiter(_settings(), async_sessionmaker())
+    sqlite = create_rate_limiter(
+        _settings(rate_limit_backend=RateLimitBackend.SQLITE), async_sessionmaker()
+    )
+    assert isinstance(memory, MemoryRateLimiter)
+    assert isinstance(sqlite, SQLiteRateLimiter)
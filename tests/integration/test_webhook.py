@@ -10,13 +10,22 @@ import pytest
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from choresir.config import Settings
+from choresir.enums import JobPriority, JobStatus
 from choresir.errors import WebhookAuthError
+from choresir.metrics import PipelineMetrics, create_metrics_router
 from choresir.models.job import MessageJob
+from choresir.webhook.admission import AdmissionController
+from choresir.webhook.dedup import RecentMessageIds
 from choresir.webhook.router import create_webhook_router
+from choresir.worker.backends import SQLiteJobQueue
+from choresir.worker.limiters import MemoryRateLimiter
+from choresir.worker.notifier import JobNotifier
 
 _SECRET = "test-secret"
 
@@ -177,3 +186,185 @@ async def test_webhook_non_message_event_ignored(
     assert resp.status_code == 200
     async with session_factory() as s:
         assert await s.get(MessageJob, "msg-ack") is None
+
+
+@pytest.mark.anyio
+async def test_webhook_enqueue_notifies_worker(engine):
+    sm = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    notifier = JobNotifier()
+    app = FastAPI()
+    app.include_router(create_webhook_router(sm, _SECRET, notifier))
+    body = _payload(msg_id="msg-notify")
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as c:
+        resp = await c.post(
+            "/webhook",
+            content=body,
+            headers={"X-WAHA-Signature-256": _sign(body)},
+        )
+    assert resp.status_code == 200
+    assert await notifier.wait(0.01) is True
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_reports_enqueues_and_queue_depth(engine):
+    sm = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    metrics = PipelineMetrics()
+    app = FastAPI()
+    app.include_router(create_webhook_router(sm, _SECRET, metrics=metrics))
+    app.include_router(create_metrics_router(SQLiteJobQueue(sm), metrics))
+    async with sm() as s:
+        s.add(
+            MessageJob(
+                id="old", sender_id="a", group_id="g", body="x", status=JobStatus.DONE
+            )
+        )
+        await s.commit()
+    body = _payload(msg_id="msg-metrics")
+    headers = {"X-WAHA-Signature-256": _sign(body)}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as c:
+        await c.post("/webhook", content=body, headers=headers)
+        await c.post("/webhook", content=body, headers=headers)
+        resp = await c.get("/metrics")
+    assert resp.status_code == 200
+    lines = resp.text.splitlines()
+    assert 'choresir_jobs_enqueued_total{outcome="queued"} 1' in lines
+    assert 'choresir_jobs_enqueued_total{outcome="duplicate"} 1' in lines
+    assert 'choresir_queue_depth{status="pending"} 1' in lines
+    assert 'choresir_queue_depth{status="done"} 1' in lines
+    assert 'choresir_queue_depth{status="failed"} 0' in lines
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_reports_user_limiter_store(engine):
+    sm = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    metrics = PipelineMetrics()
+    limiter = MemoryRateLimiter(Settings(per_user_limiter_max_entries=2))
+    for sender in ("a", "b", "c"):
+        # Untouched buckets are drained, so the oldest is evicted at once.
+        limiter.user_limiters.get(sender)
+    app = FastAPI()
+    app.include_router(create_metrics_router(SQLiteJobQueue(sm), metrics, limiter))
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as c:
+        resp = await c.get("/metrics")
+    lines = resp.text.splitlines()
+    assert "choresir_user_limiters 2" in lines
+    assert "choresir_user_limiter_evictions_total 1" in lines
+
+
+@pytest.mark.anyio
+async def test_recent_duplicate_is_answered_without_the_database(engine):
+    sm = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    metrics = PipelineMetrics()
+    recent = RecentMessageIds(max_entries=10, ttl_seconds=60)
+    app = FastAPI()
+    app.include_router(
+        create_webhook_router(sm, _SECRET, metrics=metrics, recent_ids=recent)
+    )
+    statements: list[str] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    body = _payload(msg_id="msg-redelivered")
+    headers = {"X-WAHA-Signature-256": _sign(body)}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as c:
+        await c.post("/webhook", content=body, headers=headers)
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            resp = await c.post("/webhook", content=body, headers=headers)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+    assert resp.status_code == 200
+    assert statements == []
+    assert metrics.dedup_lookups.value(result="miss") == 1
+    assert metrics.dedup_lookups.value(result="hit") == 1
+    assert metrics.enqueued.value(outcome="duplicate") == 1
+
+
+@pytest.mark.anyio
+async def test_webhook_assigns_priority_lane(webhook_client: AsyncClient, engine):
+    group = json.dumps(
+        {
+            "event": "message",
+            "payload": {
+                "id": "msg-group",
+                "fromMe": False,
+                "from": "group@g.us",
+                "participant": "sender@c.us",
+                "body": "Hello",
+            },
+        }
+    ).encode()
+    direct = _payload(msg_id="msg-dm")
+    for body in (group, direct):
+        await webhook_client.post(
+            "/webhook", content=body, headers={"X-WAHA-Signature-256": _sign(body)}
+        )
+    async with AsyncSession(engine) as s:
+        jobs = {job.id: job for job in (await s.exec(select(MessageJob))).all()}
+    assert jobs["msg-group"].priority == JobPriority.NORMAL
+    assert jobs["msg-dm"].priority == JobPriority.HIGH
+
+
+@pytest.mark.anyio
+async def test_webhook_admission_sheds_group_chatter_under_backlog(engine):
+    sm = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    settings = Settings(
+        admission_refresh_seconds=3600,
+        admission_deprioritize_depth=1,
+        admission_reject_depth=2,
+    )
+    metrics = PipelineMetrics()
+    admission = AdmissionController(SQLiteJobQueue(sm), settings, metrics)
+    notifier = JobNotifier()
+    app = FastAPI()
+    app.include_router(
+        create_webhook_router(
+            sm, _SECRET, notifier, metrics=metrics, admission=admission
+        )
+    )
+    async with sm() as s:
+        s.add(MessageJob(id="backlog", sender_id="a", group_id="g", body="x"))
+        await s.commit()
+
+    def group_message(msg_id: str) -> bytes:
+        return json.dumps(
+            {
+                "event": "message",
+                "payload": {
+                    "id": msg_id,
+                    "from": "group@g.us",
+                    "participant": "sender@c.us",
+                    "body": "lol",
+                },
+            }
+        ).encode()
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as c:
+        for body in (group_message("m-1"), group_message("m-2"), _payload("m-dm")):
+            resp = await c.post(
+                "/webhook", content=body, headers={"X-WAHA-Signature-256": _sign(body)}
+            )
+            assert resp.status_code == 200
+
+    async with AsyncSession(engine) as s:
+        jobs = {job.id: job for job in (await s.exec(select(MessageJob))).all()}
+    assert jobs["m-1"].status == JobStatus.PENDING
+    assert jobs["m-1"].priority == JobPriority.LOW
+    assert jobs["m-2"].status == JobStatus.REJECTED
+    assert jobs["m-dm"].status == JobStatus.PENDING
+    assert jobs["m-dm"].priority == JobPriority.HIGH
+    assert metrics.admission.value(decision="deprioritized") == 1
+    assert metrics.admission.value(decision="rejected") == 1
+    assert metrics.enqueued.value(outcome="rejected") == 1
+    assert metrics.backlog_depth.value() == 3
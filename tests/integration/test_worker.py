@@ -2,14 +2,50 @@
 
 from __future__ import annotations
 
+import asyncio
+import zlib
 from datetime import UTC, datetime, timedelta
 
 import pytest
+from aiolimiter import AsyncLimiter
+from sqlalchemy import event, select, update
 from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import col
 
-from choresir.enums import JobStatus
-from choresir.models.job import MessageJob
-from choresir.worker.queue import claim_next_job, complete_job, fail_job, retry_job
+from choresir.config import Settings
+from choresir.enums import JobPriority, JobStatus
+from choresir.errors import LeaseLostError
+from choresir.metrics import PipelineMetrics
+from choresir.models.job import (
+    AgentCheckpoint,
+    ArchivedJob,
+    DeadLetterJob,
+    MessageJob,
+)
+from choresir.models.member import Member
+from choresir.worker.limiters import seconds_until_capacity
+from choresir.worker.notifier import JobNotifier, watch_enqueues
+from choresir.worker.processor import (
+    job_budget,
+    merge_jobs,
+    message_worker_loop,
+    shard_for,
+)
+from choresir.worker.queue import (
+    archive_finished_jobs,
+    backoff_delay,
+    claim_jobs,
+    claim_next_job,
+    complete_job,
+    dead_letter_job,
+    expire_stale_jobs,
+    extend_leases,
+    next_run_after,
+    reap_expired_leases,
+    release_leases,
+    replay_dead_letters,
+    retry_job,
+)
 
 
 @pytest.fixture
@@ -17,12 +53,21 @@ async def sf(engine):
     return async_sessionmaker(engine, expire_on_commit=False)
 
 
-async def _insert(sf, job_id="job-1", **kw):
+@pytest.fixture
+async def file_sf(file_engine):
+    return async_sessionmaker(file_engine, expire_on_commit=False)
+
+
+def _naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None)
+
+
+async def _insert(sf, job_id="job-1", sender_id="s@c.us", body="x", **kw):
     job = MessageJob(
         id=job_id,
-        sender_id="s@c.us",
+        sender_id=sender_id,
         group_id="g@g.us",
-        body="x",
+        body=body,
         **kw,
     )
     async with sf() as s:
@@ -49,6 +94,145 @@ async def test_claim_next_job_skips_future_run_after(sf):
         assert await claim_next_job(s) is None
 
 
+@pytest.mark.anyio
+async def test_claim_next_job_leaves_other_jobs_pending(sf):
+    await _insert(sf, "job-a")
+    await _insert(sf, "job-b")
+    async with sf() as s:
+        claimed = await claim_next_job(s)
+    assert claimed is not None
+    async with sf() as s:
+        other = await s.get(MessageJob, "job-b" if claimed.id == "job-a" else "job-a")
+        assert other is not None
+        assert other.status == JobStatus.PENDING
+
+
+@pytest.mark.anyio
+async def test_claim_jobs_respects_limit_and_fifo_order(sf):
+    base = datetime.now(UTC)
+    for i in (3, 0, 2, 1):
+        await _insert(sf, f"job-{i}", created_at=base + timedelta(seconds=i))
+    async with sf() as s:
+        claimed = await claim_jobs(s, 3)
+    assert [j.id for j in claimed] == ["job-0", "job-1", "job-2"]
+    assert all(j.status == JobStatus.PROCESSING for j in claimed)
+    async with sf() as s:
+        rest = await s.get(MessageJob, "job-3")
+        assert rest is not None
+        assert rest.status == JobStatus.PENDING
+
+
+@pytest.mark.anyio
+async def test_claim_jobs_sets_lease(sf):
+    await _insert(sf, "job-lease")
+    async with sf() as s:
+        [claimed] = await claim_jobs(s, 1, lease_seconds=30)
+    assert claimed.lease_expires_at is not None
+    assert claimed.claimed_at is not None
+    assert claimed.lease_expires_at > claimed.claimed_at
+
+
+@pytest.mark.anyio
+async def test_extend_leases_reports_jobs_no_longer_held(sf):
+    await _insert(sf, "job-held")
+    await _insert(sf, "job-queued", created_at=datetime.now(UTC) + timedelta(hours=1))
+    async with sf() as s:
+        [claimed] = await claim_jobs(s, 1)
+        queued = await s.get(MessageJob, "job-queued")
+    async with sf() as s:
+        lost = await extend_leases(s, [claimed, queued], 30)
+    assert lost == {"job-queued"}
+
+
+@pytest.mark.anyio
+async def test_extend_leases_is_fenced_on_the_claim(sf):
+    await _insert(sf, "job-1")
+    async with sf() as s:
+        [claimed] = await claim_jobs(s, 1, lease_seconds=30)
+    # A previous claim's heartbeat, from a worker whose lease was reaped.
+    stale = MessageJob(**claimed.model_dump())
+    stale.claimed_at = claimed.claimed_at - timedelta(minutes=5)
+    async with sf() as s:
+        assert await extend_leases(s, [stale], 3600) == {"job-1"}
+        assert await release_leases(s, [stale]) == 0
+    async with sf() as s:
+        job = await s.get(MessageJob, "job-1")
+    assert job.status == JobStatus.PROCESSING
+    # Still the current claim's 30s lease, not the stale heartbeat's hour.
+    soon = datetime.now(UTC) + timedelta(minutes=5)
+    assert job.lease_expires_at.replace(tzinfo=None) < soon.replace(tzinfo=None)
+
+
+@pytest.mark.anyio
+async def test_release_leases_returns_jobs_without_attempt(sf):
+    await _insert(sf, "job-held")
+    await _insert(sf, "job-queued", created_at=datetime.now(UTC) + timedelta(hours=1))
+    async with sf() as s:
+        [claimed] = await claim_jobs(s, 1)
+        queued = await s.get(MessageJob, "job-queued")
+    async with sf() as s:
+        released = await release_leases(s, [claimed, queued])
+    assert released == 1
+    async with sf() as s:
+        job = await s.get(MessageJob, "job-held")
+    assert job.status == JobStatus.PENDING
+    assert job.attempts == 0
+    assert job.lease_expires_at is None
+
+
+@pytest.mark.anyio
+async def test_reap_expired_leases_requeues_with_attempt(sf):
+    past = datetime.now(UTC) - timedelta(minutes=5)
+    await _insert(
+        sf,
+        "job-stale",
+        status=JobStatus.PROCESSING,
+        claimed_at=past,
+        lease_expires_at=past,
+    )
+    await _insert(
+        sf,
+        "job-live",
+        status=JobStatus.PROCESSING,
+        claimed_at=past,
+        lease_expires_at=datetime.now(UTC) + timedelta(minutes=5),
+    )
+    async with sf() as s:
+        assert await reap_expired_leases(s, max_attempts=5) == 1
+    async with sf() as s:
+        stale = await s.get(MessageJob, "job-stale")
+        live = await s.get(MessageJob, "job-live")
+        assert stale is not None
+        assert live is not None
+        assert stale.status == JobStatus.PENDING
+        assert stale.attempts == 1
+        assert stale.lease_expires_at is None
+        assert live.status == JobStatus.PROCESSING
+
+
+@pytest.mark.anyio
+async def test_reap_expired_leases_dead_letters_exhausted_jobs(sf):
+    past = datetime.now(UTC) - timedelta(minutes=5)
+    await _insert(
+        sf,
+        "job-spent",
+        status=JobStatus.PROCESSING,
+        attempts=2,
+        claimed_at=past,
+        lease_expires_at=past,
+    )
+    async with sf() as s:
+        assert await reap_expired_leases(s, max_attempts=3) == 1
+    async with sf() as s:
+        job = await s.get(MessageJob, "job-spent")
+        dead = await s.get(DeadLetterJob, "job-spent")
+        assert job is not None
+        assert job.status == JobStatus.FAILED
+        assert dead is not None
+        assert dead.attempts == 3
+        assert "Lease expired" in dead.error
+
+
 @pytest.mark.anyio
 async def test_complete_job_sets_done(sf):
     await _insert(sf, "job-done")
@@ -86,14 +270,902 @@ async def test_retry_job_increments_attempts(sf):
 
 
 @pytest.mark.anyio
-async def test_fail_job_sets_failed(sf):
-    await _insert(sf, "job-fail")
+async def test_finishing_writes_are_fenced_on_the_claim(sf):
+    await _insert(sf, "job-stolen")
+    async with sf() as s:
+        stale = await claim_next_job(s)
+    assert stale is not None
+    async with sf() as s:
+        await s.execute(
+            update(MessageJob)
+            .where(col(MessageJob.id) == "job-stolen")
+            .values(lease_expires_at=datetime.now(UTC) - timedelta(seconds=1))
+        )
+        await s.commit()
+        assert await reap_expired_leases(s, max_attempts=5) == 1
+    async with sf() as s:
+        current = await claim_next_job(s)
+    assert current is not None
+
+    for finish in (
+        lambda s: complete_job(s, stale),
+        lambda s: retry_job(s, stale, 10),
+        lambda s: dead_letter_job(s, stale, "boom"),
+    ):
+        async with sf() as s:
+            s.add(Member(whatsapp_id="stale-reply@c.us"))
+            with pytest.raises(LeaseLostError):
+                await finish(s)
+    async with sf() as s:
+        job = await s.get(MessageJob, "job-stolen")
+        members = set((await s.execute(select(Member.whatsapp_id))).scalars())
+    assert job.status == JobStatus.PROCESSING
+    assert job.attempts == 1
+    assert members == set()
+    async with sf() as s:
+        assert await s.get(DeadLetterJob, "job-stolen") is None
+
+
+@pytest.mark.anyio
+async def test_next_run_after_returns_earliest_deferred(sf):
+    soon = datetime.now(UTC) + timedelta(minutes=1)
+    await _insert(sf, "job-later", run_after=soon + timedelta(minutes=5))
+    await _insert(sf, "job-soon", run_after=soon)
+    await _insert(sf, "job-now")
+    async with sf() as s:
+        earliest = await next_run_after(s)
+    assert earliest is not None
+    assert abs((earliest - soon).total_seconds()) < 1
+
+
+@pytest.mark.anyio
+async def test_notifier_wait_times_out_without_notify():
+    assert await JobNotifier().wait(0.01) is False
+
+
+@pytest.mark.anyio
+async def test_notifier_remembers_notify_before_wait():
+    notifier = JobNotifier()
+    notifier.notify()
+    assert await notifier.wait(0.01) is True
+    assert await notifier.wait(0.01) is False
+
+
+@pytest.mark.anyio
+async def test_worker_loop_wakes_on_notify_instead_of_polling(file_sf):
+    settings = Settings(worker_idle_poll_seconds=60.0)
+    notifier = JobNotifier()
+    processed = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        processed.set()
+
+    worker = asyncio.create_task(
+        message_worker_loop(file_sf, process, settings, notifier)
+    )
+    try:
+        await asyncio.sleep(0.05)
+        await _insert(file_sf, "job-wake")
+        notifier.notify()
+        await asyncio.wait_for(processed.wait(), timeout=1.0)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+
+@pytest.mark.anyio
+async def test_watch_enqueues_notifies_on_jobs_from_another_process(file_sf):
+    notifier = JobNotifier()
+    watcher = asyncio.create_task(watch_enqueues(file_sf, notifier, 0.01))
+    try:
+        await asyncio.sleep(0.05)
+        assert await notifier.wait(0.05) is False
+        # Stands in for the webhook process; nothing calls notify() here.
+        await _insert(file_sf, "job-elsewhere")
+        assert await notifier.wait(1.0) is True
+    finally:
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+
+
+@pytest.mark.anyio
+async def test_idle_watcher_leaves_the_job_table_alone(file_engine, file_sf):
+    statements: list[str] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(file_engine.sync_engine, "before_cursor_execute", capture)
+    watcher = asyncio.create_task(watch_enqueues(file_sf, JobNotifier(), 0.01))
+    try:
+        await asyncio.sleep(0.3)
+    finally:
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+        event.remove(file_engine.sync_engine, "before_cursor_execute", capture)
+    table_reads = [sql for sql in statements if "messagejob" in sql.lower()]
+    pragmas = [sql for sql in statements if "data_version" in sql]
+    # One read to learn the newest rowid, then only the pragma per interval.
+    assert len(table_reads) == 1
+    assert len(pragmas) <= 0.3 / 0.01 + 5
+
+
+@pytest.mark.anyio
+async def test_dead_letter_job_records_payload_and_error(sf):
+    await _insert(sf, "job-dead", attempts=4)
     async with sf() as s:
         claimed = await claim_next_job(s)
     assert claimed is not None
     async with sf() as s:
-        await fail_job(s, claimed)
+        await dead_letter_job(s, claimed, "TimeoutError: LLM down")
     async with sf() as s:
-        job = await s.get(MessageJob, "job-fail")
+        job = await s.get(MessageJob, "job-dead")
+        dead = await s.get(DeadLetterJob, "job-dead")
         assert job is not None
         assert job.status == JobStatus.FAILED
+        assert dead is not None
+        assert dead.body == "x"
+        assert dead.sender_id == "s@c.us"
+        assert dead.attempts == 5
+        assert dead.error == "TimeoutError: LLM down"
+        assert dead.last_attempt_at is not None
+
+
+@pytest.mark.anyio
+async def test_replay_dead_letters_requeues_selected_jobs(sf):
+    claimed_at = datetime.now(UTC)
+    for job_id in ("job-r1", "job-r2"):
+        await _insert(
+            sf,
+            job_id,
+            attempts=4,
+            status=JobStatus.PROCESSING,
+            claimed_at=claimed_at,
+        )
+        async with sf() as s:
+            job = await s.get(MessageJob, job_id)
+            assert job is not None
+            await dead_letter_job(s, job, "boom")
+    async with sf() as s:
+        notifier = JobNotifier()
+        assert await replay_dead_letters(s, ["job-r1"], notifier.notify) == 1
+        assert await notifier.wait(0.01) is True
+    async with sf() as s:
+        replayed = await s.get(MessageJob, "job-r1")
+        assert replayed is not None
+        assert replayed.status == JobStatus.PENDING
+        assert replayed.attempts == 0
+        assert await s.get(DeadLetterJob, "job-r1") is None
+        assert await s.get(DeadLetterJob, "job-r2") is not None
+    async with sf() as s:
+        assert await replay_dead_letters(s) == 1
+
+
+def test_backoff_delay_grows_and_is_capped():
+    for attempts in range(10):
+        delay = backoff_delay(attempts, base_seconds=2.0, max_seconds=60.0)
+        assert 0 <= delay <= min(60.0, 2.0 * 2**attempts)
+
+
+@pytest.mark.anyio
+async def test_seconds_until_capacity_reports_leak_time():
+    limiter = AsyncLimiter(2, 1)
+    assert seconds_until_capacity(limiter) == 0.0
+    await limiter.acquire()
+    await limiter.acquire()
+    assert 0.4 < seconds_until_capacity(limiter) <= 0.5
+
+
+def test_shard_for_is_stable_and_in_range():
+    assert shard_for("a@c.us", 16) == shard_for("a@c.us", 16)
+    assert all(0 <= shard_for(f"{i}@c.us", 7) < 7 for i in range(50))
+
+
+def _two_shard_senders(shard_count: int) -> tuple[str, str]:
+    first = "alice@c.us"
+    for i in range(100):
+        other = f"user{i}@c.us"
+        if shard_for(other, shard_count) != shard_for(first, shard_count):
+            return first, other
+    raise AssertionError("no distinct shard found")
+
+
+@pytest.mark.anyio
+async def test_worker_pool_serves_other_senders_while_one_is_slow(file_sf):
+    settings = Settings(worker_pool_size=2, worker_shard_count=4)
+    slow, fast = _two_shard_senders(4)
+    release = asyncio.Event()
+    fast_done = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        if job.sender_id == slow:
+            await release.wait()
+        else:
+            fast_done.set()
+
+    base = datetime.now(UTC)
+    await _insert(file_sf, "job-slow", sender_id=slow, created_at=base)
+    await _insert(
+        file_sf, "job-fast", sender_id=fast, created_at=base + timedelta(seconds=1)
+    )
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        await asyncio.wait_for(fast_done.wait(), timeout=2.0)
+    finally:
+        release.set()
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+
+@pytest.mark.anyio
+async def test_worker_pool_keeps_per_sender_order(file_sf):
+    settings = Settings(worker_pool_size=4, worker_shard_count=4)
+    seen: list[str] = []
+    all_done = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        # Yield so a concurrent run for the same sender would interleave.
+        await asyncio.sleep(0.01)
+        seen.append(job.id)
+        if len(seen) == 4:
+            all_done.set()
+
+    base = datetime.now(UTC)
+    for i in range(4):
+        await _insert(file_sf, f"job-{i}", created_at=base + timedelta(seconds=i))
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        await asyncio.wait_for(all_done.wait(), timeout=2.0)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    assert seen == ["job-0", "job-1", "job-2", "job-3"]
+
+
+@pytest.mark.anyio
+async def test_worker_pool_recovers_job_with_expired_lease(file_sf):
+    settings = Settings(worker_reap_interval_seconds=0.01)
+    processed = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        processed.set()
+
+    past = datetime.now(UTC) - timedelta(minutes=5)
+    await _insert(
+        file_sf,
+        "job-orphan",
+        status=JobStatus.PROCESSING,
+        claimed_at=past,
+        lease_expires_at=past,
+    )
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        await asyncio.wait_for(processed.wait(), timeout=2.0)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+
+@pytest.mark.anyio
+async def test_worker_pool_heartbeat_keeps_long_job_leased(file_sf):
+    settings = Settings(worker_lease_seconds=1, worker_reap_interval_seconds=0.05)
+    runs: list[str] = []
+    done = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        runs.append(job.id)
+        await asyncio.sleep(1.5)
+        done.set()
+
+    await _insert(file_sf, "job-long")
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        await asyncio.wait_for(done.wait(), timeout=3.0)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    assert runs == ["job-long"]
+
+
+@pytest.mark.anyio
+async def test_worker_pool_retries_then_dead_letters_failing_job(file_sf):
+    settings = Settings(
+        job_max_attempts=3,
+        job_backoff_base_seconds=0.01,
+        job_backoff_max_seconds=0.05,
+    )
+    calls: list[str] = []
+
+    async def process(job: MessageJob, session) -> None:
+        calls.append(job.id)
+        raise RuntimeError("provider down")
+
+    metrics = PipelineMetrics()
+    await _insert(file_sf, "job-flaky")
+    worker = asyncio.create_task(
+        message_worker_loop(file_sf, process, settings, metrics=metrics)
+    )
+    try:
+        for _ in range(200):
+            async with file_sf() as s:
+                if await s.get(DeadLetterJob, "job-flaky") is not None:
+                    break
+            await asyncio.sleep(0.01)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    assert calls == ["job-flaky"] * 3
+    assert metrics.failures.value(outcome="retry") == 2
+    assert metrics.failures.value(outcome="dead_letter") == 1
+    async with file_sf() as s:
+        dead = await s.get(DeadLetterJob, "job-flaky")
+        assert dead is not None
+        assert "provider down" in dead.error
+
+
+@pytest.mark.anyio
+async def test_worker_pool_records_wait_and_processing_time(file_sf):
+    metrics = PipelineMetrics()
+    done = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        await asyncio.sleep(0.05)
+        done.set()
+
+    await _insert(file_sf, "job-timed")
+    worker = asyncio.create_task(
+        message_worker_loop(file_sf, process, Settings(), metrics=metrics)
+    )
+    try:
+        await asyncio.wait_for(done.wait(), timeout=2)
+        for _ in range(100):
+            if metrics.processing_time.count:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    assert metrics.queue_wait.count == 1
+    assert metrics.processing_time.count == 1
+    assert metrics.processing_time.sum >= 0.05
+
+
+@pytest.mark.anyio
+async def test_worker_pool_parks_rate_limited_jobs_in_memory(file_sf):
+    settings = Settings(per_user_rate_limit_count=2, per_user_rate_limit_seconds=1)
+    seen: list[str] = []
+    all_done = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        seen.append(job.id)
+        if len(seen) == 5:
+            all_done.set()
+
+    base = datetime.now(UTC)
+    for i in range(5):
+        await _insert(file_sf, f"job-{i}", created_at=base + timedelta(seconds=i))
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        await asyncio.wait_for(all_done.wait(), timeout=5.0)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    assert seen == [f"job-{i}" for i in range(5)]
+    async with file_sf() as s:
+        for i in range(5):
+            job = await s.get(MessageJob, f"job-{i}")
+            assert job is not None
+            # Deferrals never touched the row: no run_after, no spent attempts.
+            assert job.run_after is None
+            assert job.attempts == 0
+
+
+@pytest.mark.anyio
+async def test_full_parking_still_queues_behind_a_parked_sender(file_sf):
+    settings = Settings(
+        per_user_rate_limit_count=1,
+        per_user_rate_limit_seconds=1,
+        worker_max_deferred=1,
+    )
+    seen: list[str] = []
+    all_done = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        seen.append(job.id)
+        if len(seen) == 3:
+            all_done.set()
+
+    base = datetime.now(UTC)
+    for i in range(3):
+        await _insert(file_sf, f"job-{i}", created_at=base + timedelta(seconds=i))
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        await asyncio.wait_for(all_done.wait(), timeout=5.0)
+        await asyncio.sleep(0.1)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    # job-2 waited behind job-1 past the cap, and nothing ran twice.
+    assert seen == ["job-0", "job-1", "job-2"]
+
+
+def test_merge_jobs_joins_bodies_under_first_job():
+    jobs = [
+        MessageJob(id=f"m-{i}", sender_id="s", group_id="g", body=text)
+        for i, text in enumerate(["done", "the dishes", "and bins"])
+    ]
+    merged = merge_jobs(jobs)
+    assert merged.id == "m-0"
+    assert merged.body == "done\nthe dishes\nand bins"
+    assert merge_jobs(jobs[:1]) is jobs[0]
+
+
+@pytest.mark.anyio
+async def test_worker_pool_coalesces_burst_from_one_sender(file_sf):
+    settings = Settings(worker_coalesce_window_seconds=0.2)
+    bodies: list[str] = []
+    processed = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        bodies.append(job.body)
+        processed.set()
+
+    now = datetime.now(UTC)
+    for i, text in enumerate(["done", "the dishes", "and bins"]):
+        job = MessageJob(
+            id=f"job-{i}",
+            sender_id="s@c.us",
+            group_id="g@g.us",
+            body=text,
+            created_at=now + timedelta(milliseconds=i),
+        )
+        async with file_sf() as s:
+            s.add(job)
+            await s.commit()
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        await asyncio.wait_for(processed.wait(), timeout=2.0)
+        await asyncio.sleep(0.1)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    assert bodies == ["done\nthe dishes\nand bins"]
+    async with file_sf() as s:
+        for i in range(3):
+            job = await s.get(MessageJob, f"job-{i}")
+            assert job is not None
+            assert job.status == JobStatus.DONE
+
+
+@pytest.mark.anyio
+async def test_failed_coalesced_run_is_retried_as_one_job(file_sf):
+    settings = Settings(
+        worker_coalesce_window_seconds=0.2,
+        job_backoff_base_seconds=0.01,
+        job_backoff_max_seconds=0.05,
+    )
+    runs: list[tuple[str, str]] = []
+    retried = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        runs.append((job.id, job.body))
+        if len(runs) == 1:
+            raise RuntimeError("provider down after a tool call")
+        retried.set()
+
+    now = datetime.now(UTC)
+    for i, text in enumerate(["add Ada", "thanks!"]):
+        await _insert(
+            file_sf, f"job-{i}", body=text, created_at=now + timedelta(milliseconds=i)
+        )
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        await asyncio.wait_for(retried.wait(), timeout=3.0)
+        await asyncio.sleep(0.1)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    # The head came back with the merged body its checkpoint was keyed on.
+    assert runs == [("job-0", "add Ada\nthanks!")] * 2
+    async with file_sf() as s:
+        head = await s.get(MessageJob, "job-0")
+        follow_up = await s.get(MessageJob, "job-1")
+    assert head.status == JobStatus.DONE
+    assert head.attempts == 1
+    assert follow_up.status == JobStatus.DONE
+
+
+@pytest.mark.anyio
+async def test_coalescing_never_skips_the_senders_other_chat(file_sf):
+    settings = Settings(worker_coalesce_window_seconds=0.2, worker_idle_poll_seconds=60)
+    bodies: list[str] = []
+    all_done = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        bodies.append(job.body)
+        if len(bodies) == 3:
+            all_done.set()
+
+    async def add(job_id: str, group_id: str, body: str) -> None:
+        async with file_sf() as s:
+            s.add(
+                MessageJob(id=job_id, sender_id="s@c.us", group_id=group_id, body=body)
+            )
+            await s.commit()
+
+    await add("job-0", "g1@g.us", "a")
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        await asyncio.sleep(0.05)
+        # Arrive unannounced, so only the head's coalescing claim sees them.
+        await add("job-1", "g2@g.us", "b")
+        await add("job-2", "g1@g.us", "c")
+        await asyncio.wait_for(all_done.wait(), timeout=2.0)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    assert bodies == ["a", "b", "c"]
+
+
+@pytest.mark.anyio
+async def test_claim_query_uses_partial_active_index(engine, sf):
+    statements: list[tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE messagejob"):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with sf() as s:
+            await claim_jobs(s, 5)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+    statement, parameters = statements[0]
+    sql = "EXPLAIN QUERY PLAN " + statement.split(" RETURNING ")[0]
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        cursor = await raw.driver_connection.execute(sql, parameters)
+        plan = " ".join(row[3] for row in await cursor.fetchall())
+    assert "ix_messagejob_active" in plan
+
+
+@pytest.mark.anyio
+async def test_archive_finished_jobs_moves_old_terminal_jobs(sf):
+    old = datetime.now(UTC) - timedelta(days=40)
+    await _insert(sf, "job-done", status=JobStatus.DONE, created_at=old)
+    await _insert(sf, "job-failed", status=JobStatus.FAILED, created_at=old)
+    await _insert(sf, "job-recent", status=JobStatus.DONE)
+    await _insert(sf, "job-pending", created_at=old)
+    await _insert(
+        sf, "job-dead", created_at=old, status=JobStatus.PROCESSING, claimed_at=old
+    )
+    async with sf() as s:
+        job = await s.get(MessageJob, "job-dead")
+        await dead_letter_job(s, job, "boom")
+        cutoff = datetime.now(UTC) - timedelta(days=30)
+        assert await archive_finished_jobs(s, cutoff, limit=1) == 1
+        assert await archive_finished_jobs(s, cutoff, limit=10) == 1
+        assert await archive_finished_jobs(s, cutoff, limit=10) == 0
+
+    async with sf() as s:
+        remaining = (await s.execute(select(MessageJob.id))).scalars()
+        assert set(remaining) == {"job-recent", "job-pending", "job-dead"}
+        archived = await s.get(ArchivedJob, "job-done")
+        assert archived is not None
+        assert archived.status == JobStatus.DONE
+        assert zlib.decompress(archived.body).decode() == "x"
+        assert await s.get(ArchivedJob, "job-failed") is not None
+
+
+@pytest.mark.anyio
+async def test_archive_finished_jobs_drops_agent_checkpoints(sf):
+    old = datetime.now(UTC) - timedelta(days=40)
+    await _insert(sf, "job-failed", status=JobStatus.FAILED, created_at=old)
+    async with sf() as s:
+        s.add(AgentCheckpoint(job_id="job-failed", prompt="x", messages=b"[]"))
+        await s.commit()
+        await archive_finished_jobs(s, datetime.now(UTC), limit=10)
+    async with sf() as s:
+        assert await s.get(AgentCheckpoint, "job-failed") is None
+
+
+@pytest.mark.anyio
+async def test_claim_jobs_prefers_higher_priority_lanes(sf):
+    now = datetime.now(UTC)
+    await _insert(sf, "job-chatter", "a@c.us", created_at=now - timedelta(seconds=5))
+    await _insert(sf, "job-dm", "b@c.us", created_at=now, priority=JobPriority.HIGH)
+    async with sf() as s:
+        [claimed] = await claim_jobs(s, 1)
+    assert claimed.id == "job-dm"
+
+
+@pytest.mark.anyio
+async def test_claim_jobs_starvation_guard_lets_old_jobs_jump_lanes(sf):
+    now = datetime.now(UTC)
+    await _insert(sf, "job-old", "a@c.us", created_at=now - timedelta(seconds=300))
+    await _insert(sf, "job-dm", "b@c.us", created_at=now, priority=JobPriority.HIGH)
+    async with sf() as s:
+        claimed = await claim_jobs(s, 2, max_wait_seconds=120)
+    assert [job.id for job in claimed] == ["job-old", "job-dm"]
+
+
+@pytest.mark.anyio
+async def test_claim_jobs_keeps_sender_fifo_across_lanes(sf):
+    now = datetime.now(UTC)
+    await _insert(sf, "job-1", "a@c.us", created_at=now - timedelta(seconds=3))
+    await _insert(sf, "job-2", "b@c.us", created_at=now - timedelta(seconds=2))
+    await _insert(
+        sf,
+        "job-3",
+        "a@c.us",
+        created_at=now - timedelta(seconds=1),
+        priority=JobPriority.HIGH,
+    )
+    async with sf() as s:
+        claimed = await claim_jobs(s, 3)
+    # job-3 lifts a@c.us to the front of the batch, but job-1 still goes first.
+    assert [job.id for job in claimed] == ["job-1", "job-3", "job-2"]
+
+
+@pytest.mark.anyio
+async def test_expire_stale_jobs_uses_per_lane_ttl(sf):
+    now = datetime.now(UTC)
+    hour_ago = now - timedelta(hours=1)
+    await _insert(sf, "job-low", created_at=hour_ago, priority=JobPriority.LOW)
+    await _insert(sf, "job-high", created_at=hour_ago, priority=JobPriority.HIGH)
+    await _insert(sf, "job-fresh", priority=JobPriority.LOW)
+    ttls = {JobPriority.LOW: 600, JobPriority.HIGH: 0}
+    async with sf() as s:
+        assert await expire_stale_jobs(s, ttls) == 1
+        assert await expire_stale_jobs(s, ttls) == 0
+    async with sf() as s:
+        assert (await s.get(MessageJob, "job-low")).status == JobStatus.EXPIRED
+        assert (await s.get(MessageJob, "job-high")).status == JobStatus.PENDING
+        assert (await s.get(MessageJob, "job-fresh")).status == JobStatus.PENDING
+
+
+@pytest.mark.anyio
+async def test_expire_stale_jobs_collapses_into_catch_up_run(sf):
+    old = datetime.now(UTC) - timedelta(hours=2)
+    for i, body in enumerate(["anyone there?", "hello??"]):
+        job = MessageJob(
+            id=f"job-{i}",
+            sender_id="a@c.us",
+            group_id="g@g.us",
+            body=body,
+            created_at=old + timedelta(seconds=i),
+        )
+        async with sf() as s:
+            s.add(job)
+            await s.commit()
+    async with sf() as s:
+        assert await expire_stale_jobs(s, {JobPriority.NORMAL: 60}, catch_up=True) == 1
+        [claimed] = await claim_jobs(s, 5)
+    assert claimed.id == "job-1"
+    assert claimed.body.splitlines() == [
+        "[Catching up on 2 messages sent while I was unavailable]",
+        "anyone there?",
+        "hello??",
+    ]
+
+
+@pytest.mark.anyio
+async def test_catch_up_run_keeps_its_place_and_a_single_header(sf):
+    old = datetime.now(UTC) - timedelta(hours=2)
+    retry_at = datetime.now(UTC) + timedelta(minutes=5)
+
+    async def add(job_id: str, body: str, seconds: int, **kw) -> None:
+        async with sf() as s:
+            s.add(
+                MessageJob(
+                    id=job_id,
+                    sender_id="a@c.us",
+                    group_id="g@g.us",
+                    body=body,
+                    created_at=old + timedelta(seconds=seconds),
+                    **kw,
+                )
+            )
+            await s.commit()
+
+    await add("job-0", "anyone there?", 0)
+    await add("job-1", "hello??", 1, run_after=retry_at)
+    ttls = {JobPriority.NORMAL: 60}
+    async with sf() as s:
+        assert await expire_stale_jobs(s, ttls, catch_up=True) == 1
+        # Still stale, but nothing new to fold in: left exactly as it was.
+        assert await expire_stale_jobs(s, ttls, catch_up=True) == 0
+        head = await s.get(MessageJob, "job-1")
+    # The catch-up run keeps its place in line and its retry backoff.
+    assert _naive(head.created_at) == _naive(old + timedelta(seconds=1))
+    assert _naive(head.run_after) == _naive(retry_at)
+
+    await add("job-2", "hi", 2)
+    async with sf() as s:
+        assert await expire_stale_jobs(s, ttls, catch_up=True) == 1
+        head = await s.get(MessageJob, "job-2")
+    assert head.body.splitlines() == [
+        "[Catching up on 3 messages sent while I was unavailable]",
+        "anyone there?",
+        "hello??",
+        "hi",
+    ]
+
+
+@pytest.mark.anyio
+async def test_worker_pool_reports_expired_jobs(file_sf):
+    metrics = PipelineMetrics()
+    processed: list[str] = []
+
+    async def process(job: MessageJob, session) -> None:
+        processed.append(job.id)
+
+    await _insert(
+        file_sf, "job-stale", created_at=datetime.now(UTC) - timedelta(hours=3)
+    )
+    settings = Settings(job_ttl_normal_seconds=60)
+    worker = asyncio.create_task(
+        message_worker_loop(file_sf, process, settings, metrics=metrics)
+    )
+    try:
+        for _ in range(100):
+            if metrics.expired.value():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    assert metrics.expired.value() == 1
+    assert processed == []
+
+
+@pytest.mark.anyio
+async def test_worker_commits_agent_writes_with_job_completion(file_sf):
+    settings = Settings(job_backoff_base_seconds=60)
+
+    async def process(job: MessageJob, session) -> None:
+        session.add(Member(whatsapp_id=f"{job.id}@c.us"))
+        if job.id == "job-bad":
+            raise RuntimeError("agent crashed after writing")
+
+    await _insert(file_sf, "job-good", "a@c.us")
+    await _insert(file_sf, "job-bad", "b@c.us")
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, settings))
+    try:
+        for _ in range(200):
+            async with file_sf() as s:
+                good = await s.get(MessageJob, "job-good")
+                bad = await s.get(MessageJob, "job-bad")
+                if good.status == JobStatus.DONE and bad.attempts == 1:
+                    break
+            await asyncio.sleep(0.01)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    async with file_sf() as s:
+        members = set((await s.execute(select(Member.whatsapp_id))).scalars())
+        bad = await s.get(MessageJob, "job-bad")
+    assert members == {"job-good@c.us"}
+    assert bad.status == JobStatus.PENDING
+    assert bad.attempts == 1
+
+
+@pytest.mark.anyio
+async def test_worker_pool_drain_finishes_running_job_and_returns_the_rest(file_sf):
+    settings = Settings(worker_pool_size=1, worker_shard_count=1)
+    started = asyncio.Event()
+    release = asyncio.Event()
+    seen: list[str] = []
+
+    async def process(job: MessageJob, session) -> None:
+        seen.append(job.id)
+        started.set()
+        await release.wait()
+
+    base = datetime.now(UTC)
+    await _insert(file_sf, "job-running", created_at=base)
+    later = base + timedelta(seconds=1)
+    await _insert(file_sf, "job-waiting", sender_id="t@c.us", created_at=later)
+    stopping = asyncio.Event()
+    worker = asyncio.create_task(
+        message_worker_loop(file_sf, process, settings, stopping=stopping)
+    )
+    await asyncio.wait_for(started.wait(), timeout=2.0)
+    stopping.set()
+    await asyncio.sleep(0.05)
+    assert not worker.done()
+    release.set()
+    await asyncio.wait_for(worker, timeout=2.0)
+
+    assert seen == ["job-running"]
+    async with file_sf() as s:
+        running = await s.get(MessageJob, "job-running")
+        waiting = await s.get(MessageJob, "job-waiting")
+    assert running.status == JobStatus.DONE
+    assert waiting.status == JobStatus.PENDING
+    assert waiting.attempts == 0
+
+
+@pytest.mark.anyio
+async def test_worker_pool_cancel_returns_interrupted_job(file_sf):
+    started = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        started.set()
+        await asyncio.Event().wait()
+
+    await _insert(file_sf, "job-slow")
+    worker = asyncio.create_task(message_worker_loop(file_sf, process, Settings()))
+    await asyncio.wait_for(started.wait(), timeout=2.0)
+    worker.cancel()
+    await asyncio.gather(worker, return_exceptions=True)
+
+    async with file_sf() as s:
+        job = await s.get(MessageJob, "job-slow")
+    assert job.status == JobStatus.PENDING
+    assert job.attempts == 0
+
+
+def test_job_budget_counts_queue_time_down_to_a_floor():
+    settings = Settings(job_deadline_seconds=30, job_min_run_seconds=5)
+    fresh = MessageJob(id="a", sender_id="s", group_id="g", body="x")
+    old = MessageJob(
+        id="b",
+        sender_id="s",
+        group_id="g",
+        body="x",
+        created_at=datetime.now(UTC) - timedelta(seconds=20),
+    )
+    stale = MessageJob(
+        id="c",
+        sender_id="s",
+        group_id="g",
+        body="x",
+        created_at=datetime.now(UTC) - timedelta(hours=1),
+    )
+    assert 29 < job_budget(fresh, settings) <= 30
+    assert 9 < job_budget(old, settings) <= 10
+    assert job_budget(stale, settings) == 5
+    assert job_budget(fresh, Settings(job_deadline_seconds=0)) is None
+
+
+@pytest.mark.anyio
+async def test_worker_pool_cancels_job_past_its_budget(file_sf):
+    settings = Settings(job_deadline_seconds=0.1, job_min_run_seconds=0.1)
+    metrics = PipelineMetrics()
+    fallbacks: list[str] = []
+    done = asyncio.Event()
+
+    async def process(job: MessageJob, session) -> None:
+        session.add(Member(whatsapp_id="late@c.us"))
+        await asyncio.Event().wait()
+
+    async def on_deadline(job: MessageJob, session) -> None:
+        fallbacks.append(job.id)
+        done.set()
+
+    await _insert(file_sf, "job-slow")
+    worker = asyncio.create_task(
+        message_worker_loop(
+            file_sf, process, settings, metrics=metrics, on_deadline=on_deadline
+        )
+    )
+    try:
+        await asyncio.wait_for(done.wait(), timeout=2.0)
+        for _ in range(100):
+            async with file_sf() as s:
+                job = await s.get(MessageJob, "job-slow")
+            if job.status == JobStatus.DONE:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    assert fallbacks == ["job-slow"]
+    assert job.status == JobStatus.DONE
+    assert job.attempts == 0
+    assert metrics.failures.value(outcome="deadline") == 1
+    async with file_sf() as s:
+        members = set((await s.execute(select(Member.whatsapp_id))).scalars())
+    assert members == set()
@@ -0,0 +1,52 @@
+"""Tests for webhook admission decisions."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from choresir.config import Settings
+from choresir.enums import AdmissionDecision, JobPriority
+from choresir.webhook.admission import AdmissionController
+from choresir.worker.backends import MemoryJobQueue
+
+
+def _controller(depth: int = 0, age_seconds: float | None = None):
+    settings = Settings(
+        admission_deprioritize_depth=10,
+        admission_deprioritize_age_seconds=60,
+        admission_reject_depth=100,
+        admission_reject_age_seconds=600,
+    )
+    controller = AdmissionController(MemoryJobQueue(), settings)
+    controller.depth = depth
+    if age_seconds is not None:
+        controller.oldest = datetime.now(UTC) - timedelta(seconds=age_seconds)
+    return controller
+
+
+def test_accepts_when_backlog_is_small():
+    decision = _controller(depth=3, age_seconds=5).decide(JobPriority.NORMAL)
+    assert decision == AdmissionDecision.ACCEPTED
+
+
+def test_deprioritizes_then_rejects_as_depth_grows():
+    assert _controller(depth=10).decide(JobPriority.NORMAL) == (
+        AdmissionDecision.DEPRIORITIZED
+    )
+    assert _controller(depth=100).decide(JobPriority.LOW) == (
+        AdmissionDecision.REJECTED
+    )
+
+
+def test_oldest_job_age_alone_triggers_shedding():
+    assert _controller(age_seconds=120).decide(JobPriority.NORMAL) == (
+        AdmissionDecision.DEPRIORITIZED
+    )
+    assert _controller(age_seconds=900).decide(JobPriority.NORMAL) == (
+        AdmissionDecision.REJECTED
+    )
+
+
+def test_high_lane_is_always_accepted():
+    controller = _controller(depth=10_000, age_seconds=10_000)
+    assert controller.decide(JobPriority.HIGH) == AdmissionDecision.ACCEPTED
@@ -0,0 +1,58 @@
+"""Tests for the per-role command-line entry point."""
+
+from __future__ import annotations
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from choresir.app import create_app
+from choresir.cli import DEFAULT_PORTS, build_parser
+from choresir.config import Settings
+from choresir.enums import ProcessRole, QueueBackend
+
+
+async def _statuses(role: ProcessRole) -> dict[str, int]:
+    """Status of each role-specific endpoint; the lifespan is not started."""
+    app = create_app(Settings(database_url="sqlite+aiosqlite://"), role=role)
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        return {
+            "health": (await client.get("/health")).status_code,
+            "webhook": (await client.post("/webhook", content=b"{}")).status_code,
+            "admin": (await client.get("/admin/")).status_code,
+        }
+
+
+def test_parser_accepts_each_role():
+    for role in ProcessRole:
+        args = build_parser().parse_args([role.value])
+        assert args.role == role
+        assert role in DEFAULT_PORTS
+
+
+def test_parser_rejects_unknown_role():
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["janitor"])
+
+
+@pytest.mark.anyio
+async def test_web_role_serves_webhook_and_admin():
+    statuses = await _statuses(ProcessRole.WEB)
+    assert statuses["health"] == 200
+    assert statuses["webhook"] == 401
+    assert statuses["admin"] != 404
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("role", [ProcessRole.WORKER, ProcessRole.SCHEDULER])
+async def test_background_roles_serve_only_health(role):
+    statuses = await _statuses(role)
+    assert statuses == {"health": 200, "webhook": 404, "admin": 404}
+
+
+def test_memory_queue_requires_all_role():
+    settings = Settings(queue_backend=QueueBackend.MEMORY)
+    with pytest.raises(ValueError, match="memory queue"):
+        create_app(settings, role=ProcessRole.WORKER)
+    assert create_app(settings, role=ProcessRole.ALL) is not None
@@ -0,0 +1,41 @@
+"""Tests for the webhook's recent message id cache."""
+
+from __future__ import annotations
+
+import time
+
+from choresir.webhook.dedup import RecentMessageIds
+
+
+class TestRecentMessageIds:
+    def test_remembers_added_ids(self):
+        recent = RecentMessageIds(max_entries=10, ttl_seconds=60)
+        recent.add("msg-1")
+        assert recent.seen("msg-1")
+        assert not recent.seen("msg-2")
+
+    def test_drops_oldest_beyond_capacity(self):
+        recent = RecentMessageIds(max_entries=2, ttl_seconds=60)
+        for message_id in ("msg-1", "msg-2", "msg-3"):
+            recent.add(message_id)
+        assert not recent.seen("msg-1")
+        assert recent.seen("msg-2")
+        assert recent.seen("msg-3")
+        assert len(recent) == 2
+
+    def test_re_adding_refreshes_position(self):
+        recent = RecentMessageIds(max_entries=2, ttl_seconds=60)
+        recent.add("msg-1")
+        recent.add("msg-2")
+        recent.add("msg-1")
+        recent.add("msg-3")
+        assert recent.seen("msg-1")
+        assert not recent.seen("msg-2")
+
+    def test_forgets_ids_outside_the_window(self):
+        recent = RecentMessageIds(max_entries=10, ttl_seconds=0.01)
+        recent.add("msg-1")
+        time.sleep(0.02)
+        assert not recent.seen("msg-1")
+        recent.add("msg-2")
+        assert len(recent) == 1
@@ -5,9 +5,16 @@ from __future__ import annotations
 import pytest
 
 from choresir.enums import (
+    AdmissionDecision,
+    JobPriority,
     JobStatus,
     MemberRole,
     MemberStatus,
+    OutboxStatus,
+    ProcessRole,
+    QueueBackend,
+    RateLimitBackend,
+    StaleJobPolicy,
     TaskStatus,
     TaskVisibility,
     VerificationMode,
@@ -18,8 +25,14 @@ _ENUM_EXPECTED_MEMBERS = [
     (VerificationMode, {"none", "peer", "partner"}),
     (MemberRole, {"admin", "member"}),
     (MemberStatus, {"pending", "active"}),
-    (JobStatus, {"pending", "processing", "done", "failed"}),
+    (JobStatus, {"pending", "processing", "done", "failed", "expired", "rejected"}),
     (TaskVisibility, {"shared", "personal"}),
+    (RateLimitBackend, {"memory", "sqlite"}),
+    (QueueBackend, {"memory", "sqlite"}),
+    (ProcessRole, {"web", "worker", "scheduler", "all"}),
+    (StaleJobPolicy, {"expire", "catch_up"}),
+    (AdmissionDecision, {"accepted", "deprioritized", "rejected"}),
+    (OutboxStatus, {"pending", "sending", "sent", "failed"}),
 ]
 
 _ALL_ENUMS = [cls for cls, _ in _ENUM_EXPECTED_MEMBERS]
@@ -40,3 +53,7 @@ def test_enum_values_are_lowercase(enum_cls):
 def test_enum_str_returns_value(enum_cls):
     for member in enum_cls:
         assert str(member) == member.value
+
+
+def test_job_priority_orders_lanes():
+    assert JobPriority.LOW < JobPriority.NORMAL < JobPriority.HIGH
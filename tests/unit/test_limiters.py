@@ -0,0 +1,77 @@
+"""Tests for the in-memory rate limiters."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from choresir.config import Settings
+from choresir.worker.limiters import MemoryRateLimiter, UserLimiterStore
+
+
+class TestUserLimiterStore:
+    def test_get_returns_same_limiter_per_user(self):
+        store = UserLimiterStore(5, 60, max_entries=10)
+        assert store.get("a@c.us") is store.get("a@c.us")
+        assert store.get("a@c.us") is not store.get("b@c.us")
+        assert len(store) == 2
+
+    @pytest.mark.anyio
+    async def test_evicts_least_recently_used_drained_entries(self):
+        store = UserLimiterStore(5, 60, max_entries=2)
+        store.get("a@c.us")
+        store.get("b@c.us")
+        store.get("a@c.us")
+        store.get("c@c.us")
+        assert "b@c.us" not in store
+        assert "a@c.us" in store
+        assert len(store) == 2
+        assert store.evictions == 1
+
+    @pytest.mark.anyio
+    async def test_prefers_evicting_drained_entries(self):
+        store = UserLimiterStore(5, 60, max_entries=2)
+        await store.get("busy@c.us").acquire()
+        store.get("quiet@c.us")
+        store.get("new@c.us")
+        assert "busy@c.us" in store
+        assert "quiet@c.us" not in store
+        assert store.evictions == 1
+
+    @pytest.mark.anyio
+    async def test_cap_holds_while_every_bucket_is_draining(self):
+        store = UserLimiterStore(5, 60, max_entries=3)
+        for i in range(10):
+            await store.get(f"{i}@c.us").acquire()
+            assert len(store) <= 3
+        assert store.evictions == 7
+        assert "9@c.us" in store
+
+    @pytest.mark.anyio
+    async def test_evicts_idle_entries_after_rate_period(self):
+        store = UserLimiterStore(5, 0.05, max_entries=100)
+        await store.get("idle@c.us").acquire()
+        await asyncio.sleep(0.1)
+        store.get("fresh@c.us")
+        assert "idle@c.us" not in store
+        assert store.evictions == 1
+
+
+class TestMemoryRateLimiter:
+    @pytest.mark.anyio
+    async def test_takes_nothing_when_either_limit_is_spent(self):
+        limiter = MemoryRateLimiter(
+            Settings(
+                global_rate_limit_count=3,
+                global_rate_limit_seconds=60,
+                per_user_rate_limit_count=1,
+                per_user_rate_limit_seconds=60,
+            )
+        )
+        assert await limiter.acquire("a@c.us") == 0.0
+        assert await limiter.acquire("a@c.us") > 0
+        # The throttled sender's refusal left the global bucket alone.
+        assert await limiter.acquire("b@c.us") == 0.0
+        assert await limiter.acquire("c@c.us") == 0.0
+        assert await limiter.acquire("d@c.us") > 0
@@ -0,0 +1,52 @@
+"""Tests for the in-process metrics instruments."""
+
+from __future__ import annotations
+
+from choresir.metrics import Counter, Gauge, Histogram, PipelineMetrics
+
+
+def test_counter_tracks_values_per_label_set():
+    counter = Counter("c_total", "help")
+    counter.inc(outcome="retry")
+    counter.inc(2, outcome="retry")
+    counter.inc(outcome="dead_letter")
+    assert counter.value(outcome="retry") == 3
+    assert list(counter.render()) == [
+        "# HELP c_total help",
+        "# TYPE c_total counter",
+        'c_total{outcome="dead_letter"} 1',
+        'c_total{outcome="retry"} 3',
+    ]
+
+
+def test_gauge_set_overwrites():
+    gauge = Gauge("g", "help")
+    gauge.set(4, status="pending")
+    gauge.set(1, status="pending")
+    assert gauge.value(status="pending") == 1
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("h_seconds", "help", buckets=(1.0, 5.0))
+    for value in (0.5, 1.0, 3.0, 9.0):
+        histogram.observe(value)
+    assert list(histogram.render())[2:] == [
+        'h_seconds_bucket{le="1"} 2',
+        'h_seconds_bucket{le="5"} 3',
+        'h_seconds_bucket{le="+Inf"} 4',
+        "h_seconds_sum 13.5",
+        "h_seconds_count 4",
+    ]
+
+
+def test_pipeline_metrics_render_includes_every_instrument():
+    text = PipelineMetrics().render()
+    for name in (
+        "choresir_jobs_enqueued_total",
+        "choresir_job_queue_wait_seconds",
+        "choresir_job_processing_seconds",
+        "choresir_queue_depth",
+        "choresir_rate_limit_deferrals_total",
+        "choresir_job_failures_total",
+    ):
+        assert f"# TYPE {name} " in text
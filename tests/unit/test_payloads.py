@@ -0,0 +1,66 @@
+"""Tests for typed WAHA webhook decoding."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from choresir.webhook.payloads import GroupJoinEvent, MessageEvent, decode_event
+
+
+def _body(**envelope) -> bytes:
+    return json.dumps(envelope).encode()
+
+
+class TestDecodeEvent:
+    def test_decodes_message_and_skips_unknown_fields(self):
+        event = decode_event(
+            _body(
+                event="message",
+                session="default",
+                me={"id": "4471234@c.us", "pushName": "choresir"},
+                payload={
+                    "id": "false_123@g.us_ABC",
+                    "from": "123@g.us",
+                    "to": "4471234@c.us",
+                    "participant": "4479999@c.us",
+                    "body": "done with the dishes",
+                    "fromMe": False,
+                    "replyTo": {"id": "XYZ", "participant": "4471234@c.us"},
+                    "_data": {"notifyName": "Sam", "raw": ["x"] * 100},
+                },
+            )
+        )
+        assert isinstance(event, MessageEvent)
+        assert event.payload.from_ == "123@g.us"
+        assert event.payload.participant == "4479999@c.us"
+        assert event.payload.reply_to is not None
+        assert event.payload.reply_to.participant == "4471234@c.us"
+        assert event.me is not None
+        assert event.me.id == "4471234@c.us"
+
+    def test_missing_message_fields_take_defaults(self):
+        event = decode_event(_body(event="message"))
+        assert isinstance(event, MessageEvent)
+        assert event.payload.id == ""
+        assert event.payload.from_me is False
+        assert event.me is None
+
+    def test_decodes_group_join(self):
+        event = decode_event(
+            _body(event="group.v2.join", payload={"recipients": ["a@c.us", "b@c.us"]})
+        )
+        assert isinstance(event, GroupJoinEvent)
+        assert event.payload.recipients == ["a@c.us", "b@c.us"]
+
+    def test_ignores_other_events(self):
+        assert decode_event(_body(event="message.ack", payload={"ack": 3})) is None
+        assert decode_event(_body(payload={})) is None
+
+    def test_rejects_malformed_bodies(self):
+        with pytest.raises(ValidationError):
+            decode_event(b"{not json")
+        with pytest.raises(ValidationError):
+            decode_event(_body(event="message", payload={"fromMe": "sometimes"}))
@@ -0,0 +1,53 @@
+"""Tests for priority lane assignment rules."""
+
+from __future__ import annotations
+
+from choresir.enums import JobPriority, MemberRole, MemberStatus
+from choresir.models.member import Member
+from choresir.webhook.payloads import MessageEvent
+from choresir.webhook.priority import PriorityRules, is_reply_to_bot
+
+
+def _event(**envelope) -> MessageEvent:
+    return MessageEvent.model_validate({"event": "message", **envelope})
+
+
+def _member(role=MemberRole.MEMBER, status=MemberStatus.ACTIVE) -> Member:
+    return Member(whatsapp_id="a@c.us", role=role, status=status)
+
+
+class TestPriorityRules:
+    def test_group_chatter_gets_default_lane(self):
+        rules = PriorityRules()
+        lane = rules.assign(direct=False, member=_member(), replies_to_bot=False)
+        assert lane == JobPriority.NORMAL
+
+    def test_each_rule_promotes(self):
+        rules = PriorityRules()
+        assert rules.assign(direct=True, member=None, replies_to_bot=False) == 2
+        admin = _member(role=MemberRole.ADMIN)
+        assert rules.assign(direct=False, member=admin, replies_to_bot=False) == 2
+        pending = _member(status=MemberStatus.PENDING)
+        assert rules.assign(direct=False, member=pending, replies_to_bot=False) == 2
+        assert rules.assign(direct=False, member=None, replies_to_bot=True) == 2
+
+    def test_highest_matching_rule_wins_and_rules_can_demote(self):
+        rules = PriorityRules(direct_message=JobPriority.LOW)
+        assert rules.assign(direct=True, member=None, replies_to_bot=False) == 0
+        assert rules.assign(direct=True, member=None, replies_to_bot=True) == 2
+
+
+class TestIsReplyToBot:
+    def test_matches_quoted_bot_message_across_id_suffixes(self):
+        event = _event(
+            me={"id": "4471234@c.us"},
+            payload={"replyTo": {"participant": "4471234@lid"}},
+        )
+        assert is_reply_to_bot(event)
+
+    def test_ignores_replies_to_others_and_plain_messages(self):
+        me = {"id": "4471234@c.us"}
+        other = {"replyTo": {"participant": "4479999@c.us"}}
+        assert not is_reply_to_bot(_event(me=me, payload=other))
+        assert not is_reply_to_bot(_event(me=me, payload={}))
+        assert not is_reply_to_bot(_event(payload={"replyTo": {"participant": "x"}}))
@@ -2,78 +2,87 @@
 
 from __future__ import annotations
 
-from unittest.mock import AsyncMock, MagicMock
-
 import httpx
 import pytest
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelResponse, TextPart
+from pydantic_ai.models.function import FunctionModel
 
+from choresir.agent.agent import AgentDeps
 from choresir.app import call_agent_with_retry
+from choresir.models.job import MessageJob
+
+
+def _agent(*outcomes: str | Exception) -> tuple[Agent[AgentDeps, str], list[int]]:
+    """An agent whose model raises or answers with each outcome in turn."""
+    calls: list[int] = []
+    remaining = iter(outcomes)
+
+    def model(messages, info) -> ModelResponse:
+        calls.append(1)
+        outcome = next(remaining)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return ModelResponse(parts=[TextPart(outcome)])
+
+    return Agent(FunctionModel(model), deps_type=AgentDeps), calls
+
+
+@pytest.fixture
+def job():
+    return MessageJob(id="job-1", sender_id="s@c.us", group_id="g@g.us", body="hi")
 
 
 class TestCallAgentWithRetry:
     @pytest.mark.anyio
-    async def test_retries_on_timeout_error(self, agent_deps):
-        agent = MagicMock()
-        agent.run = AsyncMock(
-            side_effect=[
-                TimeoutError("Connection timeout"),
-                TimeoutError("Connection timeout"),
-                MagicMock(output="Success"),
-            ]
+    async def test_retries_on_timeout_error(self, agent_deps, session, job):
+        agent, calls = _agent(
+            TimeoutError("Connection timeout"),
+            TimeoutError("Connection timeout"),
+            "Success",
         )
 
-        result = await call_agent_with_retry(agent, "test message", agent_deps)
+        result = await call_agent_with_retry(agent, job, agent_deps, session)
 
         assert result == "Success"
-        assert agent.run.call_count == 3
+        assert len(calls) == 3
 
     @pytest.mark.anyio
-    async def test_retries_on_httpx_request_error(self, agent_deps):
-        agent = MagicMock()
-        agent.run = AsyncMock(
-            side_effect=[
-                httpx.RequestError("Network error"),
-                MagicMock(output="Success"),
-            ]
-        )
+    async def test_retries_on_httpx_request_error(self, agent_deps, session, job):
+        agent, calls = _agent(httpx.RequestError("Network error"), "Success")
 
-        result = await call_agent_with_retry(agent, "test message", agent_deps)
+        result = await call_agent_with_retry(agent, job, agent_deps, session)
 
         assert result == "Success"
-        assert agent.run.call_count == 2
+        assert len(calls) == 2
 
     @pytest.mark.anyio
-    async def test_fails_after_max_attempts(self, agent_deps):
-        agent = MagicMock()
-        agent.run = AsyncMock(side_effect=TimeoutError("Connection timeout"))
+    async def test_fails_after_max_attempts(self, agent_deps, session, job):
+        agent, calls = _agent(*[TimeoutError("Connection timeout")] * 5)
 
         with pytest.raises(TimeoutError, match="Connection timeout"):
-            await call_agent_with_retry(agent, "test message", agent_deps)
+            await call_agent_with_retry(agent, job, agent_deps, session)
 
-        assert agent.run.call_count == 5
+        assert len(calls) == 5
 
     @pytest.mark.anyio
-    async def test_no_retry_on_other_exceptions(self, agent_deps):
-        agent = MagicMock()
-        agent.run = AsyncMock(side_effect=ValueError("Invalid input"))
+    async def test_no_retry_on_other_exceptions(self, agent_deps, session, job):
+        agent, calls = _agent(ValueError("Invalid input"))
 
         with pytest.raises(ValueError, match="Invalid input"):
-            await call_agent_with_retry(agent, "test message", agent_deps)
+            await call_agent_with_retry(agent, job, agent_deps, session)
 
-        assert agent.run.call_count == 1
+        assert len(calls) == 1
 
     @pytest.mark.anyio
-    async def test_retries_mixed_transient_errors(self, agent_deps):
-        agent = MagicMock()
-        agent.run = AsyncMock(
-            side_effect=[
-                TimeoutError("Timeout"),
-                httpx.RequestError("Network error"),
-                MagicMock(output="Success"),
-            ]
+    async def test_retries_mixed_transient_errors(self, agent_deps, session, job):
+        agent, calls = _agent(
+            TimeoutError("Timeout"),
+            httpx.RequestError("Network error"),
+            "Success",
         )
 
-        result = await call_agent_with_retry(agent, "test message", agent_deps)
+        result = await call_agent_with_retry(agent, job, agent_deps, session)
 
         assert result == "Success"
-        assert agent.run.call_count == 3
+        assert len(calls) == 3
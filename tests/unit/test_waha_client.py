@@ -119,3 +119,19 @@ class TestIsSessionStopped:
     def test_handles_non_json_body(self, waha: WAHAClient):
         resp = httpx.Response(422, text="not json")
         assert waha._is_session_stopped(resp) is False
+
+
+class TestSendOnce:
+    @pytest.mark.anyio
+    async def test_raises_without_retrying(
+        self, client: WAHAClient, respx_mock: MockRouter
+    ):
+        """send_once leaves retries to the outbox sender loop."""
+        respx_mock.post(f"{WAHA_URL}/api/sendText").mock(
+            return_value=httpx.Response(503)
+        )
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.send_once("group@g.us", "hello")
+
+        assert respx_mock.calls.call_count == 1